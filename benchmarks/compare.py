@@ -0,0 +1,87 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 14:48:55 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+
+Compare two results of run_benchmarks.py (ie from two commits). Benchmarks
+slower than threshold are reported as regressions, and exit status is 1 if
+there's any. Usage:
+
+  $ python benchmarks/compare.py baseline.json results.json --threshold 0.1
+
+"""
+
+import sys
+import json
+import argparse
+
+def readResults(filename):
+    """Read a JSON file. Return the report and a dictionary of name -> result"""
+    
+    handle = open(filename)
+    report = json.load(handle)
+    handle.close()
+    
+    return report, dict([(result["name"], result) for result in report["results"]])
+    
+def compare(baseline, results, threshold=0.1):
+    """Return a list of (name, baseline seconds, seconds, change, regression) for
+    benchmarks in both results. change is relative to baseline"""
+    
+    rows = []
+    
+    for name in sorted(set(baseline) & set(results)):
+        old, new = baseline[name]["seconds"], results[name]["seconds"]
+        change = (new - old) / old if old > 0 else 0.0
+        rows.append((name, old, new, change, change > threshold))
+        
+    return rows
+    
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare two results of run_benchmarks.py')
+    parser.add_argument("baseline", help="the reference JSON results", type=str)
+    parser.add_argument("results", help="the new JSON results", type=str)
+    parser.add_argument("--threshold", help="a relative slowdown reported as regression (def '%(default)s')", type=float, default=0.1)
+    args = parser.parse_args()
+    
+    baseline_report, baseline = readResults(args.baseline)
+    report, results = readResults(args.results)
+    
+    for key in ["size", "seed", "queries", "fingerprint"]:
+        if baseline_report.get(key) != report.get(key):
+            sys.stderr.write("Warning: %s differs (%s, %s)\n" %(key, baseline_report.get(key), report.get(key)))
+            
+    print "%-35s %12s %12s %9s" %("benchmark", str(baseline_report.get("commit"))[:10], str(report.get("commit"))[:10], "change")
+    
+    regressions = 0
+    
+    for name, old, new, change, regression in compare(baseline, results, args.threshold):
+        print "%-35s %11.4fs %11.4fs %+8.1f%% %s" %(name, old, new, change * 100, "REGRESSION" if regression else "")
+        regressions += regression
+        
+    for name in sorted(set(baseline) ^ set(results)):
+        print "%-35s only in %s" %(name, args.baseline if name in baseline else args.results)
+        
+    sys.exit(1 if regressions > 0 else 0)
+    
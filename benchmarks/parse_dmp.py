@@ -0,0 +1,92 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 18:25:33 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+
+A micro-benchmark of per-line parse cost: TaxNode(record)/TaxName(record)
+against node_parser/name_parser records. Usage:
+
+  $ python benchmarks/parse_dmp.py [nodes.dmp] [names.dmp]
+
+"""
+
+import os
+import sys
+import timeit
+
+from neotaxonomy import TaxNode, TaxName
+from neotaxonomy.Neo4j import node_parser, name_parser
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+# read at least this number of lines from each file
+min_lines = 100000
+
+def read_lines(dmp_file):
+    """Read lines from a file, repeating them up to min_lines"""
+    
+    handle = open(dmp_file)
+    lines = handle.readlines()
+    handle.close()
+    
+    return lines * max(1, min_lines / len(lines))
+
+def parse_objects(lines, cls):
+    for line in lines:
+        cls(line)
+        
+def parse_records(lines, parser):
+    for record in parser.iterRecords(lines):
+        pass
+        
+def bench(label, function, lines, *args):
+    """Time a function. Return the best per-line time in microseconds"""
+    
+    times = timeit.repeat(lambda: function(lines, *args), number=1, repeat=3)
+    per_line = min(times) / len(lines) * 1e6
+    
+    print "%-30s %10d lines %8.3f us/line" %(label, len(lines), per_line)
+    
+    return per_line
+
+if __name__ == "__main__":
+    nodes_file = os.path.join(current_path, "..", "tests", "test_nodes.dmp")
+    names_file = os.path.join(current_path, "..", "tests", "test_names.dmp")
+    
+    if len(sys.argv) > 1:
+        nodes_file = sys.argv[1]
+        
+    if len(sys.argv) > 2:
+        names_file = sys.argv[2]
+        
+    lines = read_lines(nodes_file)
+    old = bench("TaxNode(record)", parse_objects, lines, TaxNode)
+    new = bench("node_parser.iterRecords", parse_records, lines, node_parser)
+    print "%-30s %.1fx" %("speedup", old/new)
+    
+    lines = read_lines(names_file)
+    old = bench("TaxName(record)", parse_objects, lines, TaxName)
+    new = bench("name_parser.iterRecords", parse_records, lines, name_parser)
+    print "%-30s %.1fx" %("speedup", old/new)
+    
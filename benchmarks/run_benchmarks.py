@@ -0,0 +1,285 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 14:20:07 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+
+Time parsing, loading and queries on a synthetic taxonomy (see synthetic.py),
+and write results in a JSON file to compare them between commits (see
+compare.py). Offline indexes are always timed; database loading and queries
+only with --db, which DELETES ALL DATA in database. Usage:
+
+  $ python benchmarks/run_benchmarks.py --size 100000 --output results.json
+  $ python benchmarks/run_benchmarks.py --size 10000 --db --password=<password> --output results.json
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+import neotaxonomy
+
+from neotaxonomy import TaxGraph, TaxNodefile, TaxNamefile, TaxonomyIndex, NameIndex, NeoTaxonomyError
+from neotaxonomy.Neo4j import node_parser, name_parser
+from neotaxonomy.Taxdump import fingerprint
+from neotaxonomy.Ancestry import LCAIndex
+from neotaxonomy.Search import NameSearch
+from neotaxonomy.Abundance import AbundanceTree, numpy
+from neotaxonomy.command_line import deleteall
+
+from synthetic import writeTaxdump
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+# getting module path
+current_path = os.path.dirname(os.path.abspath(__file__))
+
+class Benchmarks():
+    """Time functions and collect results"""
+    
+    def __init__(self, repeat=3):
+        """Instance the class. Cheap benchmarks are repeated, and the best time
+        is recorded"""
+        
+        self.repeat = repeat
+        self.results = []
+        
+    def time(self, name, function, items, repeat=None):
+        """Time a function processing items. Return the value of the last call"""
+        
+        times = []
+        
+        for i in xrange(repeat or self.repeat):
+            start = time.time()
+            value = function()
+            times.append(time.time() - start)
+            
+        seconds = min(times)
+        result = {"name": name, "seconds": seconds, "times": times, "items": items, "rate": items / seconds if seconds > 0 else None}
+        self.results.append(result)
+        
+        logger.info("%-35s %10.4fs %10d items %12.1f items/s" %(name, seconds, items, result["rate"] or 0))
+        
+        return value
+        
+def consume(iterable):
+    """Read all items of an iterable. Return their number"""
+    
+    count = 0
+    
+    for item in iterable:
+        count += 1
+        
+    return count
+    
+def parseFile(dmp_file, parser):
+    """Parse all records of a file"""
+    
+    handle = open(dmp_file)
+    count = consume(parser.iterRecords(handle))
+    handle.close()
+    
+    return count
+    
+def singleQueries(function, taxa_ids, **kwargs):
+    """Call a lineage function for each taxon. Return the number of lineages"""
+    
+    count = 0
+    
+    for taxon_id in taxa_ids:
+        try:
+            function(taxon_id, **kwargs)
+            count += 1
+            
+        except NeoTaxonomyError:
+            # ie root has no lineage
+            pass
+            
+    return count
+    
+def misspell(name_txt, rng):
+    """Remove a character from a name"""
+    
+    position = rng.randrange(len(name_txt))
+    
+    return name_txt[:position] + name_txt[position+1:]
+    
+def gitCommit():
+    """Return the current git commit, or None"""
+    
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=current_path, stderr=open(os.devnull, "w")).strip()
+        
+    except (OSError, subprocess.CalledProcessError):
+        return None
+        
+def offlineBenchmarks(bench, nodes_file, names_file, queries, rng):
+    """Time dmp parsing and in-memory indexes"""
+    
+    bench.time("parse nodes.dmp", lambda: parseFile(nodes_file, node_parser), parseFile(nodes_file, node_parser))
+    bench.time("parse names.dmp", lambda: parseFile(names_file, name_parser), parseFile(names_file, name_parser))
+    
+    index = bench.time("TaxonomyIndex load", lambda: TaxonomyIndex(nodes_file, names_file), parseFile(nodes_file, node_parser), repeat=1)
+    
+    taxa_ids = [rng.choice(index.tax_ids) for i in xrange(queries)]
+    
+    bench.time("TaxonomyIndex getFullLineage", lambda: singleQueries(index.getFullLineage, taxa_ids), queries)
+    bench.time("TaxonomyIndex getFullLineages", lambda: index.getFullLineages(taxa_ids), queries)
+    bench.time("TaxonomyIndex numberNodes", index.numberNodes, len(index), repeat=1)
+    
+    # descendants of the largest clade under root
+    roots = [idx for idx in xrange(len(index)) if index.parents[idx] == idx]
+    clade = index.tax_ids[roots[0]]
+    bench.time("TaxonomyIndex getDescendants", lambda: consume(index.getDescendants(clade)), len(index) - 1)
+    
+    lca = bench.time("LCAIndex build", lambda: LCAIndex(index), len(index), repeat=1)
+    pairs = [(rng.choice(index.tax_ids), rng.choice(index.tax_ids)) for i in xrange(queries)]
+    bench.time("LCAIndex getLCA", lambda: [lca.getLCA(first, second) for first, second in pairs], queries)
+    
+    sets = [[rng.choice(index.tax_ids) for j in xrange(10)] for i in xrange(queries)]
+    bench.time("LCAIndex getLCAs (10 taxa)", lambda: lca.getLCAs(sets), queries)
+    
+    names = [index.getName(taxon_id) for taxon_id in taxa_ids if index.getName(taxon_id) is not None]
+    
+    name_index = bench.time("NameIndex load", lambda: NameIndex(names_file, name_classes=None), len(index), repeat=1)
+    bench.time("NameIndex getTaxIdsByNames", lambda: name_index.getTaxIdsByNames(names), len(names))
+    
+    search = bench.time("NameSearch build", lambda: NameSearch(names_file), parseFile(names_file, name_parser), repeat=1)
+    misspelled = [misspell(name_txt, rng) for name_txt in names]
+    bench.time("NameSearch search", lambda: [search.search(name_txt) for name_txt in misspelled], len(misspelled))
+    bench.time("NameSearch searchPrefix", lambda: [search.searchPrefix(name_txt[:4]) for name_txt in names], len(names))
+    
+    if numpy is None:
+        logger.warn("numpy is not installed: skipping AbundanceTree")
+        return
+        
+    tree = bench.time("AbundanceTree build", lambda: AbundanceTree(index), len(index), repeat=1)
+    
+    # a million of reads assigned to taxa
+    numpy.random.seed(rng.randint(0, 2**31))
+    tax_ids = numpy.array(index.tax_ids)[numpy.random.randint(0, len(index), 1000000)]
+    counts = numpy.random.randint(1, 100, len(tax_ids))
+    bench.time("AbundanceTree rollUp", lambda: tree.rollUp(tax_ids, counts), len(tax_ids))
+    
+def databaseBenchmarks(bench, args, nodes_file, names_file, queries, rng):
+    """Time loading and lineage queries in database"""
+    
+    connection = dict(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+    
+    taxgraph = TaxGraph(**connection)
+    taxgraph.connect()
+    
+    logger.warn("Deleting all data in database")
+    deleteall(taxgraph)
+    
+    n_nodes = parseFile(nodes_file, node_parser)
+    n_names = parseFile(names_file, name_parser)
+    
+    nodefile = TaxNodefile(**connection)
+    nodefile.connect()
+    bench.time("TaxNodefile insertFrom", lambda: nodefile.insertFrom(nodes_file, bulk=args.bulk), n_nodes, repeat=1)
+    
+    namefile = TaxNamefile(**connection)
+    namefile.connect()
+    bench.time("TaxNamefile insertFrom", lambda: namefile.insertFrom(names_file, bulk=args.bulk), n_names, repeat=1)
+    
+    taxgraph.setRelease(fingerprint(nodes_file, names_file))
+    taxgraph.clearCache()
+    
+    index = TaxonomyIndex(nodes_file)
+    taxa_ids = [rng.choice(index.tax_ids) for i in xrange(queries)]
+    
+    bench.time("TaxGraph getLineage", lambda: singleQueries(taxgraph.getLineage, taxa_ids), queries)
+    bench.time("TaxGraph getFullLineage", lambda: singleQueries(taxgraph.getFullLineage, taxa_ids), queries)
+    bench.time("TaxGraph getLineages", lambda: taxgraph.getLineages(taxa_ids), queries)
+    bench.time("TaxGraph getFullLineages", lambda: taxgraph.getFullLineages(taxa_ids), queries)
+    
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description='Time parsing, loading and queries on a synthetic taxonomy')
+    parser.add_argument("--size", help="the number of nodes of synthetic taxonomy (def '%(default)s')", type=int, default=10000)
+    parser.add_argument("--seed", help="random seed (def '%(default)s')", type=int, default=42)
+    parser.add_argument("--queries", help="the number of queries for each benchmark (def '%(default)s')", type=int, default=1000)
+    parser.add_argument("--repeat", help="repeat queries and keep the best time (def '%(default)s')", type=int, default=3)
+    parser.add_argument("--workdir", help="write synthetic files in this directory (def: a temporary directory)", type=str, required=False)
+    parser.add_argument("--output", help="write results in this JSON file (def '%(default)s')", type=str, default="benchmarks.json")
+    parser.add_argument("--db", help="time loading and queries in database. ALL DATA IN DATABASE WILL BE DELETED", action="store_true", default=False)
+    parser.add_argument("--bulk", help="load data with UNWIND queries", action="store_true", default=False)
+    parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
+    parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
+    parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
+    parser.add_argument("--http_port", help="Database http port (def '%(default)s')", type=int, required=False, default=TaxGraph.http_port)
+    parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
+    parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
+    args = parser.parse_args()
+    
+    workdir = args.workdir or tempfile.mkdtemp(prefix="neotaxonomy_")
+    nodes_file, names_file = os.path.join(workdir, "nodes.dmp"), os.path.join(workdir, "names.dmp")
+    
+    # synthetic files are reused, if they have the same size and seed
+    params_file = os.path.join(workdir, "params.json")
+    params = {"size": args.size, "seed": args.seed}
+    
+    if not os.path.exists(params_file) or json.load(open(params_file)) != params:
+        writeTaxdump(workdir, args.size, args.seed)
+        json.dump(params, open(params_file, "w"))
+        
+    bench = Benchmarks(args.repeat)
+    rng = random.Random(args.seed)
+    
+    offlineBenchmarks(bench, nodes_file, names_file, args.queries, rng)
+    
+    if args.db is True:
+        databaseBenchmarks(bench, args, nodes_file, names_file, args.queries, rng)
+        
+    report = {
+        "version": neotaxonomy.__version__,
+        "commit": gitCommit(),
+        "date": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__ if numpy is not None else None,
+        "size": args.size,
+        "seed": args.seed,
+        "queries": args.queries,
+        "fingerprint": fingerprint(nodes_file, names_file),
+        "results": bench.results,
+    }
+    
+    handle = open(args.output, "w")
+    json.dump(report, handle, indent=2, sort_keys=True)
+    handle.close()
+    
+    logger.info("Results written in %s" %(args.output))
+    
@@ -0,0 +1,341 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 13:52:19 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+
+Write a synthetic nodes.dmp and names.dmp with a shape similar to NCBI taxonomy:
+a backbone of ranks from superkingdom to species with heavy-tailed fan-out,
+intermediate "no rank" and sub-rank nodes making depth irregular, strains and
+subspecies below species, and a mix of name classes. The same seed gives the
+same files. Usage:
+
+  $ python benchmarks/synthetic.py --nodes 100000 --seed 42 --outdir synthetic
+
+"""
+
+import os
+import bisect
+import random
+import logging
+import argparse
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+# backbone ranks and their fraction of nodes (roughly like NCBI taxonomy)
+backbone = [("phylum", 0.0002), ("class", 0.0004), ("order", 0.0012), ("family", 0.004), ("genus", 0.04), ("species", 0.72)]
+
+# sub-ranks placed over a rank, and suffixes of names of a rank
+sub_ranks = {"class": ["subphylum"], "order": ["subclass", "superorder"], "family": ["superfamily", "suborder"],
+             "genus": ["subfamily", "tribe"], "species": ["subgenus", "species group"]}
+suffixes = {"phylum": "ota", "class": "ia", "order": "ales", "family": "aceae", "subfamily": "oideae", "tribe": "eae"}
+
+# ranks below species, and their relative frequency
+leaf_ranks = [("strain", 0.5), ("no rank", 0.3), ("subspecies", 0.12), ("varietas", 0.08)]
+
+# name classes other than scientific name, and their probability by rank
+name_classes = [("authority", {"species": 0.45, "genus": 0.6, None: 0.1}),
+                ("synonym", {None: 0.12}),
+                ("type material", {"species": 0.25, "strain": 0.1, None: 0.0}),
+                ("equivalent name", {None: 0.02}),
+                ("common name", {None: 0.02}),
+                ("genbank common name", {None: 0.015}),
+                ("includes", {None: 0.01}),
+                ("misspelling", {None: 0.005}),
+                ("in-part", {None: 0.003}),
+                ("acronym", {None: 0.002}),
+                ("blast name", {None: 0.001})]
+
+syllables = ["ba", "cil", "lus", "co", "li", "es", "che", "ri", "chia", "strep", "to", "coc", "cus", "my", "ces",
+             "pseu", "do", "mo", "nas", "sal", "nel", "la", "vi", "bri", "o", "cla", "stri", "di", "um", "ther",
+             "mus", "ra", "tus", "ca", "nis", "fe", "lis", "ho", "sa", "pi", "ens", "ae", "ro", "bac", "ter"]
+
+class SyntheticTaxonomy():
+    """A random taxonomy tree, with names"""
+    
+    def __init__(self, n_nodes=10000, seed=42):
+        """Instance the class and build the tree"""
+        
+        self.random = random.Random(seed)
+        
+        # parent, rank and hidden flag of each node (by dense index)
+        self.parents = []
+        self.ranks = []
+        self.hidden_flags = []
+        
+        # the scientific names used, to set unique names
+        self.used_names = set()
+        
+        self.__build(max(n_nodes, 20))
+        
+    def __add(self, parent, rank, hidden_flag=0):
+        """Add a node. Return its index"""
+        
+        self.parents.append(parent)
+        self.ranks.append(rank)
+        self.hidden_flags.append(hidden_flag)
+        
+        return len(self.parents) - 1
+        
+    def __choose(self, cumulative):
+        """Choose an index with probability proportional to weights, given their
+        cumulative sums"""
+        
+        return bisect.bisect_right(cumulative, self.random.random() * cumulative[-1])
+        
+    def __heavy_tailed(self, candidates):
+        """Return a function choosing a parent among candidates with heavy-tailed
+        fan-out"""
+        
+        weights = [self.random.paretovariate(1.2) for candidate in candidates]
+        cumulative = []
+        total = 0.0
+        
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+            
+        return lambda: candidates[min(self.__choose(cumulative), len(candidates)-1)]
+        
+    def __build(self, n_nodes):
+        """Build the tree"""
+        
+        root = self.__add(None, "no rank")
+        self.parents[root] = root
+        
+        cellular = self.__add(root, "no rank")
+        level = [self.__add(cellular, "superkingdom") for i in xrange(3)]
+        
+        # viruses are not cellular organisms
+        level.append(self.__add(root, "superkingdom"))
+        
+        # nodes above species
+        upper = list(level)
+        
+        for rank, fraction in backbone:
+            choose = self.__heavy_tailed(level)
+            level = [self.__add(choose(), rank) for i in xrange(max(len(level), int(fraction * n_nodes)))]
+            
+            if rank != "species":
+                upper.extend(level)
+                
+        species = level
+        remaining = max(n_nodes - len(self.parents), 0)
+        
+        # intermediate nodes between a node and its parent. They are stacked over
+        # upper nodes (ie clades of eukaryotes), making lineages deeper
+        for i in xrange(int(remaining * 0.4)):
+            if self.random.random() < 0.7:
+                child = self.random.choice(upper)
+                
+            else:
+                child = self.random.choice(species)
+                
+            if self.random.random() < 0.3 and self.ranks[child] in sub_ranks:
+                rank = self.random.choice(sub_ranks[self.ranks[child]])
+                
+            else:
+                rank = self.random.choice(["no rank", "clade"])
+                
+            node = self.__add(self.parents[child], rank, int(rank in ("no rank", "clade") and self.random.random() < 0.5))
+            self.parents[child] = node
+            upper.append(node)
+            
+        # nodes below species. Some are below other leaves
+        choose = self.__heavy_tailed(species)
+        leaves = []
+        leaf_weights = [weight for rank, weight in leaf_ranks]
+        leaf_cumulative = [sum(leaf_weights[:i+1]) for i in xrange(len(leaf_weights))]
+        
+        while len(self.parents) < n_nodes:
+            if len(leaves) > 0 and self.random.random() < 0.15:
+                parent = self.random.choice(leaves)
+                
+            else:
+                parent = choose()
+                
+            rank = leaf_ranks[self.__choose(leaf_cumulative)][0]
+            leaves.append(self.__add(parent, rank, int(rank == "no rank")))
+            
+        logger.info("%s nodes generated" %(len(self.parents)))
+        
+    def getDepths(self):
+        """Return the depth of each node"""
+        
+        depths = [None] * len(self.parents)
+        depths[0] = 0
+        
+        for idx in xrange(len(self.parents)):
+            path = []
+            
+            while depths[idx] is None:
+                path.append(idx)
+                idx = self.parents[idx]
+                
+            depth = depths[idx]
+            
+            for node in reversed(path):
+                depth += 1
+                depths[node] = depth
+                
+        return depths
+        
+    def __word(self, min_syllables=2, max_syllables=4):
+        """Return a random latin-like word"""
+        
+        return "".join([self.random.choice(syllables) for i in xrange(self.random.randint(min_syllables, max_syllables))])
+        
+    def __scientific_name(self, idx, names):
+        """Return the scientific name of a node, given names of its ancestors"""
+        
+        rank = self.ranks[idx]
+        parent_name = names[self.parents[idx]]
+        
+        if rank == "species":
+            # the genus name, if any
+            genus = parent_name.split(" ")[0] if parent_name is not None else self.__word().capitalize()
+            return "%s %s" %(genus, self.__word())
+            
+        if rank == "strain":
+            return "%s str. %s%s" %(parent_name, self.random.choice("ABCDEFGHKMPRSTUVZ"), self.random.randint(1, 99999))
+            
+        if rank == "subspecies":
+            return "%s subsp. %s" %(parent_name, self.__word())
+            
+        if rank == "varietas":
+            return "%s var. %s" %(parent_name, self.__word())
+            
+        if rank in ("no rank", "clade") and self.ranks[self.parents[idx]] in ("species", "strain", "subspecies", "varietas", "no rank"):
+            return "%s isolate %s" %(parent_name, self.random.randint(1, 99999))
+            
+        return self.__word(2, 3).capitalize() + suffixes.get(rank, "")
+        
+    def __tax_ids(self):
+        """Return a tax id for each node. Tax ids are not in tree order and have
+        gaps, like merged and deleted ones"""
+        
+        tax_ids = self.random.sample(xrange(3, int(len(self.parents) * 1.3) + 3), len(self.parents) - 2)
+        
+        # root and cellular organisms
+        return [1, 131567 if 131567 not in tax_ids else 2] + tax_ids
+        
+    def write(self, outdir):
+        """Write nodes.dmp and names.dmp in outdir. Return the two paths"""
+        
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+            
+        tax_ids = self.__tax_ids()
+        
+        # names are created from root, so species have the name of their genus
+        names = [None] * len(self.parents)
+        records = []
+        depths = self.getDepths()
+        
+        for idx in sorted(xrange(len(self.parents)), key=depths.__getitem__):
+            if idx == 0:
+                name = "root"
+                
+            elif idx == 1:
+                name = "cellular organisms"
+                
+            else:
+                name = self.__scientific_name(idx, names)
+                
+            names[idx] = name
+            
+            # scientific names are unique with unique_name
+            unique_name = ""
+            
+            if name in self.used_names:
+                unique_name = "%s <%s>" %(name, self.ranks[idx])
+                
+            self.used_names.add(name)
+            records.append((tax_ids[idx], name, unique_name, "scientific name"))
+            
+            for name_class, probabilities in name_classes:
+                if self.random.random() < probabilities.get(self.ranks[idx], probabilities[None]):
+                    if name_class == "authority":
+                        other = "%s %s %s" %(name, self.__word().capitalize(), self.random.randint(1850, 2020))
+                        
+                    elif name_class in ("synonym", "equivalent name", "includes", "in-part"):
+                        other = "%s %s" %(self.__word().capitalize(), self.__word())
+                        
+                    elif name_class == "type material":
+                        other = "%s %s" %(self.random.choice(["ATCC", "DSM", "NCTC", "JCM", "CCUG"]), self.random.randint(1, 99999))
+                        
+                    elif name_class == "misspelling":
+                        other = name[:-2] + name[-1:]
+                        
+                    elif name_class == "acronym":
+                        other = "".join([word[0].upper() for word in name.split()])
+                        
+                    else:
+                        other = "%s %s" %(self.__word(), self.__word())
+                        
+                    records.append((tax_ids[idx], other, "", name_class))
+                    
+        nodes_file = os.path.join(outdir, "nodes.dmp")
+        names_file = os.path.join(outdir, "names.dmp")
+        
+        # nodes.dmp is sorted by tax_id
+        handle = open(nodes_file, "w")
+        
+        for idx in sorted(xrange(len(self.parents)), key=tax_ids.__getitem__):
+            genetic_code = "11" if idx % 2 == 0 else "1"
+            fields = [tax_ids[idx], tax_ids[self.parents[idx]], self.ranks[idx], "", "0", "1", genetic_code, "1", "0", "1", self.hidden_flags[idx], "0", ""]
+            handle.write("\t|\t".join([str(field) for field in fields]) + "\t|\n")
+            
+        handle.close()
+        
+        handle = open(names_file, "w")
+        
+        # names.dmp is sorted by tax_id too
+        records.sort(key=lambda record: record[0])
+        
+        for record in records:
+            handle.write("\t|\t".join([str(field) for field in record]) + "\t|\n")
+            
+        handle.close()
+        
+        logger.info("%s nodes and %s names written in %s" %(len(self.parents), len(records), outdir))
+        
+        return nodes_file, names_file
+        
+def writeTaxdump(outdir, n_nodes=10000, seed=42):
+    """Write a synthetic nodes.dmp and names.dmp in outdir. Return the two paths"""
+    
+    return SyntheticTaxonomy(n_nodes, seed).write(outdir)
+    
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description='Write a synthetic nodes.dmp and names.dmp')
+    parser.add_argument("--nodes", help="the number of nodes (def '%(default)s')", type=int, default=10000)
+    parser.add_argument("--seed", help="random seed (def '%(default)s')", type=int, default=42)
+    parser.add_argument("--outdir", help="output directory (def '%(default)s')", type=str, default="synthetic")
+    args = parser.parse_args()
+    
+    writeTaxdump(args.outdir, args.nodes, args.seed)
+    
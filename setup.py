@@ -145,6 +145,7 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'numpy': ['numpy'],
     },
 
     # If there are data files included in your packages that need to be
@@ -166,6 +167,10 @@ setup(
     entry_points={
         'console_scripts':
             ['fillTaxonomyDB=neotaxonomy.command_line:fillTaxonomyDB',
-             'taxaid2Lineage=neotaxonomy.command_line:taxaid2Lineage']
+             'taxaid2Lineage=neotaxonomy.command_line:taxaid2Lineage',
+             'updateTaxonomyDB=neotaxonomy.command_line:updateTaxonomyDB',
+             'name2Taxaid=neotaxonomy.command_line:name2Taxaid',
+             'searchTaxaName=neotaxonomy.command_line:searchTaxaName',
+             'lcaHits=neotaxonomy.command_line:lcaHits']
     },
 )
@@ -0,0 +1,136 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 13:10:52 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import logging
+
+from neotaxonomy.exceptions import TaxonomyIndexError
+
+# numpy is an optional dependency
+try:
+    import numpy
+    
+except ImportError:
+    numpy = None
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class AbundanceTree():
+    """Sum counts of taxa up to the root of a TaxonomyIndex. Nodes in a subtree
+    are consecutive in pre-order, so the cumulative count of a node is a
+    difference of two cumulative sums of counts in pre-order"""
+    
+    def __init__(self, taxonomy):
+        """Instance the class from a TaxonomyIndex"""
+        
+        if numpy is None:
+            raise TaxonomyIndexError("You need numpy module to sum counts up the tree")
+            
+        self.taxonomy = taxonomy
+        
+        taxonomy.numberNodes()
+        
+        self.tax_ids = numpy.array(taxonomy.tax_ids, dtype=numpy.int64)
+        self.rank_codes = numpy.array(taxonomy.rank_codes, dtype=numpy.int64)
+        
+        # dense indexes in pre-order, and the first and last+1 position of each subtree
+        self.order = numpy.array(taxonomy.order, dtype=numpy.int64)
+        self.starts = numpy.array(taxonomy.positions, dtype=numpy.int64)
+        self.ends = self.starts + (numpy.array(taxonomy.post_order, dtype=numpy.int64) - numpy.array(taxonomy.pre_order, dtype=numpy.int64) + 1) // 2
+        
+        # tax id -> dense index (or -1). NCBI tax ids are dense enough for a table
+        self.lookup = numpy.full(self.tax_ids.max() + 1 if len(self.tax_ids) > 0 else 0, -1, dtype=numpy.int64)
+        self.lookup[self.tax_ids] = numpy.arange(len(self.tax_ids))
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.AbundanceTree(nodes={nodes})>".format(module=self.__module__, nodes=len(self.tax_ids))
+        
+    def getIndexes(self, tax_ids):
+        """Return the dense indexes of an array of tax ids. Unknown tax ids have
+        index -1"""
+        
+        tax_ids = numpy.asarray(tax_ids, dtype=numpy.int64)
+        
+        valid = (tax_ids >= 0) & (tax_ids < len(self.lookup))
+        
+        indexes = numpy.full(len(tax_ids), -1, dtype=numpy.int64)
+        indexes[valid] = self.lookup[tax_ids[valid]]
+        
+        return indexes
+        
+    def rollUp(self, tax_ids, counts):
+        """Sum counts of tax ids (two parallel arrays) in each node and all its
+        descendants. Return the array of cumulative counts of each dense index, and
+        the array of unknown tax ids (their counts are ignored)"""
+        
+        counts = numpy.asarray(counts)
+        indexes = self.getIndexes(tax_ids)
+        
+        if len(indexes) != len(counts):
+            raise TaxonomyIndexError("tax ids and counts need to have the same length")
+            
+        known = indexes >= 0
+        unknown = numpy.asarray(tax_ids)[~known]
+        
+        if len(unknown) > 0:
+            logger.warn("%s tax ids not found. Ignoring them" %(len(unknown)))
+            
+        # counts of each node (bincount sums weights as floats), then cumulative
+        # sums in pre-order
+        direct = numpy.bincount(indexes[known], weights=counts[known], minlength=len(self.tax_ids))
+        
+        if numpy.issubdtype(counts.dtype, numpy.integer):
+            direct = numpy.rint(direct).astype(numpy.int64)
+            
+        sums = numpy.concatenate(([0], numpy.cumsum(direct[self.order])))
+        
+        return sums[self.ends] - sums[self.starts], unknown
+        
+    def getRankTables(self, cumulative, ranks=None):
+        """Return a dictionary of rank -> (tax_ids, counts) arrays of nodes with a
+        count, sorted by count (higher first). ranks is a list of ranks, None for
+        all ranks"""
+        
+        if ranks is None:
+            ranks = self.taxonomy.ranks
+            
+        tables = {}
+        
+        for rank in ranks:
+            if rank not in self.taxonomy.ranks:
+                tables[rank] = (numpy.array([], dtype=numpy.int64), numpy.array([], dtype=cumulative.dtype))
+                continue
+                
+            selected = numpy.nonzero((self.rank_codes == self.taxonomy.ranks.index(rank)) & (cumulative != 0))[0]
+            selected = selected[numpy.argsort(-cumulative[selected], kind="mergesort")]
+            
+            tables[rank] = (self.tax_ids[selected], cumulative[selected])
+            
+        return tables
+        
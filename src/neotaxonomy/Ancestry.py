@@ -0,0 +1,156 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 12:05:13 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import array
+import logging
+
+from neotaxonomy.exceptions import TaxonomyIndexError
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class LCAIndex():
+    """Lowest common ancestor of taxa in constant time. Nodes of a TaxonomyIndex
+    are numbered in pre-order: the LCA of two nodes is the parent of the least
+    deep node after the first one, up to the second one. Minimum depths are
+    searched in a sparse table of blocks, and inside blocks"""
+    
+    # the number of nodes in a block
+    block_size = 32
+    
+    def __init__(self, taxonomy):
+        """Instance the class from a TaxonomyIndex"""
+        
+        self.taxonomy = taxonomy
+        
+        # the dense index of nodes in pre-order, and the position of each node
+        taxonomy.numberNodes()
+        self.order = taxonomy.order
+        self.positions = taxonomy.positions
+        
+        n_nodes = len(self.order)
+        
+        # depth * n_nodes + position, in pre-order: minimum is the least deep node
+        self.keys = array.array('l', [taxonomy.depths[idx] * n_nodes + position for position, idx in enumerate(self.order)])
+        
+        # minimum keys of 2**level consecutive blocks
+        self.table = []
+        
+        logger.info("Building sparse table...")
+        
+        level = array.array('l', [min(self.keys[start:start+self.block_size]) for start in xrange(0, len(self.keys), self.block_size)])
+        span = 1
+        
+        while len(level) > 0:
+            self.table.append(level)
+            level = array.array('l', map(min, level[:-span], level[span:]))
+            span *= 2
+            
+        logger.info("%s nodes indexed" %(len(self.order)))
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.LCAIndex(nodes={nodes})>".format(module=self.__module__, nodes=len(self.order))
+        
+    def __minKey(self, start, end):
+        """Return the minimum key between two positions (inclusive)"""
+        
+        first, last = start / self.block_size, end / self.block_size
+        
+        if last - first < 2:
+            return min(self.keys[start:end+1])
+            
+        # the tail of first block, the head of last block, and full blocks between
+        level = (last - first - 1).bit_length() - 1
+        
+        return min(min(self.keys[start:(first+1)*self.block_size]),
+                   min(self.keys[last*self.block_size:end+1]),
+                   self.table[level][first+1],
+                   self.table[level][last - (1 << level)])
+        
+    def __getIndex(self, taxon_id):
+        """Return the dense index of a tax id. Raise an exception if not found"""
+        
+        idx = self.taxonomy.getIndex(taxon_id)
+        
+        if idx is None:
+            raise TaxonomyIndexError("Tax id %s not found" %(taxon_id))
+            
+        return idx
+        
+    def __lca(self, first, last):
+        """Return the LCA of the nodes in two pre-order positions (first <= last),
+        or None if nodes are in different trees"""
+        
+        if first == last:
+            return self.order[first]
+            
+        key = self.__minKey(first+1, last)
+        
+        # a root at depth 0: there isn't a common ancestor
+        if key < len(self.order):
+            return None
+            
+        return self.taxonomy.parents[self.order[key % len(self.order)]]
+        
+    def getLCA(self, first_id, second_id):
+        """Return the tax id of the lowest common ancestor of two taxa"""
+        
+        return self.getSetLCA([first_id, second_id])
+        
+    def getSetLCA(self, taxa_ids):
+        """Return the tax id of the lowest common ancestor of a set of taxa. It's
+        the LCA of the first and the last taxa in pre-order"""
+        
+        positions = [self.positions[self.__getIndex(taxon_id)] for taxon_id in taxa_ids]
+        
+        if len(positions) == 0:
+            raise TaxonomyIndexError("Can't find the LCA of an empty set")
+            
+        idx = self.__lca(min(positions), max(positions))
+        
+        if idx is None:
+            raise TaxonomyIndexError("%s haven't a common ancestor" %(list(taxa_ids)))
+            
+        return self.taxonomy.tax_ids[idx]
+        
+    def getLCAs(self, taxa_sets):
+        """Get the LCA of many sets of taxa. Return a list of (taxa_ids, lca, error)
+        in the same order of input"""
+        
+        results = []
+        
+        for taxa_ids in taxa_sets:
+            try:
+                results.append((taxa_ids, self.getSetLCA(taxa_ids), None))
+                
+            except TaxonomyIndexError, message:
+                results.append((taxa_ids, None, str(message)))
+                
+        return results
+        
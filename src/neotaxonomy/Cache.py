@@ -0,0 +1,205 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 20:12:05 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import json
+import sqlite3
+import logging
+import collections
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class LRUCache():
+    """A cache with a maximum number of items. When full, the least recently used
+    item is evicted. Count hits, misses and evictions"""
+    
+    def __init__(self, maxsize=10000):
+        """Instance the class"""
+        
+        if maxsize < 1:
+            raise ValueError("maxsize need to be a positive number")
+            
+        self.maxsize = maxsize
+        self.items = collections.OrderedDict()
+        
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.LRUCache(maxsize={maxsize}, items={items})>".format(module=self.__module__, maxsize=self.maxsize, items=len(self.items))
+        
+    def __len__(self):
+        return len(self.items)
+        
+    def __contains__(self, key):
+        return key in self.items
+        
+    def get(self, key, default=None):
+        """Return the value of key, or default. A found key became the most
+        recently used"""
+        
+        try:
+            value = self.items.pop(key)
+            
+        except KeyError:
+            self.misses += 1
+            return default
+            
+        # move to end
+        self.items[key] = value
+        self.hits += 1
+        
+        return value
+        
+    def set(self, key, value):
+        """Add (or replace) a value. Evict the least recently used item if full"""
+        
+        if key in self.items:
+            del self.items[key]
+            
+        elif len(self.items) >= self.maxsize:
+            self.items.popitem(last=False)
+            self.evictions += 1
+            
+        self.items[key] = value
+        
+    def clear(self):
+        """Remove all items. Statistics are not changed"""
+        
+        logger.debug("Removing %s items from cache" %(len(self.items)))
+        
+        self.items.clear()
+        
+    def getStats(self):
+        """Return a dictionary of cache statistics"""
+        
+        return {
+            "size": len(self.items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+        
+    
+
+class PersistentCache():
+    """A lineage cache stored in a SQLite file. Lineages are tagged with a release
+    fingerprint, so lineages of a different taxonomy are never returned. New
+    lineages are written in batches"""
+    
+    def __init__(self, filename, release, batch_size=1000):
+        """Open (or create) a cache file for a release"""
+        
+        self.filename = filename
+        self.release = release
+        self.batch_size = batch_size
+        
+        # lineages to be written
+        self.pending = []
+        
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        
+        # many processes could use the same file. A cache could be used by a
+        # thread different from the one which opened it (but not concurrently)
+        self.connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS lineages (release TEXT, key TEXT, lineage TEXT, PRIMARY KEY (release, key))")
+        self.connection.commit()
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.PersistentCache(filename='{filename}', release='{release}')>".format(module=self.__module__, filename=self.filename, release=self.release)
+        
+    def get(self, key, default=None):
+        """Return the lineage of a key, or default"""
+        
+        row = self.connection.execute("SELECT lineage FROM lineages WHERE release = ? AND key = ?", (self.release, self.__key(key))).fetchone()
+        
+        if row is None:
+            self.misses += 1
+            return default
+            
+        self.hits += 1
+        
+        return json.loads(row[0])
+        
+    def set(self, key, lineage):
+        """Add a lineage. Lineages are written every batch_size items"""
+        
+        self.pending.append((self.release, self.__key(key), json.dumps(lineage)))
+        
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+            
+    def flush(self):
+        """Write pending lineages"""
+        
+        if len(self.pending) == 0:
+            return
+            
+        self.connection.executemany("INSERT OR REPLACE INTO lineages VALUES (?, ?, ?)", self.pending)
+        self.connection.commit()
+        
+        logger.debug("%s lineages written in %s" %(len(self.pending), self.filename))
+        
+        self.pending = []
+        
+    def purge(self):
+        """Remove lineages of other releases"""
+        
+        self.flush()
+        self.connection.execute("DELETE FROM lineages WHERE release != ?", (self.release,))
+        self.connection.commit()
+        
+    def close(self):
+        """Write pending lineages and close file"""
+        
+        self.flush()
+        self.connection.close()
+        
+    def getStats(self):
+        """Return a dictionary of cache statistics"""
+        
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        
+    def __key(self, key):
+        """Convert a (tax_id, mode, ranks) key in a string. ranks is a tuple of
+        (rank, letter) or None"""
+        
+        tax_id, mode, ranks = key
+        
+        return "%s|%s|%s" %(tax_id, mode, ",".join(["%s:%s" %(rank, letter) for rank, letter in ranks or []]))
+        
@@ -0,0 +1,108 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 21:48:33 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import Queue
+import logging
+
+from multiprocessing.pool import ThreadPool
+
+from neotaxonomy.Neo4j import iterChunks
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class LineageExecutor():
+    """Resolve lineages with many threads. Each thread takes a TaxGraph session
+    from a bounded pool, and searches a batch of taxa ids"""
+    
+    def __init__(self, taxgraph, concurrency=4):
+        """Instance the class. Sessions are cloned from a connected TaxGraph"""
+        
+        self.taxgraph = taxgraph
+        self.concurrency = concurrency
+        
+        # a session is used by a thread at a time
+        self.sessions = Queue.Queue()
+        
+        for i in range(concurrency):
+            self.sessions.put(taxgraph.clone())
+            
+        self.pool = ThreadPool(concurrency)
+        
+        logger.debug("%s sessions started" %(concurrency))
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.LineageExecutor(concurrency={concurrency})>".format(module=self.__module__, concurrency=self.concurrency)
+        
+    def __resolve(self, task):
+        """Search a batch of taxa ids with a free session"""
+        
+        taxa_ids, full, abbreviated, ranks = task
+        
+        session = self.sessions.get()
+        
+        try:
+            if full is True or abbreviated is True:
+                return session.getFullLineages(taxa_ids, abbreviated)
+                
+            elif ranks is not None:
+                return session.getLineages(taxa_ids, ranks)
+                
+            else:
+                return session.getLineages(taxa_ids)
+                
+        finally:
+            self.sessions.put(session)
+            
+    def submit(self, taxa_ids, full=False, abbreviated=False, ranks=None):
+        """Search lineages of taxa ids in background. Return an AsyncResult: its
+        get() method returns a list of (taxon_id, resolved_id, lineage, error)
+        like TaxGraph.getLineages does"""
+        
+        return self.pool.apply_async(self.__resolve, [(list(taxa_ids), full, abbreviated, ranks)])
+        
+    def iterLineages(self, taxa_ids, full=False, abbreviated=False, ranks=None):
+        """Search lineages of taxa ids, with a batch of ids (TaxGraph.batch_size)
+        for each thread. Yield (taxon_id, resolved_id, lineage, error) in the same
+        order of taxa_ids"""
+        
+        tasks = ((chunk, full, abbreviated, ranks) for chunk in iterChunks(taxa_ids, self.taxgraph.batch_size))
+        
+        for results in self.pool.imap(self.__resolve, tasks):
+            for result in results:
+                yield result
+                
+    def close(self):
+        """Wait for threads to finish, and close sessions caches"""
+        
+        self.pool.close()
+        self.pool.join()
+        
+        while not self.sessions.empty():
+            self.sessions.get().closePersistentCache()
+            
@@ -0,0 +1,588 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 10:21:37 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import array
+import logging
+
+from neotaxonomy.Neo4j import TaxNode, TaxName, TaxNodefile, TaxNamefile, node_parser, name_parser, parseRanks, rowsToLineage, rowsToFullLineage
+from neotaxonomy.Taxdump import openDmp
+from neotaxonomy.exceptions import TaxGraphError, TaxonomyIndexError
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class TaxonomyIndex():
+    """An in-memory taxonomy tree. Each node has a dense index, and parents,
+    ranks, hidden flags and scientific names are stored in arrays"""
+    
+    # the relation name of scientific names
+    scientific_name = "scientific name"
+    
+    def __init__(self, nodes_file=None, names_file=None):
+        """Instance the class. Load data if files are provided"""
+        
+        # tax_id -> dense index
+        self.index = {}
+        
+        # tax_id and parent index of each node
+        self.tax_ids = array.array('l')
+        self.parents = array.array('l')
+        
+        # rank code of each node, and the rank of each code
+        self.rank_codes = array.array('H')
+        self.ranks = []
+        self.__rank_to_code = {}
+        
+        # 1 if GenBank hidden flag is set
+        self.hidden_flags = bytearray()
+        
+        # the scientific name of each node
+        self.names = []
+        
+        # nodes in pre-order, and position and depth of each node. Set by numberNodes
+        self.order = array.array('l')
+        self.positions = array.array('l')
+        self.depths = array.array('l')
+        
+        # pre and post-order numbers (with the same counter) of each node: the
+        # descendants of a node have pre-order numbers inside its interval
+        self.pre_order = array.array('l')
+        self.post_order = array.array('l')
+        
+        if nodes_file is not None:
+            self.loadNodes(nodes_file)
+            
+        if names_file is not None:
+            self.loadNames(names_file)
+            
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.TaxonomyIndex(nodes={nodes})>".format(module=self.__module__, nodes=len(self))
+        
+    def __len__(self):
+        """Return the number of nodes"""
+        
+        return len(self.tax_ids)
+        
+    def __contains__(self, taxon_id):
+        """Test if a tax id is in index"""
+        
+        return self.getIndex(taxon_id) is not None
+        
+    def loadNodes(self, dmp_file="nodes.dmp"):
+        """Read nodes from a nodes.dmp file (could be compressed, or a taxdump
+        archive)"""
+        
+        # parents are resolved when all nodes are read
+        parent_ids = array.array('l')
+        
+        logger.info("Reading nodes...")
+        
+        handle = openDmp(dmp_file, TaxNodefile.dmp_name)
+        
+        for record in node_parser.iterRecords(handle):
+            tax_id = int(record.tax_id)
+            
+            self.index[tax_id] = len(self.tax_ids)
+            self.tax_ids.append(tax_id)
+            parent_ids.append(int(record.parent))
+            self.rank_codes.append(self.__rankCode(record.rank))
+            self.hidden_flags.append(record.hidden_flag != '0')
+            self.names.append(None)
+            
+        handle.close()
+        
+        # now set parent index. A missing parent is like a root
+        for idx, parent_id in enumerate(parent_ids):
+            self.parents.append(self.index.get(parent_id, idx))
+            
+        logger.info("%s nodes read" %(len(self)))
+        
+    def loadNames(self, dmp_file="names.dmp"):
+        """Read scientific names from a names.dmp file (could be compressed, or a
+        taxdump archive)"""
+        
+        # count names read
+        count = 0
+        
+        logger.info("Reading names...")
+        
+        handle = openDmp(dmp_file, TaxNamefile.dmp_name)
+        
+        for record in name_parser.iterRecords(handle):
+            if record.name_class != self.scientific_name:
+                continue
+                
+            idx = self.index.get(int(record.tax_id))
+            
+            if idx is None:
+                continue
+            
+            self.names[idx] = record.name_txt.decode("utf-8")
+            count += 1
+            
+        handle.close()
+        
+        logger.info("%s scientific names read" %(count))
+        
+    def loadDatabase(self, taxgraph):
+        """Read nodes and scientific names from a connected TaxGraph"""
+        
+        logger.info("Reading nodes in database...")
+        
+        query = """MATCH (node:%s) OPTIONAL MATCH (parent:%s)-[:PARENT]->(node) OPTIONAL MATCH (node)-[:SCIENTIFIC_NAME]->(name:%s) RETURN node.tax_id, parent.tax_id, node.rank, node.hidden_flag, name.name_txt""" %(TaxNode.label, TaxNode.label, TaxName.label)
+        
+        try:
+            cursor = taxgraph.graph.run(query)
+            
+        except AttributeError, message:
+            raise TaxGraphError("You need to connect to database before reading nodes: %s" %(message))
+            
+        parent_ids = array.array('l')
+        
+        for tax_id, parent_id, rank, hidden_flag, name_txt in cursor:
+            tax_id = int(tax_id)
+            
+            self.index[tax_id] = len(self.tax_ids)
+            self.tax_ids.append(tax_id)
+            
+            # root has no parent relationship
+            parent_ids.append(int(parent_id or tax_id))
+            self.rank_codes.append(self.__rankCode(rank))
+            self.hidden_flags.append(hidden_flag != '0')
+            self.names.append(name_txt)
+            
+        cursor.close()
+        
+        for idx, parent_id in enumerate(parent_ids):
+            self.parents.append(self.index.get(parent_id, idx))
+            
+        logger.info("%s nodes read" %(len(self)))
+        
+    def __rankCode(self, rank):
+        """Get a code for a rank"""
+        
+        code = self.__rank_to_code.get(rank)
+        
+        if code is None:
+            code = len(self.ranks)
+            self.ranks.append(rank)
+            self.__rank_to_code[rank] = code
+            
+        return code
+        
+    def getIndex(self, taxon_id):
+        """Return the dense index of a tax id, or None"""
+        
+        try:
+            return self.index.get(int(taxon_id))
+            
+        except (TypeError, ValueError):
+            return None
+            
+    def getParent(self, taxon_id):
+        """Return the parent tax id of a taxon"""
+        
+        idx = self.__getIndex(taxon_id)
+        
+        return self.tax_ids[self.parents[idx]]
+        
+    def getRank(self, taxon_id):
+        """Return the rank of a taxon"""
+        
+        idx = self.__getIndex(taxon_id)
+        
+        return self.ranks[self.rank_codes[idx]]
+        
+    def getName(self, taxon_id):
+        """Return the scientific name of a taxon"""
+        
+        idx = self.__getIndex(taxon_id)
+        
+        return self.names[idx]
+        
+    def __getIndex(self, taxon_id):
+        """Return the dense index of a tax id. Raise an exception if not found"""
+        
+        idx = self.getIndex(taxon_id)
+        
+        if idx is None:
+            raise TaxonomyIndexError("Tax id %s not found" %(taxon_id))
+            
+        return idx
+        
+    def __rows(self, taxon_id, abbreviated=False):
+        """Return (tax_name, tax_rank, parent_rank, parent_name) rows for a taxa,
+        from the nearest parent to root, like TaxGraph query does"""
+        
+        rows = []
+        
+        idx = self.getIndex(taxon_id)
+        
+        # a taxa without scientific name has no lineage
+        if idx is None or self.names[idx] is None:
+            return rows
+            
+        tax_name = self.names[idx]
+        tax_rank = self.ranks[self.rank_codes[idx]]
+        
+        # root is parent of itself
+        parent = self.parents[idx]
+        
+        while parent != idx:
+            if self.names[parent] is not None and (abbreviated is False or self.hidden_flags[parent] == 0):
+                rows.append((tax_name, tax_rank, self.ranks[self.rank_codes[parent]], self.names[parent]))
+                
+            idx, parent = parent, self.parents[parent]
+            
+        return rows
+        
+    def getLineage(self, taxon_id, ranks=["superKingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"], resolved=False):
+        """Get lineage from tax id. Only specified ranks will be returned, like
+        TaxGraph.getLineage does (resolved=True return a (resolved_id, lineage) tuple)"""
+        
+        ranks, letters = parseRanks(ranks)
+        lineage = rowsToLineage(self.__rows(taxon_id), ranks, letters)
+        
+        if lineage is None:
+            raise TaxonomyIndexError("No lineage found for %s" %(taxon_id))
+            
+        if resolved is True:
+            return str(taxon_id), lineage
+            
+        return lineage
+        
+    def getFullLineage(self, taxon_id, abbreviated=False, resolved=False):
+        """Get full lineage for a taxa id (abbreviated or not)"""
+        
+        lineage = rowsToFullLineage(self.__rows(taxon_id, abbreviated))
+        
+        if lineage is None:
+            raise TaxonomyIndexError("No lineage found for %s" %(taxon_id))
+            
+        if resolved is True:
+            return str(taxon_id), lineage
+            
+        return lineage
+        
+    def getLineages(self, taxa_ids, ranks=["superKingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"]):
+        """Get lineages for many tax ids. Return a list of (taxon_id, resolved_id,
+        lineage, error) like TaxGraph.getLineages does"""
+        
+        ranks, letters = parseRanks(ranks)
+        results = []
+        
+        for taxon_id in taxa_ids:
+            lineage = rowsToLineage(self.__rows(taxon_id), ranks, letters)
+            results.append(self.__lineage_result(taxon_id, lineage))
+            
+        return results
+        
+    def getFullLineages(self, taxa_ids, abbreviated=False):
+        """Get full lineages (abbreviated or not) for many tax ids. Return a list
+        of (taxon_id, resolved_id, lineage, error)"""
+        
+        results = []
+        
+        for taxon_id in taxa_ids:
+            lineage = rowsToFullLineage(self.__rows(taxon_id, abbreviated))
+            results.append(self.__lineage_result(taxon_id, lineage))
+            
+        return results
+        
+    def __lineage_result(self, taxon_id, lineage):
+        """Return a (taxon_id, resolved_id, lineage, error) tuple for batch methods"""
+        
+        if lineage is None:
+            return (taxon_id, None, None, "No lineage found for %s" %(taxon_id))
+            
+        return (taxon_id, str(taxon_id), lineage, None)
+        
+        
+    def getChildren(self):
+        """Return (offsets, children) arrays: the dense indexes of children of
+        node i are children[offsets[i]:offsets[i+1]]"""
+        
+        n_nodes = len(self)
+        
+        # count children of each node. Root is not a child
+        offsets = array.array('l', [0]) * (n_nodes + 1)
+        
+        for idx, parent in enumerate(self.parents):
+            if parent != idx:
+                offsets[parent+1] += 1
+                
+        for idx in xrange(n_nodes):
+            offsets[idx+1] += offsets[idx]
+            
+        # place each child in its parent slice
+        children = array.array('l', [0]) * offsets[n_nodes]
+        position = array.array('l', offsets)
+        
+        for idx, parent in enumerate(self.parents):
+            if parent != idx:
+                children[position[parent]] = idx
+                position[parent] += 1
+                
+        return offsets, children
+        
+    def iterLineages(self):
+        """Yield (tax_id, ids, names, ranks, abbreviated) for each node with a
+        scientific name, traversing the tree from root. ids, names and ranks are
+        sorted from root to node, abbreviated names skip hidden ancestors. Ancestors
+        without a scientific name are skipped, like TaxGraph queries do"""
+        
+        offsets, children = self.getChildren()
+        
+        # the path from root to current node
+        path = []
+        
+        # nodes to visit, with their depth
+        stack = [(idx, 0) for idx, parent in enumerate(self.parents) if parent == idx]
+        
+        while len(stack) > 0:
+            idx, depth = stack.pop()
+            del path[depth:]
+            path.append(idx)
+            
+            for child in children[offsets[idx]:offsets[idx+1]]:
+                stack.append((child, depth+1))
+                
+            if self.names[idx] is None:
+                continue
+                
+            ancestors = [ancestor for ancestor in path if self.names[ancestor] is not None]
+            
+            ids = [str(self.tax_ids[ancestor]) for ancestor in ancestors]
+            names = [self.names[ancestor] for ancestor in ancestors]
+            ranks = [self.ranks[self.rank_codes[ancestor]] for ancestor in ancestors]
+            abbreviated = [self.names[ancestor] for ancestor in ancestors[:-1] if self.hidden_flags[ancestor] == 0] + [names[-1]]
+            
+            yield ids[-1], ids, names, ranks, abbreviated
+            
+    def numberNodes(self):
+        """Visit the tree from roots, and number nodes in pre-order. Nodes need
+        to be numbered again after loading data"""
+        
+        n_nodes = len(self)
+        
+        self.order = array.array('l')
+        self.positions = array.array('l', [0]) * n_nodes
+        self.depths = array.array('l', [0]) * n_nodes
+        self.pre_order = array.array('l', [0]) * n_nodes
+        self.post_order = array.array('l', [0]) * n_nodes
+        
+        logger.info("Numbering nodes...")
+        
+        offsets, children = self.getChildren()
+        
+        # a counter for pre and post-order numbers
+        counter = 0
+        
+        # nodes to visit, with their depth. A node is visited again after its children
+        stack = [(idx, 0, False) for idx in reversed(xrange(n_nodes)) if self.parents[idx] == idx]
+        
+        while len(stack) > 0:
+            idx, depth, visited = stack.pop()
+            
+            if visited is True:
+                self.post_order[idx] = counter
+                counter += 1
+                continue
+                
+            self.pre_order[idx] = counter
+            counter += 1
+            
+            self.positions[idx] = len(self.order)
+            self.depths[idx] = depth
+            self.order.append(idx)
+            
+            stack.append((idx, depth, True))
+            
+            for child in reversed(children[offsets[idx]:offsets[idx+1]]):
+                stack.append((child, depth+1, False))
+                
+        logger.info("%s nodes numbered" %(len(self.order)))
+        
+    def __checkNumbered(self):
+        """Number nodes if needed"""
+        
+        if len(self.order) != len(self):
+            self.numberNodes()
+            
+    def getInterval(self, taxon_id):
+        """Return the (pre_order, post_order) numbers of a taxon"""
+        
+        self.__checkNumbered()
+        idx = self.__getIndex(taxon_id)
+        
+        return self.pre_order[idx], self.post_order[idx]
+        
+    def isAncestor(self, ancestor_id, taxon_id):
+        """Return True if a taxon is a descendant of another taxon"""
+        
+        self.__checkNumbered()
+        ancestor, idx = self.__getIndex(ancestor_id), self.__getIndex(taxon_id)
+        
+        return self.pre_order[ancestor] < self.pre_order[idx] and self.post_order[idx] < self.post_order[ancestor]
+        
+    def getDescendants(self, taxon_id, rank=None):
+        """Yield the tax ids of all descendants of a taxon in pre-order, optionally
+        only those of a rank"""
+        
+        self.__checkNumbered()
+        idx = self.__getIndex(taxon_id)
+        
+        # the number of nodes in subtree. Each one has two numbers in interval
+        size = (self.post_order[idx] - self.pre_order[idx] + 1) / 2
+        start = self.positions[idx]
+        
+        if rank is not None:
+            # a rank which is not in index
+            if rank not in self.__rank_to_code:
+                return
+                
+            code = self.__rank_to_code[rank]
+            
+        for position in xrange(start+1, start+size):
+            descendant = self.order[position]
+            
+            if rank is None or self.rank_codes[descendant] == code:
+                yield self.tax_ids[descendant]
+                
+    def iterIntervals(self):
+        """Yield (tax_id, pre_order, post_order) for each node"""
+        
+        self.__checkNumbered()
+        
+        for idx, tax_id in enumerate(self.tax_ids):
+            yield str(tax_id), self.pre_order[idx], self.post_order[idx]
+            
+
+
+class NameIndex():
+    """An in-memory index of names to tax ids, read from names.dmp. Names could
+    be searched ignoring case, and only some name classes could be indexed"""
+    
+    def __init__(self, names_file=None, name_classes=["scientific name"], ignore_case=False):
+        """Instance the class. name_classes is a list of name classes to index
+        (eg. ["scientific name", "synonym"]), None for all classes. Load data if
+        file is provided"""
+        
+        self.name_classes = name_classes
+        self.ignore_case = ignore_case
+        
+        # name -> tax_id, or a tuple of tax_id if name is ambiguous
+        self.index = {}
+        
+        if names_file is not None:
+            self.loadNames(names_file)
+            
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.NameIndex(names={names})>".format(module=self.__module__, names=len(self))
+        
+    def __len__(self):
+        """Return the number of distinct names"""
+        
+        return len(self.index)
+        
+    def __contains__(self, name_txt):
+        """Test if a name is in index"""
+        
+        return self.__key(name_txt) in self.index
+        
+    def __key(self, name_txt):
+        """Return the key of a name"""
+        
+        if isinstance(name_txt, str):
+            name_txt = name_txt.decode("utf-8")
+            
+        if self.ignore_case is True:
+            return name_txt.lower()
+            
+        return name_txt
+        
+    def loadNames(self, dmp_file="names.dmp"):
+        """Read names from a names.dmp file (could be compressed, or a taxdump
+        archive)"""
+        
+        # count names read
+        count = 0
+        
+        logger.info("Reading names...")
+        
+        if self.name_classes is not None:
+            name_classes = set(self.name_classes)
+        
+        handle = openDmp(dmp_file, TaxNamefile.dmp_name)
+        
+        for record in name_parser.iterRecords(handle):
+            if self.name_classes is not None and record.name_class not in name_classes:
+                continue
+                
+            key = self.__key(record.name_txt)
+            tax_id = int(record.tax_id)
+            value = self.index.get(key)
+            
+            if value is None:
+                self.index[key] = tax_id
+                
+            elif type(value) is tuple:
+                if tax_id not in value:
+                    self.index[key] = value + (tax_id,)
+                    
+            elif value != tax_id:
+                self.index[key] = (value, tax_id)
+                
+            count += 1
+            
+        handle.close()
+        
+        logger.info("%s names read, %s distinct names" %(count, len(self)))
+        
+    def getTaxIdsByName(self, name_txt):
+        """Return the sorted tax ids having a name, like TaxGraph.getTaxIdsByName
+        does"""
+        
+        value = self.index.get(self.__key(name_txt))
+        
+        if value is None:
+            return []
+            
+        if type(value) is tuple:
+            return [str(tax_id) for tax_id in sorted(value)]
+            
+        return [str(value)]
+        
+    def getTaxIdsByNames(self, names):
+        """Search many names. Return a list of (name_txt, tax_ids) like
+        TaxGraph.getTaxIdsByNames does"""
+        
+        return [(name_txt, self.getTaxIdsByName(name_txt)) for name_txt in names]
+        
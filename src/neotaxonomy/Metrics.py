@@ -0,0 +1,200 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 16:37:22 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import sys
+import math
+import time
+import array
+import logging
+import threading
+import collections
+
+try:
+    import resource
+    
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+# loading and query stages, in the order they are reported
+STAGES = ["parse", "build", "create", "select", "commit", "query", "rows"]
+
+class Metrics():
+    """Record seconds and items of loading and query stages (parse, build, create,
+    select, commit, query, rows). The latency of each call is kept for percentiles.
+    An optional callback is called with (stage, seconds, items) for each record.
+    Could be shared by many threads"""
+    
+    def __init__(self, callback=None):
+        """Instance the class"""
+        
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.clear()
+        
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.Metrics(stages={stages})>".format(module=self.__module__, stages=self.stages.keys())
+        
+    def record(self, stage, seconds, items=1):
+        """Record a call of a stage, which processed items in seconds"""
+        
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = [0, 0, 0.0]
+                self.latencies[stage] = array.array('d')
+                
+            totals = self.stages[stage]
+            totals[0] += 1
+            totals[1] += items
+            totals[2] += seconds
+            self.latencies[stage].append(seconds)
+            
+        if self.callback is not None:
+            self.callback(stage, seconds, items)
+            
+    def clear(self):
+        """Forget all records"""
+        
+        with self.lock:
+            # stage -> [calls, items, seconds]
+            self.stages = collections.OrderedDict()
+            self.latencies = {}
+            self.start = time.time()
+            
+    def getStats(self):
+        """Return a dictionary of stage -> statistics (calls, items, seconds,
+        rate as items per second, p50 and p95 latency of calls)"""
+        
+        stats = collections.OrderedDict()
+        
+        with self.lock:
+            stages = sorted(self.stages.keys(), key=lambda stage: (STAGES.index(stage) if stage in STAGES else len(STAGES), stage))
+            
+            for stage in stages:
+                calls, items, seconds = self.stages[stage]
+                latencies = sorted(self.latencies[stage])
+                
+                stats[stage] = {
+                    "calls": calls,
+                    "items": items,
+                    "seconds": seconds,
+                    "rate": items / seconds if seconds > 0 else None,
+                    "p50": percentile(latencies, 0.50),
+                    "p95": percentile(latencies, 0.95),
+                }
+                
+        return stats
+        
+    def getSummary(self):
+        """Return a list of lines describing each stage, elapsed time and peak
+        memory"""
+        
+        lines = ["%-8s %10s %12s %10s %14s %10s %10s" %("stage", "calls", "items", "seconds", "items/s", "p50 (ms)", "p95 (ms)")]
+        
+        for stage, stats in self.getStats().iteritems():
+            rate = "%.0f" %(stats["rate"]) if stats["rate"] is not None else "-"
+            lines.append("%-8s %10s %12s %10.2f %14s %10.2f %10.2f" %(stage, stats["calls"], stats["items"], stats["seconds"], rate, stats["p50"] * 1000, stats["p95"] * 1000))
+            
+        lines.append("elapsed %.2fs" %(time.time() - self.start))
+        
+        memory = peakMemory()
+        
+        if memory is not None:
+            lines.append("peak memory %.1f MB" %(memory))
+            
+        return lines
+        
+    
+
+class Stopwatch():
+    """Measure consecutive stages of a loop (ie parse, build, create), and record
+    them in a Metrics object every few items. Does nothing if metrics is None"""
+    
+    def __init__(self, metrics=None):
+        """Instance the class"""
+        
+        self.metrics = metrics
+        self.seconds = collections.OrderedDict()
+        self.last = time.time()
+        
+    def lap(self, stage):
+        """Add the time elapsed since the last lap (or record) to a stage"""
+        
+        if self.metrics is None:
+            return
+            
+        now = time.time()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + now - self.last
+        self.last = now
+        
+    def record(self, items):
+        """Record the time of each stage for items, and start again. Time elapsed
+        since the last lap isn't measured (ie a commit)"""
+        
+        if self.metrics is None:
+            return
+            
+        for stage, seconds in self.seconds.iteritems():
+            self.metrics.record(stage, seconds, items)
+            
+        self.seconds = collections.OrderedDict()
+        self.last = time.time()
+        
+    
+
+def percentile(values, fraction):
+    """Return the value at a fraction (ie 0.95) of sorted values (nearest rank),
+    or 0.0 if there are no values"""
+    
+    if len(values) == 0:
+        return 0.0
+        
+    # nearest rank: the smallest value with at least fraction values below or equal
+    rank = int(math.ceil(fraction * len(values)))
+    
+    return values[min(max(rank, 1), len(values)) - 1]
+    
+def peakMemory():
+    """Return the peak resident memory of this process in MB, or None if it
+    can't be measured"""
+    
+    if resource is None:
+        return None
+        
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    # bytes on Mac OS, kilobytes on Linux
+    if sys.platform == "darwin":
+        return maxrss / 1024.0 / 1024.0
+        
+    return maxrss / 1024.0
+    
@@ -24,17 +24,34 @@ Created on Tue Nov 29 14:02:14 2016
 @author: Paolo Cozzi <paolo.cozzi@ptp.it>
 """
 
+import os
 import re
+import csv
 import time
 import types
+import random
 import py2neo
 import logging
+import threading
 
-from neotaxonomy.exceptions import TaxGraphError
+from neotaxonomy.Cache import LRUCache, PersistentCache
+from neotaxonomy.Metrics import Metrics, Stopwatch
+from neotaxonomy.Taxdump import openDmp, DmpParser, readMerged, readDelnodes, resolveMerged
+from neotaxonomy.exceptions import TaxGraphError, TaxdumpError
 
 # logger instance
 logger = logging.getLogger(__name__)
 
+# connections shared by TaxGraph objects with the same parameters
+connections = {}
+connections_lock = threading.Lock()
+
+def clearConnections():
+    """Forget shared connections. New TaxGraph objects will open new connections"""
+    
+    with connections_lock:
+        connections.clear()
+        
 class TaxGraph():
     """A class to deal with database connections"""
     
@@ -49,14 +66,51 @@ class TaxGraph():
     graph = None
     transaction = None
     
+    # the label of the node with release fingerprint
+    release_label = "TaxRelease"
+    
     def __init__(self, **kwargs):
         """Init class"""
         
         self.__set(**kwargs)
         
-        # in order to do reconnection
+        # in order to do reconnection: the first wait, doubled at each attempt,
+        # and the maximum time spent connecting
         self.max_attempts = 3
-        self.time = 5
+        self.time = 0.5
+        self.deadline = 30
+        
+        # seconds spent opening connection
+        self.connect_time = None
+        
+        # in order to retry transactions failed for transient errors
+        self.max_retries = 10
+        self.retry_time = 0.1
+        
+        # how many tax ids are searched with a single query
+        self.batch_size = 1000
+        
+        # merged (old -> new tax_id) and deleted tax ids
+        self.merged = {}
+        self.deleted = set()
+        
+        # an optional lineage cache, and its cache of ancestor chains (see
+        # enableCache)
+        self.cache = None
+        self.chains = None
+        
+        # an optional lineage cache stored in a file (see openPersistentCache)
+        self.persistent_cache = None
+        
+        # optional timings of loading and query stages (see enableMetrics)
+        self.metrics = None
+        
+        # if lineages are materialized and nodes are numbered for the release in
+        # database, and if scientific names are stored on TaxNodes. None if not
+        # checked yet
+        self.materialized = None
+        self.numbered = None
+        self.scientific_names = None
         
     def __set(self, **kwargs):
         """Set class attributes"""
@@ -69,164 +123,1019 @@ class TaxGraph():
         
         return "<{module}.TaxGraph(host='{host}', user='{user}')>".format(module=self.__module__, host=self.host, user=self.user)
         
-    def connect(self, **kwargs):
-        """connect to database"""
+    def connect(self, shared=True, **kwargs):
+        """connect to database. A connection is shared with other TaxGraph objects
+        with the same parameters in the same process, unless shared is False"""
         
         self.__set(**kwargs)
         
-        # test for connection
-        try:
-            # get a connection
-            self.graph = py2neo.Graph(host=self.host, user=self.user, password=self.password, 
-                                      http_port=self.http_port, https_port=self.https_port,
-                                      bolt=self.bolt, bolt_port=self.bolt_port)
+        # processes can't share connections
+        key = (os.getpid(), self.host, self.user, self.password, self.http_port, self.https_port, self.bolt, self.bolt_port)
         
-            self.graph.schema.get_indexes(TaxNode.label)
+        if shared is False:
+            self.graph = self.__open()
+            return
             
-        except Exception, message:
-            if kwargs.has_key("attempts"):
-                kwargs["attempts"] += 1
-
+        with connections_lock:
+            if key in connections:
+                self.graph = connections[key]
+                self.connect_time = 0.0
+                logger.debug("Using connection to %s" %(self.__repr__()))
+                
             else:
-                kwargs["attempts"] = 1
+                self.graph = self.__open()
+                connections[key] = self.graph
+                
+    def __open(self):
+        """Open a connection to database. Retry with an exponential backoff (with
+        jitter) until max_attempts are done or deadline is reached"""
+        
+        start = time.time()
+        attempts = 0
+        
+        while True:
+            # test for connection
+            try:
+                # get a connection
+                graph = py2neo.Graph(host=self.host, user=self.user, password=self.password, 
+                                     http_port=self.http_port, https_port=self.https_port,
+                                     bolt=self.bolt, bolt_port=self.bolt_port)
+            
+                graph.schema.get_indexes(TaxNode.label)
+                
+                self.connect_time = time.time() - start
+                logger.info("Connected to %s in %.2fs" %(self.__repr__(), self.connect_time))
+                
+                return graph
+                
+            except Exception, message:
+                attempts += 1
+                logger.debug("Attempts done %s" %(attempts))
+                
+                if attempts > self.max_attempts:
+                    raise TaxGraphError("Max attempts reached: %s" %(message))
+                    
+                # wait an exponential time, with jitter, within deadline
+                wait = self.time * 2 ** (attempts-1) * (0.5 + random.random())
+                remaining = self.deadline - (time.time() - start)
+                
+                if remaining <= 0:
+                    raise TaxGraphError("Deadline of %ss reached: %s" %(self.deadline, message))
+                    
+                wait = min(wait, remaining)
+                
+                logger.warn("Error while connecting to %s: %s" %(self.__repr__(), message))
+                logger.warn("retring in %.2f seconds" %(wait))
+                time.sleep(wait)
+                
 
-            logger.debug("Attempts done %s" %(kwargs["attempts"]))
+    def clone(self):
+        """Return a new connected TaxGraph with the same connection parameters,
+        redirects and cache settings. Caches are not shared"""
+        
+        taxgraph = TaxGraph(host=self.host, user=self.user, password=self.password,
+                            http_port=self.http_port, https_port=self.https_port,
+                            bolt=self.bolt, bolt_port=self.bolt_port)
+        
+        taxgraph.max_attempts, taxgraph.time, taxgraph.deadline = self.max_attempts, self.time, self.deadline
+        taxgraph.batch_size = self.batch_size
+        
+        # redirects are only read
+        taxgraph.merged, taxgraph.deleted = self.merged, self.deleted
+        
+        # timings are recorded in the same object
+        taxgraph.metrics = self.metrics
+        
+        # a new connection for each clone
+        taxgraph.connect(shared=False)
+        
+        if self.cache is not None:
+            taxgraph.enableCache(self.cache.maxsize)
+            
+        if self.persistent_cache is not None:
+            taxgraph.openPersistentCache(self.persistent_cache.filename)
+            
+        return taxgraph
+        
+    def begin(self, autocommit=False):
+        """Start a new transaction"""
+        
+        self.transaction = self.graph.begin(autocommit)
+        
+    def commit(self):
+        """Commit a transaction"""
+        
+        start = time.time()
+        
+        try:
+            self.transaction.commit()
+            
+        except Exception, message:
+            raise TaxGraphError(message)
+            
+        self.__record("commit", time.time() - start)
+            
+    def runBatch(self, query, rows):
+        """Execute a query with a list of rows (as {rows} parameter) in a new
+        transaction, and commit it. Return the first value returned by query"""
+        
+        return self.runBatches([(query, rows)])[0]
+        
+    def runBatches(self, statements):
+        """Execute a list of (query, rows) statements in a new transaction, and
+        commit it. Transactions failed for a transient error (like a deadlock
+        between concurrent loaders) are retried. Return the first value returned
+        by each query"""
+        
+        attempts = 0
+        
+        while True:
+            attempts += 1
+            values = []
+            
+            self.begin()
+            
+            try:
+                for query, rows in statements:
+                    start = time.time()
+                    cursor = self.transaction.run(query, rows=rows)
+                    
+                    # get the returned value (if any) before committing
+                    values.append(cursor.evaluate())
+                    self.__record("create", time.time() - start, len(rows))
+                    
+                start = time.time()
+                self.transaction.commit()
+                self.__record("commit", time.time() - start)
+                
+                return values
+                
+            except Exception, message:
+                if attempts < self.max_retries and self.__is_transient(message):
+                    # wait an exponential time, with jitter
+                    wait = self.retry_time * 2 ** (attempts-1) * (1 + random.random())
+                    logger.warn("Transaction failed (%s). Retrying in %.2f seconds" %(message, wait))
+                    time.sleep(wait)
+                    continue
+                
+                raise TaxGraphError(message)
+                
+    def __is_transient(self, error):
+        """Test if an error is transient, and the transaction could be retried"""
+        
+        message = str(error)
+        
+        return type(error).__name__ == "TransientError" or "DeadlockDetected" in message or "LockClient" in message
+            
+    def loadRedirects(self, merged_file=None, delnodes_file=None):
+        """Read merged and deleted tax ids from merged.dmp and delnodes.dmp (could
+        be compressed, or a taxdump archive). Lookups of merged tax ids are then
+        redirected to the new tax id, deleted tax ids fail without querying database"""
+        
+        if merged_file is not None:
+            self.merged.update(readMerged(merged_file))
+            
+        if delnodes_file is not None:
+            self.deleted.update(readDelnodes(delnodes_file))
+            
+        logger.info("%s merged and %s deleted tax ids loaded" %(len(self.merged), len(self.deleted)))
+        
+    def resolveTaxId(self, taxon_id):
+        """Return the tax_id (as a string) to search in database, following merged
+        tax ids. Raise TaxGraphError for deleted tax ids"""
+        
+        try:
+            tax_id = resolveMerged(self.merged, taxon_id)
+            
+        except TaxdumpError, message:
+            raise TaxGraphError(message)
+            
+        if tax_id in self.deleted:
+            raise TaxGraphError("Tax id %s was deleted" %(taxon_id))
+            
+        if tax_id != str(taxon_id):
+            logger.debug("Tax id %s was merged into %s" %(taxon_id, tax_id))
+            
+        return tax_id
+        
+    def enableCache(self, maxsize=10000):
+        """Cache lineages and ancestor chains of the maxsize most recently used
+        items. Ancestor chains are reused for taxa sharing a cached parent. They
+        are stored in another cache (of the same size), so they don't evict
+        lineages and they aren't counted in cache statistics"""
+        
+        self.cache = LRUCache(maxsize)
+        self.chains = LRUCache(maxsize)
+        
+    def disableCache(self):
+        """Disable lineage cache"""
+        
+        self.cache = None
+        self.chains = None
+        
+    def clearCache(self):
+        """Remove all cached lineages (ie after loading or updating data)"""
+        
+        if self.cache is not None:
+            self.cache.clear()
+            self.chains.clear()
+            
+        # materialized lineages could be stale
+        self.materialized = None
+        self.numbered = None
+        self.scientific_names = None
+            
+    def getCacheStats(self):
+        """Return a dictionary of cache statistics, or None if cache is disabled"""
+        
+        if self.cache is None:
+            return None
+            
+        return self.cache.getStats()
+        
+    def enableMetrics(self, callback=None):
+        """Record timings and counts of loading and query stages in a Metrics
+        object (self.metrics). callback, if provided, is called with (stage,
+        seconds, items) for each record"""
+        
+        self.metrics = Metrics(callback)
+        
+    def disableMetrics(self):
+        """Stop recording timings"""
+        
+        self.metrics = None
+        
+    def getMetrics(self):
+        """Return a dictionary of stage statistics, or None if metrics are
+        disabled"""
+        
+        if self.metrics is None:
+            return None
+            
+        return self.metrics.getStats()
+        
+    def __record(self, stage, seconds, items=1):
+        """Record a stage timing, if metrics are enabled"""
+        
+        if self.metrics is not None:
+            self.metrics.record(stage, seconds, items)
+            
+    def __run(self, query, **parameters):
+        """Run a query, and record the time spent to get its cursor"""
+        
+        start = time.time()
+        cursor = self.graph.run(query, **parameters)
+        self.__record("query", time.time() - start)
+        
+        return cursor
+        
+    def __fetch(self, cursor):
+        """Read all records from a cursor and close it. Record the time spent
+        reading rows. Return a list of records"""
+        
+        start = time.time()
+        records = list(cursor)
+        cursor.close()
+        self.__record("rows", time.time() - start, len(records))
+        
+        return records
+        
+    def getRelease(self):
+        """Return the fingerprint of the taxonomy release in database, or None if
+        it was not set with setRelease"""
+        
+        query = """MATCH (release:%s) RETURN release.fingerprint LIMIT 1""" %(self.release_label)
+        
+        try:
+            release = self.graph.run(query).evaluate()
+            
+        except AttributeError, message:
+            raise TaxGraphError("You need to connect to database before reading release: %s" %(message))
+            
+        return release
+        
+    def setRelease(self, fingerprint):
+        """Store the fingerprint of the taxonomy release in database (ie the value
+        returned by neotaxonomy.Taxdump.fingerprint after loading data)"""
+        
+        query = """MERGE (release:%s) SET release.fingerprint = {fingerprint}, release.loaded = timestamp()""" %(self.release_label)
+        
+        try:
+            self.graph.run(query, fingerprint=fingerprint)
+            
+        except AttributeError, message:
+            raise TaxGraphError("You need to connect to database before setting release: %s" %(message))
+            
+        logger.info("Release set to %s" %(fingerprint))
+        
+    def openPersistentCache(self, filename):
+        """Store lineages in a SQLite file, tagged with the release in database.
+        Cached lineages are searched before querying database. Raise TaxGraphError
+        if release was not set with setRelease, since lineages could be stale"""
+        
+        release = self.getRelease()
+        
+        if release is None:
+            raise TaxGraphError("No release in database: set it with setRelease (or load data with fillTaxonomyDB) before using a persistent cache")
+            
+        self.persistent_cache = PersistentCache(filename, release, self.batch_size)
+        
+        logger.info("Using %s" %(self.persistent_cache))
+        
+    def closePersistentCache(self):
+        """Write pending lineages and close the persistent cache"""
+        
+        if self.persistent_cache is not None:
+            self.persistent_cache.close()
+            self.persistent_cache = None
+            
+    # A function to get lineage from tax id
+    def getLineage(self, taxon_id, ranks=["superKingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"], resolved=False):
+        """Get lineage from tax id. Only specified ranks will be returned. Each rank
+        need to have a capital letter in order to by prefixed in name (eg. Species -> s__.
+        With resolved=True, return a (resolved_id, lineage) tuple, where resolved_id
+        is the tax_id found in database (could be different for merged tax ids)"""
+        
+        # get the prefix of each rank and lower ranks for semplicity
+        ranks, letters = parseRanks(ranks)
+        
+        # build lineage from query results
+        resolved_id = self.resolveTaxId(taxon_id)
+        lineage = self.__get_lineage(resolved_id, False, ("lineage", lineageKey(ranks, letters)), lambda rows: rowsToLineage(rows, ranks, letters))
+        
+        # check number of results
+        if lineage is None:
+            raise TaxGraphError("No lineage found for %s" %(taxon_id))
+            
+        if resolved is True:
+            return resolved_id, lineage
 
-            if kwargs["attempts"] <= self.max_attempts:
-                logger.warn("Error while connecting to %s: %s" %(self.__repr__(), message))
-                logger.warn("retring in %s seconds" %(self.time))
-                time.sleep(self.time)
-                self.connect(**kwargs)
+        return lineage
+        
+    # A function to get full lineage
+    def getFullLineage(self, taxon_id, abbreviated=False, resolved=False):
+        """Get full lineage for a taxa id (abbreviated or not). With resolved=True,
+        return a (resolved_id, lineage) tuple, like getLineage does"""
+        
+        # build lineage from query results
+        resolved_id = self.resolveTaxId(taxon_id)
+        lineage = self.__get_lineage(resolved_id, abbreviated, (fullMode(abbreviated), None), rowsToFullLineage)
+        
+        # check number of results
+        if lineage is None:
+            raise TaxGraphError("No lineage found for %s" %(taxon_id))
+            
+        if resolved is True:
+            return resolved_id, lineage
+
+        return lineage
+        
+    def getLineages(self, taxa_ids, ranks=["superKingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"]):
+        """Get lineages for many tax ids, with a query every batch_size ids. Return
+        a list of (taxon_id, resolved_id, lineage, error) in the same order of
+        taxa_ids, where resolved_id is the tax_id found in database (could be
+        different for merged tax ids). For unknown or deleted tax ids resolved_id
+        and lineage are None and error is a message"""
+        
+        # get the prefix of each rank and lower ranks for semplicity
+        ranks, letters = parseRanks(ranks)
+        
+        return self.__get_lineages(taxa_ids, False, ("lineage", lineageKey(ranks, letters)), lambda rows: rowsToLineage(rows, ranks, letters))
+        
+    def getFullLineages(self, taxa_ids, abbreviated=False):
+        """Get full lineages (abbreviated or not) for many tax ids. Return a list
+        of (taxon_id, resolved_id, lineage, error) in the same order of taxa_ids"""
+        
+        return self.__get_lineages(taxa_ids, abbreviated, (fullMode(abbreviated), None), rowsToFullLineage)
+        
+    def __get_lineage(self, tax_id, abbreviated, mode, build):
+        """Get the lineage of a tax_id (or None), from cache if enabled. mode is
+        a (mode, ranks) tuple used as part of cache key, build a function which
+        returns a lineage from query rows"""
+        
+        key = (tax_id,) + mode
+        lineage = self.__get_cached(key)
+        
+        if lineage is not None:
+            # a copy, since lineage could be modified by caller
+            return list(lineage)
+            
+        # read materialized lineage, if any
+        rows = None
+        
+        if self.isMaterialized():
+            rows = self.__query_materialized(tax_id, abbreviated)
+            
+        if rows is not None:
+            lineage = build(rows)
+            
+        elif self.cache is None:
+            # call function to do query
+            cursor = self.__query_lineage(tax_id, abbreviated)
+            lineage = build(self.__fetch(cursor))
+            
+        else:
+            chain = self.__get_chain(tax_id)
+            
+            if chain is None:
+                return None
+                
+            lineage = build(chainToRows(chain, abbreviated))
+            
+        if lineage is None:
+            return None
+            
+        self.__set_cached(key, lineage)
+        
+        return list(lineage)
+        
+    def __get_lineages(self, taxa_ids, abbreviated, mode, build):
+        """Get lineages for many taxa, like __get_lineage. Only taxa not in cache
+        are searched in database"""
+        
+        # results in the same order of input, and taxa to search in database
+        results, missing = [], []
+        
+        for taxon_id in taxa_ids:
+            try:
+                resolved_id = self.resolveTaxId(taxon_id)
+                
+            except TaxGraphError, message:
+                # deleted tax ids, or loops in merged tax ids
+                results.append((taxon_id, None, None, str(message)))
+                continue
+                
+            lineage = self.__get_cached((resolved_id,) + mode)
+            
+            if lineage is not None:
+                results.append(self.__lineage_result(taxon_id, resolved_id, list(lineage)))
                 
             else:
-                raise TaxGraphError("Max attempts reached: %s" %(message))
+                # a placeholder for query results
+                missing.append(len(results))
+                results.append((taxon_id, resolved_id))
                 
-    def begin(self, autocommit=False):
-        """Start a new transaction"""
+        for position, (taxon_id, resolved_id, rows) in zip(missing, self.__query_lineages([results[position] for position in missing], abbreviated)):
+            lineage = build(rows)
+            
+            if lineage is not None:
+                self.__set_cached((resolved_id,) + mode, lineage)
+                lineage = list(lineage)
+                
+            results[position] = self.__lineage_result(taxon_id, resolved_id, lineage)
+            
+        return results
+        
+    def __get_cached(self, key):
+        """Search a lineage in memory, then in persistent cache. Return None if
+        not found (or if caches are disabled)"""
+        
+        lineage = None
+        
+        if self.cache is not None:
+            lineage = self.cache.get(key)
+            
+        if lineage is None and self.persistent_cache is not None:
+            lineage = self.persistent_cache.get(key)
+            
+            if lineage is not None and self.cache is not None:
+                self.cache.set(key, lineage)
+                
+        return lineage
+        
+    def __set_cached(self, key, lineage):
+        """Store a lineage in enabled caches"""
+        
+        if self.cache is not None:
+            self.cache.set(key, lineage)
+            
+        if self.persistent_cache is not None:
+            self.persistent_cache.set(key, lineage)
+            
+    def __lineage_result(self, taxon_id, resolved_id, lineage):
+        """Return a (taxon_id, resolved_id, lineage, error) tuple for batch methods"""
+        
+        if lineage is None:
+            return (taxon_id, None, None, "No lineage found for %s" %(taxon_id))
+            
+        return (taxon_id, resolved_id, lineage, None)
+        
+    def __get_chain(self, tax_id):
+        """Return the ancestors of a tax_id, as a tuple of (tax_id, rank, hidden_flag,
+        scientific name) from tax_id to root, or None. Chains are cached"""
+        
+        chain = self.chains.get(tax_id)
+        
+        if chain is not None:
+            return chain
+            
+        # search for taxon and its parent. If parent chain is cached, I don't
+        # need to traverse the tree
+        if self.hasScientificNames():
+            query = """MATCH (node:TaxNode {tax_id: {taxon_id}}) WHERE exists(node.scientific_name) OPTIONAL MATCH (parent:TaxNode)-[:PARENT]->(node) RETURN node.rank, node.hidden_flag, node.scientific_name, parent.tax_id"""
+            
+        else:
+            query = """MATCH (node:TaxNode {tax_id: {taxon_id}})-[:SCIENTIFIC_NAME]->(name:TaxName) OPTIONAL MATCH (parent:TaxNode)-[:PARENT]->(node) RETURN node.rank, node.hidden_flag, name.name_txt, parent.tax_id"""
+        
+        try:
+            cursor = self.__run(query, taxon_id=tax_id)
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for lineage: %s" %(message))
+            
+        rows = self.__fetch(cursor)
+        
+        if len(rows) == 0:
+            return None
+            
+        rank, hidden_flag, name_txt, parent_id = rows[0]
+        
+        if parent_id is None:
+            chain = ((tax_id, rank, hidden_flag, name_txt),)
+            
+        else:
+            parent_chain = self.chains.get(parent_id)
+            
+            if parent_chain is not None:
+                chain = ((tax_id, rank, hidden_flag, name_txt),) + parent_chain
+                
+            else:
+                # get all ancestors, sorted from taxon to root
+                if self.hasScientificNames():
+                    query = """MATCH path=(node:TaxNode {tax_id: {taxon_id}})<-[:PARENT*0..]-(parent:TaxNode) WHERE exists(parent.scientific_name) RETURN parent.tax_id, parent.rank, parent.hidden_flag, parent.scientific_name ORDER BY length(path)"""
+                    
+                else:
+                    query = """MATCH path=(node:TaxNode {tax_id: {taxon_id}})<-[:PARENT*0..]-(parent:TaxNode) MATCH (parent)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) RETURN parent.tax_id, parent.rank, parent.hidden_flag, parent_name.name_txt ORDER BY length(path)"""
+                
+                cursor = self.__run(query, taxon_id=tax_id)
+                chain = tuple([tuple(row) for row in self.__fetch(cursor)])
+                
+                if len(chain) == 0:
+                    return None
+                    
+        # cache the chain of each ancestor
+        for i in range(len(chain)):
+            self.chains.set(chain[i][0], chain[i:])
+            
+        return chain
+        
+    def getTaxIdsByName(self, name_txt, name_classes=None):
+        """Return the sorted tax ids having a name (exact match). name_classes is
+        a list of name classes to search (eg. ["scientific name", "synonym"]), None
+        for all classes"""
+        
+        query = """MATCH (node:%s)-[relationship]->(name:%s) WHERE name.name_txt = {name_txt} %s RETURN DISTINCT node.tax_id""" %(TaxNode.label, TaxName.label, nameClassFilter(name_classes))
+        
+        try:
+            cursor = self.__run(query, name_txt=toUnicode(name_txt), relationships=relationshipNames(name_classes))
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for names: %s" %(message))
+            
+        tax_ids = sorted([tax_id for (tax_id,) in self.__fetch(cursor)], key=int)
+        
+        return tax_ids
+        
+    def getTaxIdsByNames(self, names, name_classes=None):
+        """Search many names, with a query every batch_size names. Return a list
+        of (name_txt, tax_ids) in the same order of names. Unknown names have an
+        empty list of tax ids"""
+        
+        query = """UNWIND {names} AS name_txt MATCH (node:%s)-[relationship]->(name:%s {name_txt: name_txt}) WHERE true %s RETURN DISTINCT name_txt, node.tax_id""" %(TaxNode.label, TaxName.label, nameClassFilter(name_classes))
+        
+        results = []
+        
+        for chunk in iterChunks(names, self.batch_size):
+            # search each name once
+            all_tax_ids = dict([(toUnicode(name_txt), []) for name_txt in chunk])
+            
+            try:
+                cursor = self.__run(query, names=all_tax_ids.keys(), relationships=relationshipNames(name_classes))
+            
+            except AttributeError, message:
+                raise TaxGraphError("You have to connect to database before serching for names: %s" %(message))
+                
+            for name_txt, tax_id in self.__fetch(cursor):
+                all_tax_ids[name_txt].append(tax_id)
+            
+            for name_txt in chunk:
+                results.append((name_txt, sorted(all_tax_ids[toUnicode(name_txt)], key=int)))
+                
+        return results
+        
+    def __get_interval(self, tax_id):
+        """Return the (pre_order, post_order) numbers of a taxon (None if nodes
+        are not numbered). Raise TaxGraphError for unknown taxa"""
+        
+        query = """MATCH (node:%s {tax_id: {taxon_id}}) RETURN node.pre_order, node.post_order""" %(TaxNode.label)
+        
+        try:
+            cursor = self.graph.run(query, taxon_id=tax_id)
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for descendants: %s" %(message))
+            
+        records = list(cursor)
+        cursor.close()
+        
+        if len(records) == 0:
+            raise TaxGraphError("Tax id %s not found" %(tax_id))
+            
+        return records[0]
+        
+    def isAncestor(self, ancestor_id, taxon_id):
+        """Return True if a taxon is a descendant of another taxon. Use pre and
+        post-order numbers if nodes are numbered, or traverse the tree"""
+        
+        ancestor_id, tax_id = self.resolveTaxId(ancestor_id), self.resolveTaxId(taxon_id)
+        
+        ancestor_pre, ancestor_post = self.__get_interval(ancestor_id)
+        pre, post = self.__get_interval(tax_id)
+        
+        if self.isNumbered() is True:
+            return ancestor_pre < pre and post < ancestor_post
+            
+        query = """MATCH (node:%s {tax_id: {taxon_id}})<-[:PARENT*]-(ancestor:%s {tax_id: {ancestor_id}}) RETURN count(ancestor)""" %(TaxNode.label, TaxNode.label)
+        
+        try:
+            cursor = self.graph.run(query, taxon_id=tax_id, ancestor_id=ancestor_id)
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for ancestors: %s" %(message))
+            
+        count = cursor.evaluate()
+        cursor.close()
+        
+        return count > 0
+        
+    def getDescendants(self, taxon_id, rank=None):
+        """Yield the tax ids of all descendants of a taxon, optionally only those
+        of a rank. If nodes are numbered, descendants are read in pre-order with a
+        range query every batch_size nodes"""
+        
+        tax_id = self.resolveTaxId(taxon_id)
+        start, end = self.__get_interval(tax_id)
+        
+        rank_filter = "AND node.rank = {rank}" if rank is not None else ""
+        
+        if self.isNumbered() is False:
+            query = """MATCH (parent:%s {tax_id: {taxon_id}})-[:PARENT*]->(node:%s) WHERE true %s RETURN node.tax_id""" %(TaxNode.label, TaxNode.label, rank_filter)
+            cursor = self.graph.run(query, taxon_id=tax_id, rank=rank)
+            
+            for (descendant,) in cursor:
+                yield descendant
+                
+            cursor.close()
+            return
+            
+        query = """MATCH (node:%s) WHERE node.pre_order > {start} AND node.pre_order < {end} %s RETURN node.tax_id, node.pre_order ORDER BY node.pre_order LIMIT {limit}""" %(TaxNode.label, rank_filter)
+        
+        while True:
+            cursor = self.graph.run(query, start=start, end=end, rank=rank, limit=self.batch_size)
+            records = list(cursor)
+            cursor.close()
+            
+            for descendant, start in records:
+                yield descendant
+                
+            if len(records) < self.batch_size:
+                break
+                
+    def isMaterialized(self):
+        """Return True if lineages are materialized (see
+        neotaxonomy.Update.materializeLineages) for the release in database"""
+        
+        if self.materialized is None:
+            self.__check_release()
+            
+        return self.materialized
+        
+    def isNumbered(self):
+        """Return True if TaxNodes have pre and post-order numbers (see
+        neotaxonomy.Update.storeIntervals) for the release in database"""
+        
+        if self.numbered is None:
+            self.__check_release()
+            
+        return self.numbered
+        
+    def hasScientificNames(self):
+        """Return True if scientific names are stored on TaxNodes (see
+        neotaxonomy.Update.denormalizeNames)"""
+        
+        if self.scientific_names is None:
+            self.__check_release()
+            
+        return self.scientific_names
+        
+    def __check_release(self):
+        """Read how lineages could be searched from release in database"""
+        
+        query = """MATCH (release:%s) RETURN release.materialized = release.fingerprint, release.numbered = release.fingerprint, release.scientific_names""" %(self.release_label)
+        
+        try:
+            cursor = self.graph.run(query)
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for lineage: %s" %(message))
+            
+        records = list(cursor)
+        cursor.close()
+        
+        if len(records) == 0:
+            records = [(None, None, None)]
+            
+        materialized, numbered, scientific_names = records[0]
+        self.materialized = (materialized is True)
+        self.numbered = (numbered is True)
+        self.scientific_names = (scientific_names is True)
+        
+        if self.materialized is False:
+            logger.debug("Lineages are not materialized. Using traversal queries")
+        
+    def __query_materialized(self, tax_id, abbreviated=False):
+        """Read materialized lineage of a taxa. Return rows like __query_lineage,
+        or None if lineage is not materialized for this taxa"""
+        
+        query = """MATCH (node:%s {tax_id: {taxon_id}}) RETURN node.lineage_names, node.lineage_ranks, node.lineage_abbreviated""" %(TaxNode.label)
+        
+        cursor = self.__run(query, taxon_id=tax_id)
+        records = self.__fetch(cursor)
+        
+        # unknown taxa
+        if len(records) == 0:
+            return []
+            
+        names, ranks, abbreviated_names = records[0]
+        
+        if names is None:
+            return None
+            
+        return materializedToRows(names, ranks, abbreviated_names, abbreviated)
+        
+    def __query_lineage(self, taxon_id, abbreviated=False):
+        """Internal query for a taxa"""
+        
+        # scientific names are stored on nodes: I don't need to join TaxNames
+        if self.hasScientificNames():
+            query = """MATCH (organism:TaxNode)<-[:PARENT*]-(parent:TaxNode) WHERE organism.tax_id = {taxon_id} AND exists(organism.scientific_name) AND exists(parent.scientific_name) %s RETURN organism.scientific_name, organism.rank, parent.rank, parent.scientific_name"""
+            
+            if abbreviated is True:
+                query = query %("AND parent.hidden_flag='0'")
+                
+            else:
+                query = query %("")
+                
+        # define query. Abbreviated or not (get full lineage or the impotant lineage)
+        elif abbreviated is True:
+            query = """MATCH (specie:TaxName)<-[:SCIENTIFIC_NAME]-(organism:TaxNode)<-[:PARENT*]-(parent:TaxNode)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) WHERE organism.tax_id = {taxon_id} AND parent.hidden_flag='0' RETURN specie.name_txt, organism.rank, parent.rank, parent_name.name_txt"""
+        
+        else:
+            query = """MATCH (specie:TaxName)<-[:SCIENTIFIC_NAME]-(organism:TaxNode)<-[:PARENT*]-(parent:TaxNode)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) WHERE organism.tax_id = {taxon_id} RETURN specie.name_txt, organism.rank, parent.rank, parent_name.name_txt"""
+        
+        # execute query
+        try:
+            cursor = self.__run(query, taxon_id=str(taxon_id))
+        
+        except AttributeError, message:
+            raise TaxGraphError("You have to connect to database before serching for lineage: %s" %(message))
+            
+        return cursor
         
-        self.transaction = self.graph.begin(autocommit)
+    def __query_lineages(self, taxa, abbreviated=False):
+        """Internal query for many (taxon_id, resolved_id) taxa. Yield (taxon_id,
+        resolved_id, rows) in the same order of taxa, rows are sorted from the
+        nearest parent to root like in __query_lineage. Deleted tax ids have a
+        None resolved_id and are not searched"""
         
-    def commit(self):
-        """Commit a transaction"""
+        # the same query of __query_lineage, for a list of tax_id. I need depth to
+        # sort rows since results of different taxa are mixed
+        query = """UNWIND {taxa_ids} AS taxon_id MATCH (specie:TaxName)<-[:SCIENTIFIC_NAME]-(organism:TaxNode {tax_id: taxon_id}) MATCH path=(organism)<-[:PARENT*]-(parent:TaxNode) MATCH (parent)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) %s RETURN organism.tax_id, length(path), specie.name_txt, organism.rank, parent.rank, parent_name.name_txt"""
         
-        try:
-            self.transaction.commit()
+        if abbreviated is True:
+            query = query %("WHERE parent.hidden_flag='0'")
             
-        except Exception, message:
-            raise TaxGraphError(message)
+        else:
+            query = query %("")
             
-    # A function to get lineage from tax id
-    def getLineage(self, taxon_id, ranks=["superKingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"]):
-        """Get lineage from tax id. Only specified ranks will be returned. Each rank
-        need to have a capital letter in order to by prefixed in name (eg. Species -> s__"""
-        
-        # I want to add a prefix for each order in scientific name. The prefix will be
-        # the capital letter present in ranks
-        # TODO: test for no capital letter in ranks
-        pattern = re.compile("[A-Z]")
-        matches = [re.search(pattern, rank) for rank in ranks]
-        letters = [ranks[i][match.start()].lower() for i, match in enumerate(matches)]
-        lineage = [u"%s__" %(letter) for letter in letters]
-                   
-        # lower ranks for semplicity
-        ranks = [rank.lower() for rank in ranks]
-        
-        # call function to do query
-        cursor = self.__query_lineage(taxon_id)
-        
-        # a flag for myself
-        flag_taxon = False
-        
-        # count results processed
-        count = 0
+        # scientific names are stored on nodes: I don't need to join TaxNames
+        if self.hasScientificNames():
+            query = """UNWIND {taxa_ids} AS taxon_id MATCH (organism:TaxNode {tax_id: taxon_id}) WHERE exists(organism.scientific_name) MATCH path=(organism)<-[:PARENT*]-(parent:TaxNode) WHERE exists(parent.scientific_name) %s RETURN organism.tax_id, length(path), organism.scientific_name, organism.rank, parent.rank, parent.scientific_name"""
             
-        # cicle amoung cursor
-        for (tax_name, tax_rank, parent_rank, parent_name) in cursor:
-            # count a result
-            count += 1
+            if abbreviated is True:
+                query = query %("AND parent.hidden_flag='0'")
+                
+            else:
+                query = query %("")
+        
+        # read materialized lineages, if any
+        materialized_query = """UNWIND {taxa_ids} AS taxon_id MATCH (node:%s {tax_id: taxon_id}) RETURN node.tax_id, node.lineage_names, node.lineage_ranks, node.lineage_abbreviated""" %(TaxNode.label)
+        
+        # process taxa in chunks
+        for chunk in iterChunks(taxa, self.batch_size):
+            # tax_id are stored as strings. Query each taxon once
+            all_rows = dict([(resolved_id, []) for taxon_id, resolved_id in chunk if resolved_id is not None])
             
-            if flag_taxon == False:
-                # consider specie and remove genere
-                if tax_rank == u"species":
-                    tax_name = tax_name.split()[-1]
-
-                if tax_rank in ranks:
-                    idx = ranks.index(tax_rank)
-                    lineage[idx]= "%s__%s" %(letters[idx], tax_name)
-                    # i found myself
-                    flag_taxon = True
+            # taxa to search with a traversal query
+            missing = all_rows.keys()
             
-            # cicle for parent
-            if parent_rank in ranks:
-                idx = ranks.index(parent_rank)
-                lineage[idx] = "%s__%s" %(letters[idx], parent_name)
+            if len(missing) > 0 and self.isMaterialized():
+                cursor = self.__run(materialized_query, taxa_ids=missing)
+                missing = []
                 
-        # closing cursor
-        cursor.close()
+                for tax_id, names, ranks, abbreviated_names in self.__fetch(cursor):
+                    if names is None:
+                        missing.append(tax_id)
+                        continue
+                        
+                    rows = materializedToRows(names, ranks, abbreviated_names, abbreviated)
+                    all_rows[tax_id] = [(depth,) + row for depth, row in enumerate(rows)]
+                
+            if len(missing) > 0:
+                # execute query
+                try:
+                    cursor = self.__run(query, taxa_ids=missing)
+                
+                except AttributeError, message:
+                    raise TaxGraphError("You have to connect to database before serching for lineage: %s" %(message))
+                    
+                for (tax_id, depth, tax_name, tax_rank, parent_rank, parent_name) in self.__fetch(cursor):
+                    all_rows[tax_id].append((depth, tax_name, tax_rank, parent_rank, parent_name))
+            
+            for taxon_id, resolved_id in chunk:
+                rows = sorted(all_rows.get(resolved_id, []))
+                yield taxon_id, resolved_id, [row[1:] for row in rows]
         
-        # check number of results
-        if count == 0:
-            raise TaxGraphError("No lineage found for %s" %(taxon_id))
 
-        return lineage
-        
-    # A function to get full lineage
-    def getFullLineage(self, taxon_id, abbreviated=False):
-        """Get full lineage for a taxa id (abbreviated or not)"""
+
+def nameIndex(tax_id, name_txt, unique_name):
+    """Get the unique index of a name, as (tax_id, name)"""
+    
+    # add new property
+    if unique_name == '':
+        index = (tax_id, name_txt)
+    
+    else:
+        index = (tax_id, unique_name)
+    
+    return str(index)
+    
+def relationshipName(name_class):
+    """Get the relationship name from name class (eg. SCIENTIFIC_NAME)"""
+    
+    return name_class.replace(" ", "_").upper()
+    
+def relationshipNames(name_classes=None):
+    """Get relationship names from a list of name classes (or None)"""
+    
+    if name_classes is None:
+        return None
         
-        # initalize variable
-        lineage = []
+    return [relationshipName(name_class) for name_class in name_classes]
+    
+def nameClassFilter(name_classes=None):
+    """Return a condition on relationship type for name queries (with a
+    {relationships} parameter), or an empty string to search all name classes"""
+    
+    if name_classes is None:
+        return ""
         
-        # call function to do query
-        cursor = self.__query_lineage(taxon_id, abbreviated)
+    return "AND type(relationship) IN {relationships}"
+    
+def toUnicode(value):
+    """Decode an utf-8 string, like names returned by database"""
+    
+    if isinstance(value, str):
+        return value.decode("utf-8")
         
-        # a flag for myself
-        flag_taxon = False
+    return value
+    
+def iterChunks(iterable, size):
+    """Split an iterable in lists of size elements"""
+    
+    chunk = []
+    
+    for element in iterable:
+        chunk.append(element)
         
-        # count results processed
-        count = 0
-            
-        # cicle amoung cursor
-        for (tax_name, tax_rank, parent_rank, parent_name) in cursor:
-            # count a result
-            count += 1
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
             
-            # insert the leaf node of lineage
-            if flag_taxon == False:
-                lineage.insert(0, tax_name)
+    if len(chunk) > 0:
+        yield chunk
+        
+def parseRanks(ranks):
+    """Return lowered ranks and the letters used to prefix names in lineage. The
+    prefix will be the capital letter present in ranks (eg. Species -> s__)"""
+    
+    # TODO: test for no capital letter in ranks
+    pattern = re.compile("[A-Z]")
+    matches = [re.search(pattern, rank) for rank in ranks]
+    letters = [ranks[i][match.start()].lower() for i, match in enumerate(matches)]
+    
+    return [rank.lower() for rank in ranks], letters
+    
+def lineageKey(ranks, letters):
+    """Return the part of cache keys describing a rank-prefixed lineage. Letters
+    are needed, since the same ranks could have different prefixes"""
+    
+    return tuple(zip(ranks, letters))
+    
+def rowsToLineage(rows, ranks, letters):
+    """Build a rank-prefixed lineage from (tax_name, tax_rank, parent_rank,
+    parent_name) rows. Ranks and letters are returned by parseRanks. Return None
+    if there are no rows"""
+    
+    lineage = [u"%s__" %(letter) for letter in letters]
+    
+    # a flag for myself
+    flag_taxon = False
+    
+    # count results processed
+    count = 0
+        
+    # cicle amoung rows
+    for (tax_name, tax_rank, parent_rank, parent_name) in rows:
+        # count a result
+        count += 1
+        
+        if flag_taxon == False:
+            # consider specie and remove genere
+            if tax_rank == u"species":
+                tax_name = tax_name.split()[-1]
+
+            if tax_rank in ranks:
+                idx = ranks.index(tax_rank)
+                lineage[idx]= "%s__%s" %(letters[idx], tax_name)
+                # i found myself
                 flag_taxon = True
+        
+        # cicle for parent
+        if parent_rank in ranks:
+            idx = ranks.index(parent_rank)
+            lineage[idx] = "%s__%s" %(letters[idx], parent_name)
             
-            # process the parent
-            lineage.insert(0, parent_name)
-                
-        # closing cursor
-        cursor.close()
+    if count == 0:
+        return None
         
-        # check number of results
-        if count == 0:
-            raise TaxGraphError("No lineage found for %s" %(taxon_id))
-
-        return lineage
+    return lineage
+    
+def rowsToFullLineage(rows):
+    """Build a full lineage from (tax_name, tax_rank, parent_rank, parent_name)
+    rows, sorted from the nearest parent to root. Return None if there are no rows"""
+    
+    # initalize variable
+    lineage = []
+    
+    # a flag for myself
+    flag_taxon = False
         
-    def __query_lineage(self, taxon_id, abbreviated=False):
-        """Internal query for a taxa"""
+    # cicle amoung rows
+    for (tax_name, tax_rank, parent_rank, parent_name) in rows:
+        # insert the leaf node of lineage
+        if flag_taxon == False:
+            lineage.insert(0, tax_name)
+            flag_taxon = True
         
-        # define query. Abbreviated or not (get full lineage or the impotant lineage)
-        if abbreviated is True:
-            query = """MATCH (specie:TaxName)<-[:SCIENTIFIC_NAME]-(organism:TaxNode)<-[:PARENT*]-(parent:TaxNode)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) WHERE organism.tax_id = {taxon_id} AND parent.hidden_flag='0' RETURN specie.name_txt, organism.rank, parent.rank, parent_name.name_txt"""
+        # process the parent
+        lineage.insert(0, parent_name)
         
-        else:
-            query = """MATCH (specie:TaxName)<-[:SCIENTIFIC_NAME]-(organism:TaxNode)<-[:PARENT*]-(parent:TaxNode)-[:SCIENTIFIC_NAME]->(parent_name:TaxName) WHERE organism.tax_id = {taxon_id} RETURN specie.name_txt, organism.rank, parent.rank, parent_name.name_txt"""
+    if flag_taxon == False:
+        return None
         
-        # execute query
-        try:
-            cursor = self.graph.run(query, taxon_id=str(taxon_id))
+    return lineage
+
+def materializedToRows(names, ranks, abbreviated_names, abbreviated=False):
+    """Convert materialized lineage properties (sorted from root to taxon) in
+    (tax_name, tax_rank, parent_rank, parent_name) rows, from the nearest parent
+    to root like lineage queries"""
+    
+    tax_name, tax_rank = names[-1], ranks[-1]
+    
+    # full lineages don't need parent ranks
+    if abbreviated is True:
+        return [(tax_name, tax_rank, None, parent_name) for parent_name in reversed(abbreviated_names[:-1])]
         
-        except AttributeError, message:
-            raise TaxGraphError("You have to connect to database before serching for lineage: %s" %(message))
-            
-        return cursor
+    return [(tax_name, tax_rank, parent_rank, parent_name) for parent_rank, parent_name in reversed(zip(ranks[:-1], names[:-1]))]
+    
+def fullMode(abbreviated=False):
+    """Return the name of full lineage mode, used in cache keys"""
+    
+    if abbreviated is True:
+        return "abbreviated"
         
+    return "full"
+    
+def chainToRows(chain, abbreviated=False):
+    """Convert an ancestor chain of (tax_id, rank, hidden_flag, name) from taxon
+    to root in (tax_name, tax_rank, parent_rank, parent_name) rows, like the ones
+    returned by lineage queries"""
+    
+    tax_id, tax_rank, hidden_flag, tax_name = chain[0]
+    
+    return [(tax_name, tax_rank, parent_rank, parent_name) for parent_id, parent_rank, parent_hidden_flag, parent_name in chain[1:] if abbreviated is False or parent_hidden_flag == '0']
+
 
 class TaxBase():
     """Base class for taxonomy elements"""
@@ -253,14 +1162,21 @@ class TaxBase():
         
         return [el.strip() for el in record.split("|")]
                 
-    def getNeo4j(self):
-        """Get a neo4j object"""
+    def getProperties(self):
+        """Get a dictionary of neo4j properties"""
         
         # define properties
         properties = {}
 
         for key in self.properties:
             properties[key] = getattr(self, key)
+            
+        return properties
+                
+    def getNeo4j(self):
+        """Get a neo4j object"""
+        
+        properties = self.getProperties()
         
         node = py2neo.Node(self.label, **properties)
         
@@ -314,6 +1230,9 @@ class TaxNodefile(TaxGraph):
     
     unique_index = "tax_id"
     
+    # the file name in taxdump archive
+    dmp_name = "nodes.dmp"
+    
     def __init__(self, **kwargs):
         """Instance the class. Need a py2neo Graph instance"""
         
@@ -347,31 +1266,24 @@ class TaxNodefile(TaxGraph):
             logger.debug("Creating unique index ({label},{property_key})".format(label=TaxNode.label, property_key=self.unique_index))
             self.schema.create_uniqueness_constraint(TaxNode.label, self.unique_index)
     
-    def insertFrom(self, dmp_file="nodes.dmp", limit=None):
-        """Open a file to read nodes"""
-        
-        # open a file in reading mode
-        handle = open(dmp_file)
-        
-        # get a transaction
-        try:
-            self.begin()
-            self.check_index()
-            
-        except AttributeError, message:
-            raise TaxGraphError("You need to connect to database before loading from file: %s" %(message))
+    def __insert_nodes(self, handle, limit=None):
+        """Create a py2neo Node for each line, and commit every self.iter nodes.
+        Return the number of nodes added"""
         
-        # debug
-        logger.info("Adding nodes...")
+        # measure parse, build and create stages
+        stopwatch = Stopwatch(self.metrics)
         
         # process line ny line
         for i, record in enumerate(handle):
             # get a node element
             my_node = TaxNode(record)
+            stopwatch.lap("parse")
             neo_node = my_node.getNeo4j()
+            stopwatch.lap("build")
             
             # add it to database
             self.transaction.create(neo_node)
+            stopwatch.lap("create")
             
             # record relationship
             self.all_relations[my_node.tax_id] = my_node.parent
@@ -379,8 +1291,9 @@ class TaxNodefile(TaxGraph):
             # test for limit
             if limit is not None and i >= (limit-1):
                 self.commit()
+                stopwatch.record((i % self.iter) + 1)
                 logger.info("%s limit reached. %s nodes added" %(limit, i+1))
-                break
+                return i+1
 
             # commit data
             if (i+1) % self.iter == 0:
@@ -388,58 +1301,157 @@ class TaxNodefile(TaxGraph):
                 logger.debug("%s nodes added" %(i+1))
                 # a new transaction
                 self.begin()
+                stopwatch.record(self.iter)
                 
         # outside cicle
         if (i+1) % self.iter != 0:
             self.commit()
+            stopwatch.record((i+1) % self.iter)
             logger.debug("%s nodes added" %(i+1))
             
-        # closing file
-        handle.close()
+        return i+1
         
-        # get a selector
-        selector = py2neo.NodeSelector(self.graph)
+    def __insert_nodes_bulk(self, handle, limit=None):
+        """Create self.iter nodes with a single UNWIND query, using properties as
+        parameters. Return the number of nodes added"""
+        
+        # the same properties of TaxNode.getNeo4j()
+        query = "UNWIND {rows} AS row CREATE (node:%s) SET node = row" %(TaxNode.label)
+        
+        rows = []
+        count = 0
+        start = time.time()
+        
+        # rows are built while parsing
+        stopwatch = Stopwatch(self.metrics)
+        
+        # process line ny line
+        for record in node_parser.iterRecords(handle):
+            # the same of TaxNode.getProperties()
+            rows.append({"tax_id": record.tax_id, "hidden_flag": record.hidden_flag, "rank": record.rank})
+            
+            # record relationship
+            self.all_relations[record.tax_id] = record.parent
+            count += 1
+            
+            # test for limit
+            if limit is not None and count >= limit:
+                logger.info("%s limit reached" %(limit))
+                break
+            
+            # commit data
+            if len(rows) == self.iter:
+                stopwatch.lap("parse")
+                self.runBatch(query, rows)
+                stopwatch.record(len(rows))
+                rows = []
+                logger.debug("%s nodes added (%.0f nodes/s)" %(count, count/max(time.time()-start, 1e-6)))
+                
+        # outside cicle
+        if len(rows) > 0:
+            stopwatch.lap("parse")
+            self.runBatch(query, rows)
+            stopwatch.record(len(rows))
+            logger.debug("%s nodes added" %(count))
+            
+        return count
+        
+    def insertRelations(self, relations=None):
+        """Create PARENT relationships from a tax_id -> parent tax_id dictionary
+        (self.all_relations by default). Nodes are matched by tax_id in database,
+        self.iter relationships with a single query. Return the number of
+        relationships created"""
+        
+        if relations is None:
+            relations = self.all_relations
             
+        query = """UNWIND {rows} AS row MATCH (node:%s {tax_id: row.tax_id}) MATCH (parent:%s {tax_id: row.parent}) CREATE (parent)-[:PARENT]->(node) RETURN count(*)""" %(TaxNode.label, TaxNode.label)
+        
         # now add relations. Count them
         count = 0
         
         # debug
         logger.info("Adding iterations...")
         
-        # get a new transaction object
-        self.begin()
+        # to measure throughput
+        start = time.time()
+        stopwatch = Stopwatch(self.metrics)
         
-        for tax_id, parent_tax_id in self.all_relations.iteritems():
-            neo_nodes = selector.select(TaxNode.label, tax_id=tax_id)
+        for chunk in iterChunks(relations.iteritems(), self.iter):
+            rows = []
             
-            # Reading from a list (tax_id are unique, so there are 1 results)
-            for neo_node in list(neo_nodes):
-                # search parent
-                neo_parents = selector.select(TaxNode.label, tax_id=parent_tax_id)
+            for tax_id, parent_tax_id in chunk:
+                # root node is parent of itself
+                if tax_id == parent_tax_id:
+                    logger.warn("Ignoring relationship between %s and %s" %(tax_id, parent_tax_id))
+                    continue
                 
-                for neo_parent in neo_parents:
-                    count += 1
-                    
-                    if neo_parent == neo_node:
-                        logger.warn("Ignoring relationship between %s and %s" %(neo_node, neo_parent))
-                        continue
-                    
-                    relationship = py2neo.Relationship(neo_parent, "PARENT", neo_node)
-                    
-                    # add it to database
-                    self.transaction.create(relationship)
-                    
-            # commit
-            if count % self.iter == 0:
-                self.commit()
-                logger.debug("%s iterations processed" %(count))
-                self.begin()
+                rows.append({"tax_id": tax_id, "parent": parent_tax_id})
                 
-        # final transaction
-        if count % self.iter != 0:
-            self.commit()
+            if len(rows) == 0:
+                continue
+                
+            stopwatch.lap("build")
+            count += self.runBatch(query, rows)
+            stopwatch.record(len(rows))
             logger.debug("%s iterations processed" %(count))
             
+        # debug
+        elapsed = time.time() - start
+        logger.info("%s relationships added in %.1fs (%.0f relationships/s)" %(count, elapsed, count/max(elapsed, 1e-6)))
+        
+        return count
+        
+    def insertNodes(self, records, limit=None, bulk=False):
+        """Add nodes from an iterable of nodes.dmp lines. With bulk=True, nodes
+        are created with a single UNWIND query every self.iter nodes. Relations are
+        recorded in self.all_relations. Return the number of nodes added"""
+        
+        if self.graph is None:
+            raise TaxGraphError("You need to connect to database before loading nodes")
+            
+        # to measure throughput
+        start = time.time()
+        
+        if bulk is True:
+            n_nodes = self.__insert_nodes_bulk(records, limit)
+            
+        else:
+            self.begin()
+            n_nodes = self.__insert_nodes(records, limit)
+            
+        # debug
+        elapsed = time.time() - start
+        logger.info("%s nodes added in %.1fs (%.0f nodes/s)" %(n_nodes, elapsed, n_nodes/max(elapsed, 1e-6)))
+        
+        return n_nodes
+        
+    def insertFrom(self, dmp_file="nodes.dmp", limit=None, bulk=False):
+        """Open a file to read nodes. File could be compressed, or a taxdump
+        archive. With bulk=True, nodes are created with a single UNWIND query
+        every self.iter nodes"""
+        
+        # test connection and indexes
+        try:
+            self.check_index()
+            
+        except TaxGraphError, message:
+            raise TaxGraphError("You need to connect to database before loading from file: %s" %(message))
+        
+        # open a file in reading mode
+        handle = openDmp(dmp_file, self.dmp_name)
+        
+        # debug
+        logger.info("Adding nodes...")
+        
+        self.insertNodes(handle, limit, bulk)
+        
+        # closing file
+        handle.close()
+        
+        # now add relations
+        self.insertRelations()
+        
         #debug
         logger.info("Loading nodes completed!")
 
@@ -471,21 +1483,23 @@ class TaxName(TaxBase):
         
         TaxBase.__init__(self, record)
         
-        # add new property
-        if self.unique_name == '':
-            index = (self.tax_id, self.name_txt)
+        # create an unique index as (tax_id, name)
+        self.index = nameIndex(self.tax_id, self.name_txt, self.unique_name)
         
-        else:
-            index = (self.tax_id, self.unique_name)
+    def getRelationshipName(self):
+        """Get the relationship name from name class (eg. SCIENTIFIC_NAME)"""
         
-        # create an unique index as (tax_id, name)
-        self.index = str(index)
+        return relationshipName(self.name_class)
         
     def __repr__(self):
         """Return a string"""
         
         return "<{module}.TaxName(tax_id='{tax_id}', name_txt='{name_txt}', unique_name='{unique_name}', name_class='{name_class}')>".format(module=self.__module__, tax_id=self.tax_id, name_txt=self.name_txt, unique_name=self.unique_name, name_class=self.name_class)
 
+# fast parsers for dmp files, returning TaxNode and TaxName attributes
+node_parser = DmpParser(TaxNode.attr_to_columns, "TaxNodeRecord")
+name_parser = DmpParser(TaxName.attr_to_columns, "TaxNameRecord")
+
 class TaxNamefile(TaxGraph):
     """Deal with name.dmp file"""
     
@@ -493,6 +1507,9 @@ class TaxNamefile(TaxGraph):
     unique_index = "index"
     indexes = ["name_txt"] 
     
+    # the file name in taxdump archive
+    dmp_name = "names.dmp"
+    
     def __init__(self, **kwargs):
         """Instance the class. Need a py2neo Graph instance"""
         
@@ -535,43 +1552,38 @@ class TaxNamefile(TaxGraph):
                 logger.debug("Creating index ({label},{property_key})".format(label=TaxName.label, property_key=index))
                 self.schema.create_index(TaxName.label, index)
 
-    def insertFrom(self, dmp_file="names.dmp", limit=None):
-        """Open a file to read names"""
-        
-        # open a file in reading mode
-        handle = open(dmp_file)
-        
-        # get a transaction
-        try:
-            self.begin()
-            self.check_index()
-            
-        except AttributeError, message:
-            raise TaxGraphError("You need to connect to database before loading from file: %s" %(message))
-        
-        # debug
-        logger.info("Adding names...")
+    def __insert_names(self, handle, limit=None):
+        """Create a py2neo Node for each line, and search its TaxNode in order to
+        add a relationship. Commit every self.iter names. Return the number of
+        names added"""
         
         # get a selector
         selector = py2neo.NodeSelector(self.graph)
+        
+        # measure parse, build, create and select stages
+        stopwatch = Stopwatch(self.metrics)
 
         # process line ny line
         for i, record in enumerate(handle):
             # get a node element
             my_name = TaxName(record)
+            stopwatch.lap("parse")
             neo_name = my_name.getNeo4j()
+            stopwatch.lap("build")
             
             # add it to database
             self.transaction.create(neo_name)
+            stopwatch.lap("create")
             
-            # now search node by taxa id
-            neo_nodes = selector.select(TaxNode.label, tax_id=my_name.tax_id)
+            # now search node by taxa id. Reading from a list (tax_id are
+            # unique, so there are 1 results)
+            neo_nodes = list(selector.select(TaxNode.label, tax_id=my_name.tax_id))
+            stopwatch.lap("select")
             
             # get the relationship name from name class
-            relationship_name = my_name.name_class.replace(" ", "_").upper()
+            relationship_name = my_name.getRelationshipName()
             
-            # Reading from a list (tax_id are unique, so there are 1 results)
-            for neo_node in list(neo_nodes):
+            for neo_node in neo_nodes:
                 # Now add a relationship
                 try:
                     relationship = py2neo.Relationship(neo_node, relationship_name, neo_name)
@@ -582,12 +1594,15 @@ class TaxNamefile(TaxGraph):
                     
                 # add it to database
                 self.transaction.create(relationship)
+                
+            stopwatch.lap("create")
             
             # test for limit
             if limit is not None and i >= (limit-1):
                 self.commit()
+                stopwatch.record((i % self.iter) + 1)
                 logger.info("%s limit reached. %s names added" %(limit, i+1))
-                break
+                return i+1
 
             # commit data
             if (i+1) % self.iter == 0:
@@ -595,12 +1610,106 @@ class TaxNamefile(TaxGraph):
                 logger.debug("%s names added" %(i+1))
                 # a new transaction
                 self.begin()
+                stopwatch.record(self.iter)
                 
         # outside cicle
         if (i+1) % self.iter != 0:
             self.commit()
+            stopwatch.record((i+1) % self.iter)
             logger.debug("%s names added" %(i+1))
             
+        return i+1
+        
+    def __insert_names_bulk(self, handle, limit=None):
+        """Group self.iter names by name class, and create names and their
+        relationships with a single UNWIND query for each name class. Return the
+        number of names added"""
+        
+        # names are created even if TaxNode doesn't exist, like __insert_names does
+        query = """UNWIND {rows} AS row CREATE (name:%s) SET name = row.properties WITH name, row MATCH (node:%s {tax_id: row.tax_id}) CREATE (node)-[:`%%s`]->(name)""" %(TaxName.label, TaxNode.label)
+        
+        # relationship name -> rows
+        groups = {}
+        count = 0
+        start = time.time()
+        
+        # rows are built while parsing
+        stopwatch = Stopwatch(self.metrics)
+        
+        # process line ny line
+        for record in name_parser.iterRecords(handle):
+            # the same of TaxName.getProperties()
+            properties = {"name_txt": record.name_txt, "unique_name": record.unique_name, "index": nameIndex(record.tax_id, record.name_txt, record.unique_name)}
+            row = {"tax_id": record.tax_id, "properties": properties}
+            groups.setdefault(relationshipName(record.name_class), []).append(row)
+            count += 1
+            
+            # test for limit
+            if limit is not None and count >= limit:
+                logger.info("%s limit reached" %(limit))
+                break
+            
+            # commit data
+            if count % self.iter == 0:
+                stopwatch.lap("parse")
+                self.runBatches([(query %(relationship_name), rows) for relationship_name, rows in groups.iteritems()])
+                stopwatch.record(self.iter)
+                groups = {}
+                logger.debug("%s names added (%.0f names/s)" %(count, count/max(time.time()-start, 1e-6)))
+                
+        # outside cicle
+        if len(groups) > 0:
+            stopwatch.lap("parse")
+            self.runBatches([(query %(relationship_name), rows) for relationship_name, rows in groups.iteritems()])
+            stopwatch.record(sum([len(rows) for rows in groups.itervalues()]))
+            logger.debug("%s names added" %(count))
+            
+        return count
+        
+    def insertNames(self, records, limit=None, bulk=False):
+        """Add names from an iterable of names.dmp lines. With bulk=True, names
+        are created with few UNWIND queries every self.iter names. Return the
+        number of names added"""
+        
+        if self.graph is None:
+            raise TaxGraphError("You need to connect to database before loading names")
+            
+        # to measure throughput
+        start = time.time()
+        
+        if bulk is True:
+            n_names = self.__insert_names_bulk(records, limit)
+            
+        else:
+            self.begin()
+            n_names = self.__insert_names(records, limit)
+            
+        #debug
+        elapsed = time.time() - start
+        logger.info("%s names added in %.1fs (%.0f names/s)" %(n_names, elapsed, n_names/max(elapsed, 1e-6)))
+        
+        return n_names
+        
+    def insertFrom(self, dmp_file="names.dmp", limit=None, bulk=False):
+        """Open a file to read names. File could be compressed, or a taxdump
+        archive. With bulk=True, names are created with few UNWIND queries every
+        self.iter names"""
+        
+        # test connection and indexes
+        try:
+            self.check_index()
+            
+        except TaxGraphError, message:
+            raise TaxGraphError("You need to connect to database before loading from file: %s" %(message))
+        
+        # open a file in reading mode
+        handle = openDmp(dmp_file, self.dmp_name)
+        
+        # debug
+        logger.info("Adding names...")
+        
+        self.insertNames(handle, limit, bulk)
+            
         # closing file
         handle.close()
     
@@ -608,3 +1717,77 @@ class TaxNamefile(TaxGraph):
         logger.info("Loading names completed!")
 
 
+def writeImportCSV(outdir, nodes_file="nodes.dmp", names_file="names.dmp"):
+    """Write nodes.dmp and names.dmp (which could be compressed, or a taxdump
+    archive) as CSV files (and their headers) for neo4j-admin import. Labels, properties and relationships are the same
+    created by TaxNodefile and TaxNamefile. Return a dictionary of written files"""
+    
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+        
+    files = {}
+    
+    for name in ["taxnodes", "parents", "taxnames", "names"]:
+        files[name] = os.path.join(outdir, "%s.csv" %(name))
+        files["%s_header" %(name)] = os.path.join(outdir, "%s_header.csv" %(name))
+        
+    # define headers. Unique indexes are the ID of each label
+    headers = {
+        "taxnodes": ["%s:ID(%s)" %(key, TaxNode.label) if key == TaxNodefile.unique_index else key for key in TaxNode.properties] + [":LABEL"],
+        "parents": [":START_ID(%s)" %(TaxNode.label), ":END_ID(%s)" %(TaxNode.label), ":TYPE"],
+        "taxnames": ["%s:ID(%s)" %(key, TaxName.label) if key == TaxNamefile.unique_index else key for key in TaxName.properties] + [":LABEL"],
+        "names": [":START_ID(%s)" %(TaxNode.label), ":END_ID(%s)" %(TaxName.label), ":TYPE"],
+    }
+    
+    for name, header in headers.iteritems():
+        handle = open(files["%s_header" %(name)], "wb")
+        csv.writer(handle).writerow(header)
+        handle.close()
+        
+    # open data files. Quote all values, since an unquoted empty string is a
+    # missing property for neo4j-admin import
+    handles = dict([(name, open(files[name], "wb")) for name in headers.keys()])
+    writers = dict([(name, csv.writer(handle, quoting=csv.QUOTE_ALL)) for name, handle in handles.iteritems()])
+    
+    # debug
+    logger.info("Writing nodes...")
+    
+    handle = openDmp(nodes_file, TaxNodefile.dmp_name)
+    count = 0
+    
+    for record in node_parser.iterRecords(handle):
+        writers["taxnodes"].writerow([getattr(record, key) for key in TaxNode.properties] + [TaxNode.label])
+        count += 1
+        
+        # root node is parent of itself
+        if record.tax_id != record.parent:
+            writers["parents"].writerow([record.parent, record.tax_id, "PARENT"])
+        
+    handle.close()
+    
+    logger.info("%s nodes written" %(count))
+    
+    # debug
+    logger.info("Writing names...")
+    
+    handle = openDmp(names_file, TaxNamefile.dmp_name)
+    count = 0
+    
+    for record in name_parser.iterRecords(handle):
+        properties = {"name_txt": record.name_txt, "unique_name": record.unique_name, "index": nameIndex(record.tax_id, record.name_txt, record.unique_name)}
+        writers["taxnames"].writerow([properties[key] for key in TaxName.properties] + [TaxName.label])
+        writers["names"].writerow([record.tax_id, properties["index"], relationshipName(record.name_class)])
+        count += 1
+        
+    handle.close()
+    
+    logger.info("%s names written" %(count))
+    
+    for handle in handles.values():
+        handle.close()
+    
+    # suggest the import command
+    logger.info("Import data with: neo4j-admin import --nodes \"{taxnodes_header},{taxnodes}\" --nodes \"{taxnames_header},{taxnames}\" --relationships \"{parents_header},{parents}\" --relationships \"{names_header},{names}\"".format(**files))
+    
+    return files
+
@@ -0,0 +1,187 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 15:36:04 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+
+from neotaxonomy.Neo4j import TaxNodefile, TaxNamefile, node_parser
+from neotaxonomy.Taxdump import isCompressed
+from neotaxonomy.exceptions import TaxGraphError
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+def splitFile(dmp_file, chunks):
+    """Split a file in byte ranges of whole lines. Return a list of (start, end)"""
+    
+    size = os.path.getsize(dmp_file)
+    offsets = [0]
+    
+    handle = open(dmp_file)
+    
+    for i in range(1, chunks):
+        # move to the start of the next line
+        handle.seek(size * i / chunks)
+        handle.readline()
+        offset = handle.tell()
+        
+        if offsets[-1] < offset < size:
+            offsets.append(offset)
+            
+    handle.close()
+    
+    offsets.append(size)
+    
+    return zip(offsets[:-1], offsets[1:])
+    
+def readRange(dmp_file, start, end):
+    """Read lines starting in a byte range of a file"""
+    
+    handle = open(dmp_file)
+    handle.seek(start)
+    
+    while handle.tell() < end:
+        line = handle.readline()
+        
+        if line == "":
+            break
+        
+        yield line
+        
+    handle.close()
+    
+def _loadNodes(task):
+    """Worker function: load nodes from a byte range of nodes.dmp"""
+    
+    connection, iter, dmp_file, start, end = task
+    
+    nodefile = TaxNodefile(**connection)
+    nodefile.connect()
+    nodefile.iter = iter
+    
+    return nodefile.insertNodes(readRange(dmp_file, start, end), bulk=True)
+    
+def _loadRelations(task):
+    """Worker function: create PARENT relationships from a byte range of
+    nodes.dmp"""
+    
+    connection, iter, dmp_file, start, end = task
+    
+    nodefile = TaxNodefile(**connection)
+    nodefile.connect()
+    nodefile.iter = iter
+    
+    relations = {}
+    
+    for record in node_parser.iterRecords(readRange(dmp_file, start, end)):
+        relations[record.tax_id] = record.parent
+    
+    return nodefile.insertRelations(relations)
+    
+def _loadNames(task):
+    """Worker function: load names from a byte range of names.dmp"""
+    
+    connection, iter, dmp_file, start, end = task
+    
+    namefile = TaxNamefile(**connection)
+    namefile.connect()
+    namefile.iter = iter
+    
+    return namefile.insertNames(readRange(dmp_file, start, end), bulk=True)
+    
+def parallelLoad(nodes_file="nodes.dmp", names_file="names.dmp", workers=None, chunks=None, iter=1000, pool=None, **kwargs):
+    """Load nodes.dmp and names.dmp with a pool of processes, using UNWIND
+    queries. Files are splitted in chunks (4 for each worker by default) and each
+    worker has its own connection. Relationships are created when all nodes are
+    loaded. kwargs are TaxGraph connection parameters. Return the number of nodes,
+    relationships and names added.
+    
+    py2neo connections are shared with forked processes: if you connect to
+    database before calling this function, start a multiprocessing.Pool before
+    connecting and pass it as pool. The pool will be closed"""
+    
+    # I need to seek in files
+    for dmp_file in [nodes_file, names_file]:
+        if isCompressed(dmp_file):
+            raise TaxGraphError("Can't split %s: parallel load needs uncompressed files" %(dmp_file))
+    
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+        
+    if chunks is None:
+        chunks = workers * 4
+        
+    # start workers before connecting, so they don't share parent connection
+    if pool is None:
+        pool = multiprocessing.Pool(workers)
+    
+    try:
+        # check indexes before loading
+        nodefile = TaxNodefile(**kwargs)
+        nodefile.connect()
+        nodefile.check_index()
+        
+        namefile = TaxNamefile(**kwargs)
+        namefile.connect()
+        namefile.check_index()
+        
+        # debug
+        logger.info("Adding nodes with %s workers..." %(workers))
+        start = time.time()
+        
+        tasks = [(kwargs, iter, nodes_file, begin, end) for begin, end in splitFile(nodes_file, chunks)]
+        n_nodes = sum(pool.map(_loadNodes, tasks))
+        
+        elapsed = time.time() - start
+        logger.info("%s nodes added in %.1fs (%.0f nodes/s)" %(n_nodes, elapsed, n_nodes/max(elapsed, 1e-6)))
+        
+        # all nodes are loaded. Now add relationships
+        logger.info("Adding iterations with %s workers..." %(workers))
+        start = time.time()
+        
+        n_relations = sum(pool.map(_loadRelations, tasks))
+        
+        elapsed = time.time() - start
+        logger.info("%s relationships added in %.1fs (%.0f relationships/s)" %(n_relations, elapsed, n_relations/max(elapsed, 1e-6)))
+        
+        # add names
+        logger.info("Adding names with %s workers..." %(workers))
+        start = time.time()
+        
+        tasks = [(kwargs, iter, names_file, begin, end) for begin, end in splitFile(names_file, chunks)]
+        n_names = sum(pool.map(_loadNames, tasks))
+        
+        elapsed = time.time() - start
+        logger.info("%s names added in %.1fs (%.0f names/s)" %(n_names, elapsed, n_names/max(elapsed, 1e-6)))
+        
+    finally:
+        pool.close()
+        pool.join()
+        
+    return n_nodes, n_relations, n_names
+    
@@ -0,0 +1,413 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 11:02:45 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import array
+import bisect
+import cPickle
+import logging
+
+from neotaxonomy.Neo4j import TaxNode, TaxName, TaxNamefile, name_parser
+from neotaxonomy.Taxdump import openDmp
+from neotaxonomy.exceptions import TaxGraphError, TaxonomyIndexError
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class NameSearch():
+    """Prefix and approximate search of names. Names are case folded and sorted,
+    so a prefix is a range of names. Approximate matches are found with an index
+    of trigrams, then ranked by edit distance and name class"""
+    
+    # name classes, in order of preference. Other classes come after these
+    class_priority = ["scientific name", "equivalent name", "synonym", "genbank synonym",
+                      "genbank common name", "common name", "blast name", "acronym",
+                      "genbank acronym", "anamorph", "teleomorph", "genbank anamorph",
+                      "misspelling", "misnomer", "includes", "in-part", "type material",
+                      "authority"]
+    
+    # prefixes of up to prefix_scan names are ranked reading all names. Longer
+    # ranges are read by name class and length
+    prefix_scan = 1000
+    
+    # texts with too few trigrams are compared with up to short_candidates names
+    short_candidates = 5000
+    
+    # change this when saved data changes
+    version = 3
+    
+    def __init__(self, names_file=None, name_classes=None):
+        """Instance the class. name_classes is a list of name classes to index
+        (eg. ["scientific name", "synonym"]), None for all classes. Load data if
+        file is provided"""
+        
+        self.name_classes = name_classes
+        
+        # case folded names (sorted), and their names, tax ids and name classes
+        self.keys = []
+        self.names = []
+        self.tax_ids = array.array('l')
+        self.class_codes = array.array('B')
+        self.classes = []
+        
+        # trigram -> position of names having it, sorted by name length
+        self.trigrams = {}
+        
+        # (class code, length) -> position of names, and all lengths (sorted)
+        self.buckets = {}
+        self.lengths = []
+        
+        if names_file is not None:
+            self.loadNames(names_file)
+            
+    def __repr__(self):
+        """Return a string"""
+        
+        return "<{module}.NameSearch(names={names})>".format(module=self.__module__, names=len(self))
+        
+    def __len__(self):
+        """Return the number of names"""
+        
+        return len(self.keys)
+        
+    def loadNames(self, dmp_file="names.dmp"):
+        """Read names from a names.dmp file (could be compressed, or a taxdump
+        archive)"""
+        
+        logger.info("Reading names...")
+        
+        handle = openDmp(dmp_file, TaxNamefile.dmp_name)
+        self.__build((record.tax_id, record.name_txt, record.name_class) for record in name_parser.iterRecords(handle))
+        handle.close()
+        
+    def loadDatabase(self, taxgraph):
+        """Read names from a connected TaxGraph"""
+        
+        logger.info("Reading names in database...")
+        
+        query = """MATCH (node:%s)-[relationship]->(name:%s) RETURN node.tax_id, name.name_txt, type(relationship)""" %(TaxNode.label, TaxName.label)
+        
+        try:
+            cursor = taxgraph.graph.run(query)
+            
+        except AttributeError, message:
+            raise TaxGraphError("You need to connect to database before reading names: %s" %(message))
+            
+        # relationship names are upper case name classes (see relationshipName)
+        self.__build((tax_id, name_txt, relationship_name.replace("_", " ").lower()) for tax_id, name_txt, relationship_name in cursor)
+        cursor.close()
+        
+    def __build(self, records):
+        """Index (tax_id, name_txt, name_class) records"""
+        
+        if self.name_classes is not None:
+            name_classes = set(self.name_classes)
+            
+        class_to_code = {}
+        entries = []
+        
+        for tax_id, name_txt, name_class in records:
+            if self.name_classes is not None and name_class not in name_classes:
+                continue
+                
+            if isinstance(name_txt, str):
+                name_txt = name_txt.decode("utf-8")
+                
+            if name_class not in class_to_code:
+                class_to_code[name_class] = len(class_to_code)
+                
+            entries.append((name_txt.lower(), name_txt, int(tax_id), class_to_code[name_class]))
+            
+        logger.info("Indexing %s names..." %(len(entries)))
+        
+        entries.sort()
+        
+        self.keys = [entry[0] for entry in entries]
+        self.names = [entry[1] for entry in entries]
+        self.tax_ids = array.array('l', [entry[2] for entry in entries])
+        self.class_codes = array.array('B', [entry[3] for entry in entries])
+        self.classes = sorted(class_to_code, key=class_to_code.get)
+        
+        del(entries)
+        
+        self.trigrams = {}
+        
+        # names of similar length are read with a range of positions
+        for position in sorted(xrange(len(self.keys)), key=lambda position: len(self.keys[position])):
+            for trigram in set(trigrams(self.keys[position])):
+                if trigram not in self.trigrams:
+                    self.trigrams[trigram] = array.array('i')
+                    
+                self.trigrams[trigram].append(position)
+                
+        self.buckets = {}
+        
+        for position, key in enumerate(self.keys):
+            bucket = (self.class_codes[position], len(key))
+            
+            if bucket not in self.buckets:
+                self.buckets[bucket] = array.array('i')
+                
+            self.buckets[bucket].append(position)
+            
+        self.lengths = sorted(set([length for code, length in self.buckets]))
+        
+        logger.info("%s names indexed, %s trigrams" %(len(self), len(self.trigrams)))
+        
+    def save(self, filename):
+        """Write index in a file"""
+        
+        data = {"name_classes": self.name_classes, "keys": self.keys, "names": self.names, 
+                "tax_ids": self.tax_ids, "class_codes": self.class_codes, "classes": self.classes, "trigrams": self.trigrams,
+                "buckets": self.buckets}
+        
+        handle = open(filename, "wb")
+        handle.write(self.__header())
+        cPickle.dump(data, handle, cPickle.HIGHEST_PROTOCOL)
+        handle.close()
+        
+        logger.info("Index written in %s" %(filename))
+        
+    def load(self, filename):
+        """Read an index written with save"""
+        
+        handle = open(filename, "rb")
+        
+        if handle.readline() != self.__header():
+            handle.close()
+            raise TaxonomyIndexError("%s is not a name search index (version %s)" %(filename, self.version))
+            
+        data = cPickle.load(handle)
+        handle.close()
+        
+        self.name_classes = data["name_classes"]
+        self.keys = data["keys"]
+        self.names = data["names"]
+        self.tax_ids = data["tax_ids"]
+        self.class_codes = data["class_codes"]
+        self.classes = data["classes"]
+        self.trigrams = data["trigrams"]
+        self.buckets = data["buckets"]
+        self.lengths = sorted(set([length for code, length in self.buckets]))
+        
+        logger.info("%s names read from %s" %(len(self), filename))
+        
+    def __header(self):
+        """Return the first line of index files"""
+        
+        return "neotaxonomy.NameSearch %s\n" %(self.version)
+        
+    def __priority(self, position):
+        """Return the preference of the name class of a name"""
+        
+        name_class = self.classes[self.class_codes[position]]
+        
+        if name_class in self.class_priority:
+            return self.class_priority.index(name_class)
+            
+        return len(self.class_priority)
+        
+    def __groups(self):
+        """Return a list of (priority, class codes) sorted by priority"""
+        
+        groups = {}
+        
+        for code, name_class in enumerate(self.classes):
+            priority = self.class_priority.index(name_class) if name_class in self.class_priority else len(self.class_priority)
+            groups.setdefault(priority, []).append(code)
+            
+        return sorted(groups.items())
+        
+    def __result(self, position):
+        """Return (name_txt, tax_id, name_class) of a name"""
+        
+        return self.names[position], str(self.tax_ids[position]), self.classes[self.class_codes[position]]
+        
+    def searchPrefix(self, text, limit=10):
+        """Return a list of (name_txt, tax_id, name_class) of names starting with
+        text (ignoring case), ordered by name class and length"""
+        
+        prefix = foldName(text)
+        
+        # names starting with prefix
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, nextPrefix(prefix)) if prefix != u"" else len(self.keys)
+        
+        if end - start <= self.prefix_scan:
+            hits = sorted([(self.__priority(position), len(self.keys[position]), position) for position in xrange(start, end)])
+            return [self.__result(position) for priority, length, position in hits[:limit]]
+            
+        # too many names: read the shortest names of the preferred classes first
+        positions = []
+        
+        for priority, codes in self.__groups():
+            for length in self.lengths:
+                if length < len(prefix):
+                    continue
+                    
+                found = []
+                
+                for code in codes:
+                    bucket = self.buckets.get((code, length))
+                    
+                    if bucket is not None:
+                        found.extend(bucket[bisect.bisect_left(bucket, start):bisect.bisect_left(bucket, end)])
+                        
+                found.sort()
+                positions.extend(found[:limit-len(positions)])
+                
+                if len(positions) >= limit:
+                    return [self.__result(position) for position in positions]
+                    
+        return [self.__result(position) for position in positions]
+        
+    def __similar(self, trigram, key, max_distance):
+        """Return the position of names having trigram, with a length within
+        max_distance from key length"""
+        
+        positions = self.trigrams.get(trigram, ())
+        
+        return positions[lengthIndex(positions, self.keys, len(key) - max_distance):lengthIndex(positions, self.keys, len(key) + max_distance + 1)]
+        
+    def search(self, text, max_distance=2, limit=10):
+        """Return a list of (name_txt, tax_id, name_class, distance) of names
+        within max_distance edits from text (ignoring case), ordered by distance
+        and name class. Texts with less than 3*max_distance+1 trigrams (ie short
+        texts) are compared only with names equal to text or sharing a trigram,
+        up to short_candidates names from the rarest trigrams: names without
+        trigrams in common are not found, but the cost doesn't grow with the
+        number of names"""
+        
+        key = foldName(text)
+        query = set(trigrams(key))
+        
+        if max_distance < 0:
+            return []
+            
+        rarest = sorted(query, key=lambda trigram: len(self.trigrams.get(trigram, ())))
+        
+        # an edit changes at most 3 trigrams, so with max_distance edits at least
+        # one of any 3*max_distance+1 trigrams is in common with a match
+        if len(query) >= 3*max_distance+1:
+            candidates = set()
+            
+            for trigram in rarest[:3*max_distance+1]:
+                candidates.update(self.__similar(trigram, key, max_distance))
+                
+        else:
+            candidates = set(xrange(bisect.bisect_left(self.keys, key), bisect.bisect_right(self.keys, key)))
+            
+            for trigram in rarest:
+                candidates.update(self.__similar(trigram, key, max_distance)[:self.short_candidates-len(candidates)])
+                
+                if len(candidates) >= self.short_candidates:
+                    logger.debug("'%s' is too short for trigrams: comparing %s names" %(text, len(candidates)))
+                    break
+                    
+        # matches have at least these trigrams in common
+        min_common = len(query) - 3*max_distance
+        
+        hits = []
+        
+        for position in candidates:
+            candidate = self.keys[position]
+            
+            # a count filter is cheaper than edit distance
+            if len(query.intersection(trigrams(candidate))) < min_common:
+                continue
+                
+            distance = editDistance(key, candidate, max_distance)
+            
+            if distance is not None:
+                hits.append((distance, self.__priority(position), len(candidate), position))
+                
+        hits.sort()
+        
+        return [self.__result(position) + (distance,) for distance, priority, length, position in hits[:limit]]
+        
+def foldName(name_txt):
+    """Return the case folded unicode name"""
+    
+    if isinstance(name_txt, str):
+        name_txt = name_txt.decode("utf-8")
+        
+    return name_txt.strip().lower()
+    
+def nextPrefix(prefix):
+    """Return the first string greater than all strings starting with a (not
+    empty) prefix"""
+    
+    return prefix[:-1] + unichr(ord(prefix[-1]) + 1)
+    
+def lengthIndex(positions, keys, length):
+    """Return the index of the first position (positions are sorted by key
+    length) of a key not shorter than length"""
+    
+    low, high = 0, len(positions)
+    
+    while low < high:
+        middle = (low + high) // 2
+        
+        if len(keys[positions[middle]]) < length:
+            low = middle + 1
+            
+        else:
+            high = middle
+            
+    return low
+    
+def trigrams(key):
+    """Return the trigrams of a string, padded with '$'"""
+    
+    padded = u"$%s$" %(key)
+    
+    return [padded[i:i+3] for i in xrange(len(padded)-2)]
+    
+def editDistance(first, second, max_distance=None):
+    """Return the Levenshtein distance between two strings, or None if it is
+    greater than max_distance"""
+    
+    previous = range(len(second)+1)
+    
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j-1] + 1, previous[j-1] + (first_char != second_char)))
+            
+        # all paths are too long
+        if max_distance is not None and min(current) > max_distance:
+            return None
+            
+        previous = current
+        
+    distance = previous[-1]
+    
+    if max_distance is not None and distance > max_distance:
+        return None
+        
+    return distance
+    
@@ -0,0 +1,344 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 17:12:45 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import bz2
+import gzip
+import Queue
+import hashlib
+import logging
+import tarfile
+import operator
+import threading
+import collections
+
+from neotaxonomy.exceptions import TaxdumpError
+
+# xz is not in python2 standard library
+try:
+    import lzma
+    
+except ImportError:
+    try:
+        from backports import lzma
+        
+    except ImportError:
+        lzma = None
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+# magic numbers of compressed files
+magic_numbers = {
+    "\x1f\x8b": "gz",
+    "BZh": "bz2",
+    "\xfd7zXZ\x00": "xz",
+}
+
+def getCompression(filename):
+    """Return the compression of a file ('gz', 'bz2', 'xz') or None"""
+    
+    handle = open(filename, "rb")
+    header = handle.read(6)
+    handle.close()
+    
+    for magic, compression in magic_numbers.iteritems():
+        if header.startswith(magic):
+            return compression
+            
+    return None
+    
+def isCompressed(filename):
+    """Test if a file is compressed or is an archive"""
+    
+    return getCompression(filename) is not None or tarfile.is_tarfile(filename)
+    
+def openDmp(filename, member=None):
+    """Open a dmp file, which could be compressed with gzip, bzip2 or xz. If
+    filename is an archive (like taxdump.tar.gz) read member from it. Return a
+    DmpReader object"""
+    
+    if not os.path.exists(filename):
+        raise TaxdumpError("File %s doesn't exist" %(filename))
+    
+    compression = getCompression(filename)
+    
+    # the archive, if any
+    archive = None
+    
+    # tarfile deal with gzip and bzip2 archives
+    if compression != "xz" and tarfile.is_tarfile(filename):
+        if member is None:
+            raise TaxdumpError("You need to specify a member to read from %s" %(filename))
+            
+        logger.debug("Reading %s from %s" %(member, filename))
+        
+        # open the archive in streaming mode
+        archive = tarfile.open(filename, "r|*")
+        handle = None
+        
+        for info in archive:
+            if os.path.basename(info.name) == member:
+                handle = archive.extractfile(info)
+                break
+                
+        if handle is None:
+            archive.close()
+            raise TaxdumpError("%s not found in %s" %(member, filename))
+        
+    elif compression == "gz":
+        handle = gzip.open(filename, "rb")
+        
+    elif compression == "bz2":
+        handle = bz2.BZ2File(filename, "rb")
+        
+    elif compression == "xz":
+        if lzma is None:
+            raise TaxdumpError("You need lzma module (backports.lzma in python2) to read %s" %(filename))
+            
+        handle = lzma.LZMAFile(filename, "rb")
+        
+    else:
+        handle = open(filename, "rb")
+        
+    return DmpReader(handle, archive)
+    
+
+class DmpReader():
+    """Read lines from a (decompressed) file object. Data are read in a separate
+    thread, so decompression is done while lines are processed"""
+    
+    # how many bytes are read at time, and how many blocks are buffered
+    blocksize = 1 << 20
+    maxblocks = 16
+    
+    def __init__(self, handle, archive=None):
+        """Instance the class with a file object, and the archive it comes from"""
+        
+        self.handle = handle
+        self.archive = archive
+        self.closed = False
+        
+        # an exception raised in reading thread
+        self.error = None
+        
+        self.queue = Queue.Queue(self.maxblocks)
+        
+        self.thread = threading.Thread(target=self.__read)
+        self.thread.daemon = True
+        self.thread.start()
+        
+    def __read(self):
+        """Read blocks from file, until the end of file. An empty block means
+        the end of data"""
+        
+        try:
+            while not self.closed:
+                block = self.handle.read(self.blocksize)
+                self.queue.put(block)
+                
+                if block == "":
+                    break
+                
+        except Exception, message:
+            self.error = message
+            self.queue.put("")
+            
+    def __iter__(self):
+        """Iterate over lines"""
+        
+        remainder = ""
+        
+        while True:
+            block = self.queue.get()
+            
+            if block == "":
+                break
+                
+            lines = (remainder + block).split("\n")
+            
+            # the last line could be incomplete
+            remainder = lines.pop()
+            
+            for line in lines:
+                yield line + "\n"
+                
+        if self.error is not None:
+            raise TaxdumpError("Error while reading file: %s" %(self.error))
+                
+        if remainder != "":
+            yield remainder
+            
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        
+    def close(self):
+        """Stop reading thread and close files"""
+        
+        self.closed = True
+        
+        # consume blocks, so reading thread is not waiting for queue
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)
+                
+            except Queue.Empty:
+                pass
+                
+        self.handle.close()
+        
+        if self.archive is not None:
+            self.archive.close()
+            
+
+
+class DmpParser():
+    """A fast parser for dmp lines. Only the columns defined in attr_to_columns
+    (like TaxNode.attr_to_columns) are extracted, and records are namedtuples
+    with the same values of TaxBase attributes"""
+    
+    # columns are separated by '\t|\t', and lines end with '\t|\n'
+    separator = "\t|\t"
+    terminator = "\t|\n"
+    
+    def __init__(self, attr_to_columns, name="DmpRecord"):
+        """Instance the class with a dictionary of attribute -> column index"""
+        
+        # attributes are sorted by column
+        self.fields = sorted(attr_to_columns.keys(), key=lambda field: attr_to_columns[field])
+        self.columns = [attr_to_columns[field] for field in self.fields]
+        
+        # don't split columns after the last one I need
+        self.maxsplit = max(self.columns) + 1
+        
+        self.record = collections.namedtuple(name, self.fields)
+        self.getter = operator.itemgetter(*self.columns)
+        
+    def parse(self, line):
+        """Parse a line, return a record"""
+        
+        if line.endswith(self.terminator):
+            line = line[:-3]
+            
+        # the last line could have no newline
+        elif line.endswith(self.terminator[:-1]):
+            line = line[:-2]
+            
+        fields = line.split(self.separator, self.maxsplit)
+        
+        # a line with different separators, parse it like TaxBase does
+        if len(fields) < self.maxsplit:
+            fields = line.split("|")
+        
+        values = self.getter(fields)
+        
+        # itemgetter doesn't return a tuple for a single column
+        if len(self.columns) == 1:
+            values = (values,)
+        
+        return tuple.__new__(self.record, map(str.strip, values))
+        
+    def iterRecords(self, handle):
+        """Iterate over records of a file object (or an iterable of lines)"""
+        
+        parse = self.parse
+        
+        for line in handle:
+            yield parse(line)
+            
+
+
+# parsers for merged.dmp and delnodes.dmp
+merged_parser = DmpParser({"old_tax_id": 0, "new_tax_id": 1}, "MergedRecord")
+delnodes_parser = DmpParser({"tax_id": 0}, "DelnodesRecord")
+
+def readMerged(dmp_file="merged.dmp"):
+    """Read a merged.dmp file (could be compressed, or a taxdump archive). Return
+    a dictionary of old tax_id -> new tax_id"""
+    
+    handle = openDmp(dmp_file, "merged.dmp")
+    merged = dict(merged_parser.iterRecords(handle))
+    handle.close()
+    
+    logger.debug("%s merged tax ids read" %(len(merged)))
+    
+    return merged
+    
+def readDelnodes(dmp_file="delnodes.dmp"):
+    """Read a delnodes.dmp file (could be compressed, or a taxdump archive).
+    Return a set of deleted tax_id"""
+    
+    handle = openDmp(dmp_file, "delnodes.dmp")
+    delnodes = set([record.tax_id for record in delnodes_parser.iterRecords(handle)])
+    handle.close()
+    
+    logger.debug("%s deleted tax ids read" %(len(delnodes)))
+    
+    return delnodes
+    
+def resolveMerged(merged, taxon_id):
+    """Return the tax_id (as a string) of a taxon_id, following merged tax ids
+    read with readMerged. Raise TaxdumpError for loops in merged tax ids"""
+    
+    tax_id = str(taxon_id)
+    
+    # a tax id could be merged many times in different releases
+    visited = set()
+    
+    while tax_id in merged:
+        if tax_id in visited:
+            raise TaxdumpError("Loop in merged tax ids for %s" %(taxon_id))
+            
+        visited.add(tax_id)
+        tax_id = merged[tax_id]
+        
+    return tax_id
+    
+
+def fingerprint(*filenames):
+    """Return the md5 of files contents (ie nodes.dmp and names.dmp, compressed
+    or not). It identifies a taxdump release"""
+    
+    digest = hashlib.md5()
+    
+    # the same archive could be used for nodes and names
+    visited = set()
+    
+    for filename in filenames:
+        if filename is None or filename in visited:
+            continue
+            
+        visited.add(filename)
+        
+        with open(filename, "rb") as handle:
+            for block in iter(lambda: handle.read(1024*1024), ""):
+                digest.update(block)
+                
+    return digest.hexdigest()
+    
@@ -0,0 +1,372 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 19:04:27 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import time
+import hashlib
+import logging
+
+from neotaxonomy.Neo4j import TaxGraph, TaxNode, TaxName, TaxNodefile, TaxNamefile, node_parser, name_parser, relationshipName, iterChunks
+from neotaxonomy.Index import TaxonomyIndex
+from neotaxonomy.Taxdump import openDmp, readMerged, readDelnodes, fingerprint
+from neotaxonomy.exceptions import TaxGraphError
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+# names hashes of a taxon are summed, in order to not depend on names order
+names_modulo = 2 ** 128
+
+def encode(value):
+    """Encode a value returned by database like file contents"""
+    
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+        
+    return value
+    
+def nodeHash(rank, hidden_flag):
+    """Get a content hash for a node"""
+    
+    return hashlib.md5("%s|%s" %(encode(rank), encode(hidden_flag))).digest()
+    
+def nameHash(relationship_name, name_txt, unique_name):
+    """Get a content hash for a name, as an integer"""
+    
+    return int(hashlib.md5("%s|%s|%s" %(encode(relationship_name), encode(name_txt), encode(unique_name))).hexdigest(), 16)
+    
+
+class TaxUpdate(TaxGraph):
+    """Update a taxonomy database with a new taxdump release, writing only what
+    is changed"""
+    
+    def __init__(self, **kwargs):
+        """Instance the class"""
+        
+        TaxGraph.__init__(self, **kwargs)
+        
+        # When do a transaction
+        self.iter = 1000
+        
+    def readDatabase(self):
+        """Read nodes and names in database. Return two dictionaries: tax_id ->
+        (parent tax_id, node hash) and tax_id -> names hash"""
+        
+        nodes, names = {}, {}
+        
+        logger.info("Reading nodes in database...")
+        
+        query = """MATCH (node:%s) OPTIONAL MATCH (parent:%s)-[:PARENT]->(node) RETURN node.tax_id, parent.tax_id, node.rank, node.hidden_flag""" %(TaxNode.label, TaxNode.label)
+        
+        try:
+            cursor = self.graph.run(query)
+        
+        except AttributeError, message:
+            raise TaxGraphError("You need to connect to database before updating: %s" %(message))
+        
+        for tax_id, parent, rank, hidden_flag in cursor:
+            nodes[tax_id] = (parent, nodeHash(rank, hidden_flag))
+            
+        cursor.close()
+        
+        logger.info("Reading names in database...")
+        
+        query = """MATCH (node:%s)-[relationship]->(name:%s) RETURN node.tax_id, type(relationship), name.name_txt, name.unique_name""" %(TaxNode.label, TaxName.label)
+        cursor = self.graph.run(query)
+        
+        for tax_id, relationship_name, name_txt, unique_name in cursor:
+            names[tax_id] = (names.get(tax_id, 0) + nameHash(relationship_name, name_txt, unique_name)) % names_modulo
+            
+        cursor.close()
+        
+        logger.info("%s nodes and %s names read" %(len(nodes), len(names)))
+        
+        return nodes, names
+        
+    def readNames(self, dmp_file="names.dmp"):
+        """Read names from a file. Return a dictionary of tax_id -> names hash"""
+        
+        names = {}
+        
+        handle = openDmp(dmp_file, TaxNamefile.dmp_name)
+        
+        for record in name_parser.iterRecords(handle):
+            value = nameHash(relationshipName(record.name_class), record.name_txt, record.unique_name)
+            names[record.tax_id] = (names.get(record.tax_id, 0) + value) % names_modulo
+            
+        handle.close()
+        
+        return names
+        
+    def update(self, nodes_file="nodes.dmp", names_file="names.dmp", merged_file=None, delnodes_file=None, dry_run=False):
+        """Compare nodes and names files with database, and apply changes. Taxa
+        listed in merged and delnodes files are deleted. Files could be compressed,
+        or a taxdump archive. Return a dictionary with the number of changes"""
+        
+        start = time.time()
+        
+        db_nodes, db_names = self.readDatabase()
+        
+        # merged and deleted taxa
+        retired = set()
+        
+        if merged_file is not None:
+            retired.update(readMerged(merged_file).keys())
+            
+        if delnodes_file is not None:
+            retired.update(readDelnodes(delnodes_file))
+            
+        logger.info("Comparing nodes...")
+        
+        # tax_id in new release, and changes to apply
+        tax_ids = set()
+        added, changed, relations = [], [], {}
+        
+        handle = openDmp(nodes_file, TaxNodefile.dmp_name)
+        
+        for record in node_parser.iterRecords(handle):
+            tax_ids.add(record.tax_id)
+            
+            # root node has no parent in database
+            parent = record.parent
+            
+            if parent == record.tax_id:
+                parent = None
+                
+            node_hash = nodeHash(record.rank, record.hidden_flag)
+            
+            if record.tax_id not in db_nodes:
+                added.append(record)
+                relations[record.tax_id] = record.parent
+                continue
+                
+            db_parent, db_hash = db_nodes[record.tax_id]
+            
+            if db_hash != node_hash:
+                changed.append(record)
+                
+            if db_parent != parent:
+                relations[record.tax_id] = record.parent
+                
+        handle.close()
+        
+        # taxa not in new release
+        removed = [tax_id for tax_id in db_nodes.iterkeys() if tax_id not in tax_ids]
+        unexpected = [tax_id for tax_id in removed if tax_id not in retired]
+        
+        if len(unexpected) > 0:
+            logger.warn("%s taxa are not in new release, neither in merged or deleted taxa" %(len(unexpected)))
+            
+        # relations of added nodes are not reparented edges
+        reparented = [tax_id for tax_id in relations.iterkeys() if tax_id in db_nodes]
+        
+        logger.info("Comparing names...")
+        
+        new_names = self.readNames(names_file)
+        renamed = set([tax_id for tax_id in tax_ids if tax_id in db_nodes and new_names.get(tax_id) != db_names.get(tax_id)])
+        
+        # free memory
+        del db_nodes, db_names, new_names
+        
+        stats = {
+            "removed": len(removed),
+            "added": len(added),
+            "changed": len(changed),
+            "reparented": len(reparented),
+            "renamed": len(renamed),
+        }
+        
+        logger.info("Changes: %s" %(", ".join(["%s %s" %(value, key) for key, value in sorted(stats.iteritems())])))
+        
+        if dry_run is True:
+            return stats
+        
+        # delete taxa and their names
+        query = """UNWIND {rows} AS tax_id MATCH (node:%s {tax_id: tax_id}) OPTIONAL MATCH (node)-->(name:%s) DETACH DELETE name, node""" %(TaxNode.label, TaxName.label)
+        
+        for rows in iterChunks(removed, self.iter):
+            self.runBatch(query, rows)
+            
+        # add new nodes, with the same properties of TaxNode.getNeo4j()
+        query = """UNWIND {rows} AS row CREATE (node:%s) SET node = row""" %(TaxNode.label)
+        
+        for records in iterChunks(added, self.iter):
+            self.runBatch(query, [{"tax_id": record.tax_id, "hidden_flag": record.hidden_flag, "rank": record.rank} for record in records])
+            
+        # update properties
+        query = """UNWIND {rows} AS row MATCH (node:%s {tax_id: row.tax_id}) SET node.rank = row.rank, node.hidden_flag = row.hidden_flag""" %(TaxNode.label)
+        
+        for records in iterChunks(changed, self.iter):
+            self.runBatch(query, [{"tax_id": record.tax_id, "hidden_flag": record.hidden_flag, "rank": record.rank} for record in records])
+            
+        # remove old PARENT relationships, then add relationships for new and reparented nodes
+        query = """UNWIND {rows} AS tax_id MATCH (:%s)-[relationship:PARENT]->(node:%s {tax_id: tax_id}) DELETE relationship""" %(TaxNode.label, TaxNode.label)
+        
+        for rows in iterChunks(reparented, self.iter):
+            self.runBatch(query, rows)
+            
+        nodefile = TaxNodefile()
+        nodefile.graph, nodefile.iter = self.graph, self.iter
+        nodefile.insertRelations(relations)
+        
+        # delete changed names, and add names for new and changed taxa
+        query = """UNWIND {rows} AS tax_id MATCH (:%s {tax_id: tax_id})-->(name:%s) DETACH DELETE name""" %(TaxNode.label, TaxName.label)
+        
+        for rows in iterChunks(renamed, self.iter):
+            self.runBatch(query, rows)
+            
+        renamed.update([record.tax_id for record in added])
+        
+        handle = openDmp(names_file, TaxNamefile.dmp_name)
+        
+        namefile = TaxNamefile()
+        namefile.graph, namefile.iter = self.graph, self.iter
+        namefile.insertNames((line for line in handle if name_parser.parse(line).tax_id in renamed), bulk=True)
+        
+        handle.close()
+        
+        # update scientific names stored on nodes
+        if self.hasScientificNames():
+            denormalizeNames(self, names_file, tax_ids=renamed)
+            
+        # cached lineages are not valid anymore
+        self.clearCache()
+        self.setRelease(fingerprint(nodes_file, names_file))
+        
+        elapsed = time.time() - start
+        logger.info("Update completed in %.1fs" %(elapsed))
+        
+        return stats
+        
+
+def materializeLineages(taxgraph, nodes_file="nodes.dmp", names_file="names.dmp"):
+    """Store on each TaxNode its ancestor tax ids, scientific names and ranks
+    (from root to node) and its abbreviated lineage, as lineage_ids, lineage_names,
+    lineage_ranks and lineage_abbreviated properties. Files need to be the release
+    in database. Lineages are then read without traversing the tree, until a
+    new release is set. Return the number of nodes updated"""
+    
+    if taxgraph.getRelease() != fingerprint(nodes_file, names_file):
+        raise TaxGraphError("Files are not the release in database. You need to set release after loading data")
+        
+    index = TaxonomyIndex(nodes_file, names_file)
+    
+    query = """UNWIND {rows} AS row MATCH (node:%s {tax_id: row.tax_id}) SET node.lineage_ids = row.ids, node.lineage_names = row.names, node.lineage_ranks = row.ranks, node.lineage_abbreviated = row.abbreviated RETURN count(*)""" %(TaxNode.label)
+    
+    # count nodes updated
+    count = 0
+    
+    logger.info("Materializing lineages...")
+    
+    # to measure throughput
+    start = time.time()
+    
+    for chunk in iterChunks(index.iterLineages(), taxgraph.batch_size):
+        rows = [{"tax_id": tax_id, "ids": ids, "names": names, "ranks": ranks, "abbreviated": abbreviated} for tax_id, ids, names, ranks, abbreviated in chunk]
+        count += taxgraph.runBatch(query, rows)
+        logger.debug("%s lineages materialized" %(count))
+        
+    # lineages are valid for this release
+    taxgraph.graph.run("""MATCH (release:%s) SET release.materialized = release.fingerprint""" %(taxgraph.release_label))
+    taxgraph.clearCache()
+    
+    elapsed = time.time() - start
+    logger.info("%s lineages materialized in %.1fs" %(count, elapsed))
+    
+    return count
+    
+def storeIntervals(taxgraph, nodes_file="nodes.dmp", names_file="names.dmp"):
+    """Store on each TaxNode its pre and post-order numbers, as pre_order and
+    post_order properties: descendants of a node have pre_order inside its
+    interval. Files need to be the release in database. Return the number of
+    nodes updated"""
+    
+    if taxgraph.getRelease() != fingerprint(nodes_file, names_file):
+        raise TaxGraphError("Files are not the release in database. You need to set release after loading data")
+        
+    index = TaxonomyIndex(nodes_file)
+    
+    query = """UNWIND {rows} AS row MATCH (node:%s {tax_id: row.tax_id}) SET node.pre_order = row.pre_order, node.post_order = row.post_order RETURN count(*)""" %(TaxNode.label)
+    
+    # count nodes updated
+    count = 0
+    
+    logger.info("Storing pre and post-order numbers...")
+    
+    for chunk in iterChunks(index.iterIntervals(), taxgraph.batch_size):
+        rows = [{"tax_id": tax_id, "pre_order": pre_order, "post_order": post_order} for tax_id, pre_order, post_order in chunk]
+        count += taxgraph.runBatch(query, rows)
+        logger.debug("%s nodes numbered" %(count))
+        
+    # descendants are read with range queries
+    taxgraph.graph.run("""CREATE INDEX ON :%s(pre_order)""" %(TaxNode.label))
+    
+    # numbers are valid for this release
+    taxgraph.graph.run("""MATCH (release:%s) SET release.numbered = release.fingerprint""" %(taxgraph.release_label))
+    taxgraph.clearCache()
+    
+    logger.info("%s nodes numbered" %(count))
+    
+    return count
+    
+
+def denormalizeNames(taxgraph, names_file="names.dmp", tax_ids=None):
+    """Store scientific names as a scientific_name property of TaxNodes, so
+    lineage queries don't need to join TaxNames. TaxNames and their relationships
+    are not modified. If tax_ids is provided, only those nodes are updated. Return
+    the number of nodes updated"""
+    
+    query = """UNWIND {rows} AS row MATCH (node:%s {tax_id: row.tax_id}) SET node.scientific_name = row.name RETURN count(*)""" %(TaxNode.label)
+    
+    # a taxon could lose its scientific name
+    if tax_ids is not None:
+        remove_query = """UNWIND {rows} AS tax_id MATCH (node:%s {tax_id: tax_id}) REMOVE node.scientific_name""" %(TaxNode.label)
+        
+        for rows in iterChunks(tax_ids, taxgraph.batch_size):
+            taxgraph.runBatch(remove_query, rows)
+            
+    # count nodes updated
+    count = 0
+    
+    logger.info("Storing scientific names on nodes...")
+    
+    handle = openDmp(names_file, TaxNamefile.dmp_name)
+    
+    records = (record for record in name_parser.iterRecords(handle) if record.name_class == TaxonomyIndex.scientific_name and (tax_ids is None or record.tax_id in tax_ids))
+    
+    for chunk in iterChunks(records, taxgraph.batch_size):
+        count += taxgraph.runBatch(query, [{"tax_id": record.tax_id, "name": record.name_txt} for record in chunk])
+        logger.debug("%s scientific names stored" %(count))
+        
+    handle.close()
+    
+    # lineage queries can read names from nodes
+    taxgraph.graph.run("""MERGE (release:%s) SET release.scientific_names = true""" %(taxgraph.release_label))
+    taxgraph.clearCache()
+    
+    logger.info("%s scientific names stored on nodes" %(count))
+    
+    return count
+    
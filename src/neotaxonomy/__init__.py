@@ -32,11 +32,19 @@ __maintainer__ = "Paolo Cozzi"
 __email__ = "paolo.cozzi@ptp.it"
 __status__ = "alfa"
 
-from neotaxonomy.Neo4j import TaxGraph, TaxNode, TaxNodefile, TaxName, TaxNamefile
+from neotaxonomy.Neo4j import TaxGraph, TaxNode, TaxNodefile, TaxName, TaxNamefile, writeImportCSV
+
+from neotaxonomy.Index import TaxonomyIndex, NameIndex
+
+from neotaxonomy.Parallel import parallelLoad
+
+from neotaxonomy.Update import TaxUpdate, materializeLineages, storeIntervals, denormalizeNames
     
-from neotaxonomy.exceptions import NeoTaxonomyError, TaxGraphError
+from neotaxonomy.exceptions import NeoTaxonomyError, TaxGraphError, TaxonomyIndexError, TaxdumpError
 
 # All libraries imported with import *
-__all__ = ["TaxGraph", "TaxNode", "TaxNodefile", "TaxName", "TaxNamefile", "NeoTaxonomyError", 
-           "TaxGraphError"]
+__all__ = ["TaxGraph", "TaxNode", "TaxNodefile", "TaxName", "TaxNamefile", "writeImportCSV",
+           "TaxonomyIndex", "NameIndex", "parallelLoad", "TaxUpdate", "materializeLineages", "storeIntervals", "denormalizeNames",
+           "NeoTaxonomyError", "TaxGraphError", 
+           "TaxonomyIndexError", "TaxdumpError"]
            
@@ -28,8 +28,17 @@ import os
 import sys
 import logging
 import argparse
+import collections
+import multiprocessing
 
-from neotaxonomy import TaxGraph, TaxNodefile, TaxNamefile, TaxGraphError
+from neotaxonomy.Neo4j import iterChunks
+from neotaxonomy.Concurrent import LineageExecutor
+from neotaxonomy.Search import NameSearch
+from neotaxonomy.Ancestry import LCAIndex
+from neotaxonomy.Metrics import Metrics
+from neotaxonomy.Taxdump import fingerprint, readMerged, resolveMerged
+from neotaxonomy.Update import materializeLineages, storeIntervals, denormalizeNames
+from neotaxonomy import NameIndex, TaxonomyIndex, TaxGraph, TaxNodefile, TaxNamefile, TaxUpdate, TaxGraphError, TaxonomyIndexError, TaxdumpError, writeImportCSV, parallelLoad
 
 # programname
 program_name = os.path.basename(sys.argv[0])
@@ -92,14 +101,24 @@ RETURN count(*)
         logger.debug("%s TaxNames deleted" %(progressive))
         cursor = taxgraph.graph.run(query)
         counts = cursor.evaluate()
+        
+    # release is not valid anymore
+    taxgraph.graph.run("MATCH (release:%s) DELETE release" %(taxgraph.release_label))
+    
+def logStats(metrics):
+    """Log a summary of stage timings, elapsed time and peak memory"""
+    
+    for line in metrics.getSummary():
+        logger.info(line)
 
 # a function to fill taxonomy database
 def fillTaxonomyDB():
     """Fill taxonomy database when files are provided"""
     
     parser = argparse.ArgumentParser(description='Load taxonomy data into database')
-    parser.add_argument("--nodes", help="input node file", required=True, type=str)
-    parser.add_argument("--names", help="input name file", required=True, type=str)
+    parser.add_argument("--nodes", help="input node file (could be compressed)", required=False, type=str)
+    parser.add_argument("--names", help="input name file (could be compressed)", required=False, type=str)
+    parser.add_argument("--taxdump", help="read nodes and names from taxdump archive (ie taxdump.tar.gz)", required=False, type=str)
     parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
     parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
     parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
@@ -107,42 +126,189 @@ def fillTaxonomyDB():
     parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
     parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
     parser.add_argument("--drop_all", help="Drop all TaxNodes and TaxNames in database", action='store_true', default=False)
+    parser.add_argument("--bulk", help="Load data with UNWIND queries (faster)", action='store_true', default=False)
+    parser.add_argument("--workers", help="Load data with N processes, using UNWIND queries (def '%(default)s')", type=int, required=False, default=1, metavar="N")
+    parser.add_argument("--emit-import-csv", help="Don't load data: write CSV files for neo4j-admin import in this directory", type=str, required=False, metavar="DIR")
+    parser.add_argument("--materialize", help="Store lineages on nodes after loading data (faster lineage queries)", action='store_true', default=False)
+    parser.add_argument("--scientific_names", help="Store scientific names on nodes after loading data (faster lineage queries)", action='store_true', default=False)
+    parser.add_argument("--intervals", help="Store pre and post-order numbers on nodes after loading data (faster descendant queries)", action='store_true', default=False)
+    parser.add_argument("--stats", help="Report time, rate and commit latency of each loading stage, and peak memory", action='store_true', default=False)
     args = parser.parse_args()
     
+    # read files from archive if not specified
+    if args.taxdump is not None:
+        args.nodes = args.nodes or args.taxdump
+        args.names = args.names or args.taxdump
+        
+    if args.nodes is None or args.names is None:
+        parser.error("You need to provide --nodes and --names files, or a --taxdump archive")
+    
     # debug
     logger.info("%s started" %(program_name))
     
-    # erasing data if necessary
+    # timings of loading stages
+    metrics = None
+    
+    if args.stats is True:
+        metrics = Metrics()
+        
+        if args.workers > 1:
+            logger.warn("Stages of worker processes are not measured")
+    
+    # write files for neo4j-admin import, without connecting to database
+    if args.emit_import_csv is not None:
+        writeImportCSV(args.emit_import_csv, nodes_file=args.nodes, names_file=args.names)
+        logger.info("%s finished" %(program_name))
+        return
+    
+    # ask before erasing data
     if args.drop_all is True:
         response = raw_input('This will erase all TaxNodes and Taxnames (and their relations). Proceed [Y/n]? ')
-        if response == "Y":
-            taxgraph = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
-            taxgraph.connect()
-            deleteall(taxgraph)
-            
-        elif response.lower() == "n":
+        
+        if response.lower() == "n":
             logger.info("No changes made. Exiting")
             return
         
-        else:
+        elif response != "Y":
             logger.error("Only [Y/n] values allowed. Aborted")
             return
     
+    # start processes before connecting to database, so they don't share connections
+    pool = None
+    
+    if args.workers > 1:
+        pool = multiprocessing.Pool(args.workers)
+        
+    try:
+        # erasing data if necessary
+        if args.drop_all is True:
+            taxgraph = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+            taxgraph.connect()
+            deleteall(taxgraph)
+            
+        # load data with many processes
+        if args.workers > 1:
+            parallelLoad(nodes_file=args.nodes, names_file=args.names, workers=args.workers, pool=pool, host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+            
+        else:
+            loadTaxonomy(args, metrics)
+            
+    finally:
+        # parallelLoad closes the pool, unless something went wrong before
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        
+    # tag database with loaded release
+    taxgraph = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+    taxgraph.connect()
+    taxgraph.metrics = metrics
+    taxgraph.setRelease(fingerprint(args.nodes, args.names))
+    
+    if args.scientific_names is True:
+        denormalizeNames(taxgraph, names_file=args.names)
+        
+    if args.materialize is True:
+        materializeLineages(taxgraph, nodes_file=args.nodes, names_file=args.names)
+        
+    if args.intervals is True:
+        storeIntervals(taxgraph, nodes_file=args.nodes, names_file=args.names)
+        
+    if metrics is not None:
+        logStats(metrics)
+    
+    #debug
+    logger.info("%s finished" %(program_name))
+    
+def loadTaxonomy(args, metrics=None):
+    """Load nodes and names in a single process. Stage timings are recorded in
+    metrics, if provided"""
+    
     # get a nodefile object
     logger.info("Loading nodes...")
     nodefile = TaxNodefile(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
     nodefile.connect()
-    nodefile.insertFrom(dmp_file=args.nodes)
+    nodefile.metrics = metrics
+    nodefile.insertFrom(dmp_file=args.nodes, bulk=args.bulk)
     
     # get a namefile object
     logger.info("Loading names...")
     namefile = TaxNamefile(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
     namefile.connect()
-    namefile.insertFrom(dmp_file=args.names)
+    namefile.metrics = metrics
+    namefile.insertFrom(dmp_file=args.names, bulk=args.bulk)
     
-    #debug
+# a function to update taxonomy database
+def updateTaxonomyDB():
+    """Update taxonomy database with a new taxdump release"""
+    
+    parser = argparse.ArgumentParser(description='Update taxonomy database with a new taxdump release')
+    parser.add_argument("--nodes", help="input node file (could be compressed)", required=False, type=str)
+    parser.add_argument("--names", help="input name file (could be compressed)", required=False, type=str)
+    parser.add_argument("--merged", help="input merged file (could be compressed)", required=False, type=str)
+    parser.add_argument("--delnodes", help="input delnodes file (could be compressed)", required=False, type=str)
+    parser.add_argument("--taxdump", help="read nodes, names, merged and delnodes from taxdump archive (ie taxdump.tar.gz)", required=False, type=str)
+    parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
+    parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
+    parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
+    parser.add_argument("--http_port", help="Database http port (def '%(default)s')", type=int, required=False, default=TaxGraph.http_port)
+    parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
+    parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
+    parser.add_argument("--dry_run", help="Report changes without modifying database", action='store_true', default=False)
+    parser.add_argument("--materialize", help="Store lineages on nodes after updating data (faster lineage queries)", action='store_true', default=False)
+    parser.add_argument("--intervals", help="Store pre and post-order numbers on nodes after updating data (faster descendant queries)", action='store_true', default=False)
+    args = parser.parse_args()
+    
+    # read files from archive if not specified
+    if args.taxdump is not None:
+        args.nodes = args.nodes or args.taxdump
+        args.names = args.names or args.taxdump
+        args.merged = args.merged or args.taxdump
+        args.delnodes = args.delnodes or args.taxdump
+        
+    if args.nodes is None or args.names is None:
+        parser.error("You need to provide --nodes and --names files, or a --taxdump archive")
+    
+    # debug
+    logger.info("%s started" %(program_name))
+    
+    taxupdate = TaxUpdate(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+    taxupdate.connect()
+    taxupdate.update(nodes_file=args.nodes, names_file=args.names, merged_file=args.merged, delnodes_file=args.delnodes, dry_run=args.dry_run)
+    
+    if args.materialize is True and args.dry_run is False:
+        materializeLineages(taxupdate, nodes_file=args.nodes, names_file=args.names)
+        
+    if args.intervals is True and args.dry_run is False:
+        storeIntervals(taxupdate, nodes_file=args.nodes, names_file=args.names)
+    
+    # debug
     logger.info("%s finished" %(program_name))
 
+def iterTaxa(handle, column=None):
+    """Yield (row, taxa id) from a file with a taxa id per line, or from a column
+    (1-based) of a tab separated file. Taxa id is None if column is missing"""
+    
+    for line in handle:
+        row = line.rstrip("\r\n")
+        
+        # skip empty lines
+        if row.strip() == "":
+            continue
+            
+        if column is None:
+            yield row, row.strip()
+            continue
+            
+        fields = row.split("\t")
+        
+        if len(fields) < column:
+            logger.error("No column %s in '%s'" %(column, row))
+            yield row, None
+            
+        else:
+            yield row, fields[column-1].strip()
+            
 # a function to get taxonomies from input
 def taxaid2Lineage():
     """Get lineage from taxa id(s)"""
@@ -157,36 +323,407 @@ def taxaid2Lineage():
     parser.add_argument("--full", help="Get NCBI full taxonomy", action='store_true', default=False)
     parser.add_argument("--abbreviated", help="Get NCBI abbreviated taxonomy", action='store_true', default=False)
     parser.add_argument("--no_root", help="Exclude root node from NCBI taxonomy", action="store_true", default=False)
-    parser.add_argument('taxa', nargs='+', help='taxa id (or ids)')
+    parser.add_argument("--merged", help="follow merged tax ids from this file (could be compressed)", required=False, type=str)
+    parser.add_argument("--delnodes", help="skip deleted tax ids from this file (could be compressed)", required=False, type=str)
+    parser.add_argument("--taxdump", help="read merged and delnodes from taxdump archive (ie taxdump.tar.gz)", required=False, type=str)
+    parser.add_argument("--cache", help="store lineages in this file, and reuse them in other runs with the same database", required=False, type=str, metavar="FILE")
+    parser.add_argument("--input", help="read taxa ids from this file, one per line ('-' for stdin)", required=False, type=str, metavar="FILE")
+    parser.add_argument("--column", help="read taxa ids from this column (1-based) of a tab separated input. Lineage is added to each row", required=False, type=int, metavar="N")
+    parser.add_argument("--window", help="resolve input rows in windows of N rows, each taxa id once (def '%(default)s')", required=False, type=int, default=10000, metavar="N")
+    parser.add_argument("--concurrency", help="search lineages with N concurrent sessions (def '%(default)s')", required=False, type=int, default=1, metavar="N")
+    parser.add_argument("--resolved", help="Add the tax id found in database (ie for merged tax ids) before lineage", action='store_true', default=False)
+    parser.add_argument("--stats", help="Report time, rate and latency of queries and row reading, and peak memory", action='store_true', default=False)
+    parser.add_argument('taxa', nargs='*', help='taxa id (or ids)')
     args = parser.parse_args()
     
+    if args.input is None and len(args.taxa) == 0:
+        parser.error("You need to provide taxa ids, or an --input file")
+        
+    if args.column is not None and args.column < 1:
+        parser.error("--column need to be a positive number")
+    
     # debug
     logger.info("%s started" %(program_name))
     
     db = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
     db.connect()
     
-    for taxa in args.taxa:
-        lineage = []
+    # read files from archive if not specified
+    if args.taxdump is not None:
+        args.merged = args.merged or args.taxdump
+        args.delnodes = args.delnodes or args.taxdump
+        
+    if args.merged is not None or args.delnodes is not None:
+        db.loadRedirects(merged_file=args.merged, delnodes_file=args.delnodes)
+        
+    if args.cache is not None:
+        db.openPersistentCache(args.cache)
+        
+    # sessions of concurrent threads share metrics
+    if args.stats is True:
+        db.enableMetrics()
+        
+    # search lineages with many threads
+    executor = None
+    
+    if args.concurrency > 1:
+        executor = LineageExecutor(db, args.concurrency)
+    
+    # (row, taxa id) to resolve. An input file is closed at the end
+    handle = None
+    
+    if args.input is None:
+        rows = [(taxa, taxa) for taxa in args.taxa]
+        
+    elif args.input == "-":
+        rows = iterTaxa(sys.stdin, args.column)
         
-        try:
-            # check if I need NCBI taxonomy
-            if args.full is True or args.abbreviated is True:
-                lineage = db.getFullLineage(taxa, args.abbreviated)
+    else:
+        handle = open(args.input)
+        rows = iterTaxa(handle, args.column)
+    
+    try:
+        # process input in windows, in order to write output while reading
+        for window in iterChunks(rows, args.window):
+            # each taxa once, in input order
+            taxa_ids = collections.OrderedDict([(taxa, None) for row, taxa in window if taxa is not None]).keys()
+            
+            # check if I need NCBI taxonomy. Resolve all taxa with few queries
+            if executor is not None:
+                results = executor.iterLineages(taxa_ids, full=args.full, abbreviated=args.abbreviated)
                 
-                if args.no_root is True:
-                    lineage.remove("root")
+            elif args.full is True or args.abbreviated is True:
+                results = db.getFullLineages(taxa_ids, args.abbreviated)
                 
             else:
-                lineage = db.getLineage(taxa)
+                results = db.getLineages(taxa_ids)
+                
+            lineages = {}
+            
+            for taxa, resolved_id, lineage, error in results:
+                if error is not None:
+                    logger.error(error)
+                    lineage = []
+                    
+                elif args.no_root is True and "root" in lineage:
+                    lineage.remove("root")
+                    
+                if resolved_id is not None and resolved_id != taxa:
+                    logger.info("Tax id %s was resolved as %s" %(taxa, resolved_id))
+                    
+                if args.resolved is True:
+                    lineages[taxa] = "%s\t%s" %(resolved_id or "", ";".join(lineage))
+                    
+                else:
+                    lineages[taxa] = ";".join(lineage)
+                
+            # keep the same number of columns for rows without taxa id
+            missing = "\t" if args.resolved is True else ""
+            
+            for row, taxa in window:
+                print "%s\t" %(row) + lineages.get(taxa, missing)
                 
-        except TaxGraphError, message:
-            logger.error(message)
+            sys.stdout.flush()
+            
+    finally:
+        # write cached lineages, even if something goes wrong
+        if executor is not None:
+            executor.close()
             
-        print "%s\t" %(taxa) + ";".join(lineage)
+        db.closePersistentCache()
+        
+        if handle is not None:
+            handle.close()
+    
+    if args.stats is True:
+        logStats(db.metrics)
         
     # debug
     logger.info("%s finished" %(program_name))
     
     
-        
\ No newline at end of file
+        
+    
+# a function to get taxa ids from names
+def name2Taxaid():
+    """Get taxa id(s) from names"""
+    
+    parser = argparse.ArgumentParser(description='Get taxa id(s) from names')
+    parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
+    parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
+    parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
+    parser.add_argument("--http_port", help="Database http port (def '%(default)s')", type=int, required=False, default=TaxGraph.http_port)
+    parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
+    parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
+    parser.add_argument("--name_class", help="search only names of this class (ie 'scientific name', could be repeated). Def: all classes", action="append", required=False, type=str, dest="name_classes")
+    parser.add_argument("--names", help="don't connect to database: search names in this name file (could be compressed)", required=False, type=str)
+    parser.add_argument("--taxdump", help="don't connect to database: search names in taxdump archive (ie taxdump.tar.gz)", required=False, type=str)
+    parser.add_argument("--ignore_case", help="search names ignoring case (requires --names or --taxdump)", action="store_true", default=False)
+    parser.add_argument("--input", help="read names from this file, one per line ('-' for stdin)", required=False, type=str, metavar="FILE")
+    parser.add_argument("--column", help="read names from this column (1-based) of a tab separated input. Taxa ids are added to each row", required=False, type=int, metavar="N")
+    parser.add_argument("--window", help="resolve input rows in windows of N rows (def '%(default)s')", required=False, type=int, default=10000, metavar="N")
+    parser.add_argument('name', nargs='*', help='name (or names)')
+    args = parser.parse_args()
+    
+    if args.input is None and len(args.name) == 0:
+        parser.error("You need to provide names, or an --input file")
+        
+    if args.column is not None and args.column < 1:
+        parser.error("--column need to be a positive number")
+        
+    # read names from archive if not specified
+    args.names = args.names or args.taxdump
+        
+    if args.ignore_case is True and args.names is None:
+        parser.error("--ignore_case requires --names or --taxdump")
+        
+    # debug
+    logger.info("%s started" %(program_name))
+    
+    # search names in memory or in database
+    if args.names is not None:
+        db = NameIndex(args.names, name_classes=args.name_classes, ignore_case=args.ignore_case)
+        search = db.getTaxIdsByNames
+        
+    else:
+        db = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+        db.connect()
+        search = lambda names: db.getTaxIdsByNames(names, args.name_classes)
+        
+    # (row, name) to resolve. An input file is closed at the end
+    handle = None
+    
+    if args.input is None:
+        rows = [(name, name) for name in args.name]
+        
+    elif args.input == "-":
+        rows = iterTaxa(sys.stdin, args.column)
+        
+    else:
+        handle = open(args.input)
+        rows = iterTaxa(handle, args.column)
+        
+    # process input in windows, in order to write output while reading
+    for window in iterChunks(rows, args.window):
+        # each name once, in input order
+        names = collections.OrderedDict([(name, None) for row, name in window if name is not None]).keys()
+        
+        taxa_ids = {}
+        
+        for name, tax_ids in search(names):
+            if len(tax_ids) == 0:
+                logger.error("No taxa id found for '%s'" %(name))
+                
+            taxa_ids[name] = ",".join(tax_ids)
+            
+        for row, name in window:
+            print "%s\t" %(row) + taxa_ids.get(name, "")
+            
+        sys.stdout.flush()
+        
+    if handle is not None:
+        handle.close()
+        
+    # debug
+    logger.info("%s finished" %(program_name))
+    
+    
+# a function to search names by prefix or approximate match
+def searchTaxaName():
+    """Search names by prefix or with spelling errors"""
+    
+    parser = argparse.ArgumentParser(description='Search names by prefix or with spelling errors')
+    parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
+    parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
+    parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
+    parser.add_argument("--http_port", help="Database http port (def '%(default)s')", type=int, required=False, default=TaxGraph.http_port)
+    parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
+    parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
+    parser.add_argument("--index", help="read the search index from this file. With --names, --taxdump or --rebuild the index is written in this file", required=False, type=str, metavar="FILE")
+    parser.add_argument("--names", help="index names from this name file (could be compressed) instead of database", required=False, type=str)
+    parser.add_argument("--taxdump", help="index names from taxdump archive (ie taxdump.tar.gz) instead of database", required=False, type=str)
+    parser.add_argument("--rebuild", help="index names from database, even if --index file exists", action="store_true", default=False)
+    parser.add_argument("--name_class", help="index only names of this class (ie 'scientific name', could be repeated). Def: all classes", action="append", required=False, type=str, dest="name_classes")
+    parser.add_argument("--prefix", help="search names starting with text", action="store_true", default=False)
+    parser.add_argument("--max_distance", help="the maximum number of spelling errors (def '%(default)s')", required=False, type=int, default=2)
+    parser.add_argument("--limit", help="the maximum number of names returned for each search (def '%(default)s')", required=False, type=int, default=10)
+    parser.add_argument("--input", help="read text to search from this file, one per line ('-' for stdin)", required=False, type=str, metavar="FILE")
+    parser.add_argument('text', nargs='*', help='text to search')
+    args = parser.parse_args()
+    
+    if args.input is None and len(args.text) == 0:
+        parser.error("You need to provide text to search, or an --input file")
+        
+    # read names from archive if not specified
+    args.names = args.names or args.taxdump
+    
+    # debug
+    logger.info("%s started" %(program_name))
+    
+    index = NameSearch(name_classes=args.name_classes)
+    
+    if args.names is not None:
+        index.loadNames(args.names)
+        
+    elif args.index is not None and os.path.exists(args.index) and args.rebuild is False:
+        index.load(args.index)
+        
+    else:
+        db = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+        db.connect()
+        index.loadDatabase(db)
+        
+    # save a new index
+    if args.index is not None and (args.names is not None or args.rebuild is True or not os.path.exists(args.index)):
+        index.save(args.index)
+        
+    # an input file is closed at the end
+    handle = None
+    
+    if args.input is None:
+        texts = args.text
+        
+    elif args.input == "-":
+        texts = (text for row, text in iterTaxa(sys.stdin))
+        
+    else:
+        handle = open(args.input)
+        texts = (text for row, text in iterTaxa(handle))
+        
+    for text in texts:
+        if args.prefix is True:
+            results = [result + ("",) for result in index.searchPrefix(text, args.limit)]
+            
+        else:
+            results = index.search(text, args.max_distance, args.limit)
+            
+        if len(results) == 0:
+            logger.error("No names found for '%s'" %(text))
+            
+        for name_txt, tax_id, name_class, distance in results:
+            print (u"%s\t%s\t%s\t%s\t%s" %(text.decode("utf-8"), name_txt, tax_id, name_class, distance)).encode("utf-8")
+            
+        sys.stdout.flush()
+        
+    if handle is not None:
+        handle.close()
+        
+    # debug
+    logger.info("%s finished" %(program_name))
+    
+    
+def iterHits(rows, column):
+    """Yield lists of consecutive (row, value) with the same value in column
+    (1-based) of a tab separated file"""
+    
+    hits, last = [], None
+    
+    for row in rows:
+        fields = row.split("\t")
+        query = fields[column-1] if len(fields) >= column else None
+        
+        if len(hits) > 0 and query != last:
+            yield hits
+            hits = []
+            
+        hits.append(row)
+        last = query
+        
+    if len(hits) > 0:
+        yield hits
+        
+# a function to add the LCA of hits to a table
+def lcaHits():
+    """Add the lowest common ancestor of the hits of each query to a table"""
+    
+    parser = argparse.ArgumentParser(description='Add the lowest common ancestor of the hits of each query to a table')
+    parser.add_argument("--host", help="Database host (def '%(default)s')", type=str, required=False, default=TaxGraph.host)
+    parser.add_argument("--user", help="Database user (def '%(default)s')", type=str, required=False, default=TaxGraph.user)
+    parser.add_argument("--password", help="Database password (def '%(default)s')", type=str, required=False, default=TaxGraph.password)
+    parser.add_argument("--http_port", help="Database http port (def '%(default)s')", type=int, required=False, default=TaxGraph.http_port)
+    parser.add_argument("--https_port", help="Database https port (def '%(default)s')", type=int, required=False, default=TaxGraph.https_port)
+    parser.add_argument("--bolt_port", help="Database bold port (def '%(default)s')", type=int, required=False, default=TaxGraph.bolt_port)
+    parser.add_argument("--nodes", help="don't connect to database: read tree from this node file (could be compressed)", required=False, type=str)
+    parser.add_argument("--merged", help="input merged file (could be compressed)", required=False, type=str)
+    parser.add_argument("--taxdump", help="don't connect to database: read nodes and merged from taxdump archive (ie taxdump.tar.gz)", required=False, type=str)
+    parser.add_argument("--input", help="a tab separated table of hits ('-' for stdin). Hits of a query need to be consecutive", required=True, type=str, metavar="FILE")
+    parser.add_argument("--query_column", help="the column (1-based) of query ids (def '%(default)s')", required=False, type=int, default=1, metavar="N")
+    parser.add_argument("--taxid_column", help="the column (1-based) of hit taxa ids. Many taxa ids could be separated by ';'", required=True, type=int, metavar="N")
+    args = parser.parse_args()
+    
+    if args.query_column < 1 or args.taxid_column < 1:
+        parser.error("columns need to be positive numbers")
+        
+    if args.taxdump is not None:
+        args.nodes = args.nodes or args.taxdump
+        args.merged = args.merged or args.taxdump
+        
+    # debug
+    logger.info("%s started" %(program_name))
+    
+    taxonomy = TaxonomyIndex()
+    
+    if args.nodes is not None:
+        taxonomy.loadNodes(args.nodes)
+        
+    else:
+        db = TaxGraph(host=args.host, user=args.user, password=args.password, http_port=args.http_port, https_port=args.https_port, bolt_port=args.bolt_port)
+        db.connect()
+        taxonomy.loadDatabase(db)
+        
+    lca = LCAIndex(taxonomy)
+    merged = readMerged(args.merged) if args.merged is not None else {}
+    
+    if args.input == "-":
+        handle = sys.stdin
+        
+    else:
+        handle = open(args.input)
+        
+    rows = (row for row, value in iterTaxa(handle))
+    
+    for hits in iterHits(rows, args.query_column):
+        taxa_ids = set()
+        
+        for row, taxa_id in iterTaxa(hits, args.taxid_column):
+            if taxa_id is None:
+                continue
+                
+            for taxon_id in taxa_id.split(";"):
+                # follow merged tax ids like taxaid2Lineage does
+                try:
+                    taxon_id = resolveMerged(merged, taxon_id.strip())
+                    
+                except TaxdumpError, message:
+                    logger.warn("%s. Ignoring it" %(message))
+                    continue
+                    
+                if taxon_id in taxonomy:
+                    taxa_ids.add(taxon_id)
+                    
+                elif taxon_id != "":
+                    logger.warn("Tax id %s not found. Ignoring it" %(taxon_id))
+                    
+        value = ""
+        
+        if len(taxa_ids) == 0:
+            logger.error("No taxa ids found for '%s'" %(hits[0]))
+            
+        else:
+            try:
+                value = str(lca.getSetLCA(taxa_ids))
+                
+            except TaxonomyIndexError, message:
+                logger.error(message)
+            
+        for row in hits:
+            print "%s\t%s" %(row, value)
+            
+        sys.stdout.flush()
+        
+    if handle is not sys.stdin:
+        handle.close()
+        
+    # debug
+    logger.info("%s finished" %(program_name))
+    
@@ -33,3 +33,13 @@ class TaxGraphError(NeoTaxonomyError):
     """Error for TaxGraph classes"""
     
     pass
+
+class TaxonomyIndexError(NeoTaxonomyError):
+    """Error for TaxonomyIndex classes"""
+    
+    pass
+
+class TaxdumpError(NeoTaxonomyError):
+    """Error while reading taxdump files"""
+    
+    pass
@@ -0,0 +1,84 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 13:34:40 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import unittest
+import neotaxonomy
+
+from neotaxonomy.Abundance import AbundanceTree, numpy
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class AbundanceTreeTest(unittest.TestCase):
+    """A class to test counts summed up the tree"""
+    
+    tree = None
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.taxonomy = neotaxonomy.TaxonomyIndex(self.test_nodefile, self.test_namefile)
+        self.tree = AbundanceTree(self.taxonomy)
+        
+    def test_getIndexes(self):
+        
+        indexes = self.tree.getIndexes([562, 9606, 1, -1, 10**9])
+        self.assertEqual([self.taxonomy.getIndex(562), -1, self.taxonomy.getIndex(1), -1, -1], list(indexes))
+        
+    def test_rollUp(self):
+        
+        cumulative, unknown = self.tree.rollUp(numpy.array([562, 561, 9606, 2, 562]), numpy.array([10, 5, 7, 1, 2]))
+        counts = dict(zip(self.taxonomy.tax_ids, cumulative))
+        
+        self.assertEqual(12, counts[562])
+        self.assertEqual(17, counts[561])
+        self.assertEqual(17, counts[1224])
+        self.assertEqual(18, counts[2])
+        self.assertEqual(18, counts[1])
+        self.assertEqual([9606], list(unknown))
+        
+        # float counts (ie relative abundances)
+        cumulative, unknown = self.tree.rollUp([562, 543], [0.25, 0.5])
+        self.assertAlmostEqual(0.75, cumulative[self.taxonomy.getIndex(2)])
+        
+    def test_getRankTables(self):
+        
+        cumulative, unknown = self.tree.rollUp([562, 561, 2], [10, 5, 1])
+        tables = self.tree.getRankTables(cumulative, ranks=["species", "genus", "superkingdom", "strain"])
+        
+        tax_ids, counts = tables["genus"]
+        self.assertEqual([561], list(tax_ids))
+        self.assertEqual([15], list(counts))
+        
+        self.assertEqual([16], list(tables["superkingdom"][1]))
+        self.assertEqual(0, len(tables["strain"][0]))
+
+# testing library
+if __name__ == "__main__":
+    unittest.main()
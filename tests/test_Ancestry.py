@@ -0,0 +1,102 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 12:31:08 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import random
+import unittest
+import neotaxonomy
+
+from neotaxonomy.Ancestry import LCAIndex
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+class LCAIndexTest(unittest.TestCase):
+    """A class to test lowest common ancestors"""
+    
+    lca = None
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.lca = LCAIndex(neotaxonomy.TaxonomyIndex(self.test_nodefile))
+        
+    def test_getLCA(self):
+        
+        self.assertEqual(561, self.lca.getLCA(562, 561))
+        self.assertEqual(2, self.lca.getLCA("2", "562"))
+        self.assertEqual(562, self.lca.getSetLCA([562]))
+        self.assertEqual(1224, self.lca.getSetLCA([562, 543, 1224]))
+        self.assertRaisesRegexp(neotaxonomy.TaxonomyIndexError, "Tax id .* not found", self.lca.getLCA, 562, 9606)
+        
+    def test_getLCAs(self):
+        
+        results = self.lca.getLCAs([[562, 561], [562, 9606], []])
+        self.assertEqual(([562, 561], 561, None), results[0])
+        self.assertEqual(([562, 9606], None, "Tax id 9606 not found"), results[1])
+        self.assertIsNone(results[2][1])
+        
+    def test_randomTree(self):
+        """Testing a forest larger than a block"""
+        
+        random.seed(42)
+        taxonomy = neotaxonomy.TaxonomyIndex()
+        
+        # two trees: 0..499 and 500..999
+        for idx in xrange(1000):
+            taxonomy.index[idx+1] = idx
+            taxonomy.tax_ids.append(idx+1)
+            
+            if idx in (0, 500):
+                taxonomy.parents.append(idx)
+                
+            else:
+                taxonomy.parents.append(random.randrange(max(idx-20, 0 if idx < 500 else 500), idx))
+                
+        lca = LCAIndex(taxonomy)
+        
+        def ancestors(idx):
+            path = [idx]
+            
+            while taxonomy.parents[idx] != idx:
+                idx = taxonomy.parents[idx]
+                path.append(idx)
+                
+            return path
+            
+        for i in xrange(500):
+            first, second = random.randrange(1000), random.randrange(1000)
+            common = [idx for idx in ancestors(first) if idx in ancestors(second)]
+            
+            if len(common) == 0:
+                self.assertRaisesRegexp(neotaxonomy.TaxonomyIndexError, "haven't a common ancestor", lca.getLCA, first+1, second+1)
+                
+            else:
+                self.assertEqual(common[0]+1, lca.getLCA(first+1, second+1))
+
+# testing library
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 20:37:16 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from neotaxonomy.Cache import LRUCache, PersistentCache
+
+class LRUCacheTest(unittest.TestCase):
+    """A class to test the lineage cache"""
+    
+    def setUp(self):
+        self.cache = LRUCache(maxsize=2)
+        
+    def test_eviction(self):
+        """Testing the least recently used item is evicted"""
+        
+        self.cache.set("562", ["Escherichia coli"])
+        self.cache.set("561", ["Escherichia"])
+        
+        # 562 became the most recently used
+        self.assertEqual(["Escherichia coli"], self.cache.get("562"))
+        
+        self.cache.set("543", ["Enterobacteriaceae"])
+        self.assertNotIn("561", self.cache)
+        self.assertIn("562", self.cache)
+        self.assertEqual(2, len(self.cache))
+        
+        self.assertIsNone(self.cache.get("561"))
+        
+        reference = {"size": 2, "maxsize": 2, "hits": 1, "misses": 1, "evictions": 1}
+        self.assertEqual(reference, self.cache.getStats())
+        
+    def test_clear(self):
+        """Testing cache invalidation"""
+        
+        self.cache.set("562", ["Escherichia coli"])
+        self.cache.clear()
+        
+        self.assertEqual(0, len(self.cache))
+        self.assertIsNone(self.cache.get("562"))
+        
+        self.assertRaises(ValueError, LRUCache, 0)
+        
+class PersistentCacheTest(unittest.TestCase):
+    """A class to test lineages stored in a file"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "lineages.sqlite")
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        
+    def test_release(self):
+        """Testing lineages are written in batches, and tagged with release"""
+        
+        key = ("562", "lineage", (("genus", "g"), ("species", "s")))
+        lineage = [u"g__Escherichia", u"s__coli"]
+        
+        cache = PersistentCache(self.filename, "release1", batch_size=2)
+        cache.set(key, lineage)
+        
+        # not written until batch is full
+        self.assertIsNone(PersistentCache(self.filename, "release1").get(key))
+        
+        cache.set(("562", "full", None), [u"root"])
+        self.assertEqual(lineage, PersistentCache(self.filename, "release1").get(key))
+        cache.close()
+        
+        # another release doesn't see lineages
+        cache = PersistentCache(self.filename, "release2")
+        self.assertIsNone(cache.get(key))
+        self.assertEqual({"hits": 0, "misses": 1}, cache.getStats())
+        
+        cache.purge()
+        cache.close()
+        self.assertIsNone(PersistentCache(self.filename, "release1").get(key))
+        
+    def test_letters(self):
+        """Testing lineages with different prefixes have different keys"""
+        
+        cache = PersistentCache(self.filename, "release1", batch_size=1)
+        cache.set(("2", "lineage", (("superkingdom", "k"),)), [u"k__Bacteria"])
+        
+        self.assertIsNone(cache.get(("2", "lineage", (("superkingdom", "s"),))))
+        cache.close()
+        
+# testing library
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 10:48:12 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import unittest
+import neotaxonomy
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+class TaxonomyIndexTest(unittest.TestCase):
+    """A class to test in-memory lineages"""
+    
+    index = None
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.index = neotaxonomy.TaxonomyIndex(self.test_nodefile, self.test_namefile)
+        
+    def test_load(self):
+        """Testing loading nodes and names"""
+        
+        self.assertEqual(9, len(self.index))
+        self.assertIn(562, self.index)
+        self.assertIn("562", self.index)
+        self.assertNotIn(9606, self.index)
+        
+        self.assertEqual(561, self.index.getParent(562))
+        self.assertEqual("species", self.index.getRank(562))
+        self.assertEqual(u"Escherichia coli", self.index.getName(562))
+        self.assertRaisesRegexp(neotaxonomy.TaxonomyIndexError, "Tax id .* not found", self.index.getName, 9606)
+        
+    def test_getLineage(self):
+        
+        tmp = u"""k__Bacteria; p__Proteobacteria; c__Gammaproteobacteria; o__Enterobacterales; f__Enterobacteriaceae; g__Escherichia; s__coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        
+        self.assertEqual(reference, self.index.getLineage(562))
+        self.assertEqual([u"g__Escherichia", u"s__coli"], self.index.getLineage(562, ranks=["Genus", "Species"]))
+        
+    def test_getNoLineage(self):
+        # Homo sapiens is not included in test. Root has no parents
+        
+        self.assertRaisesRegexp(neotaxonomy.TaxonomyIndexError, "No lineage found for", self.index.getLineage, 9606)
+        self.assertRaisesRegexp(neotaxonomy.TaxonomyIndexError, "No lineage found for", self.index.getFullLineage, 1)
+        
+    def test_getFullLineage(self):
+        
+        tmp = u"""root; cellular organisms;Bacteria;Proteobacteria;Gammaproteobacteria;Enterobacterales;Enterobacteriaceae;Escherichia;Escherichia coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        
+        self.assertEqual(reference, self.index.getFullLineage(562))
+        
+    def test_getFullLineageAbbr(self):
+        
+        tmp = u"""root; Bacteria; Proteobacteria; Gammaproteobacteria; Enterobacterales; Enterobacteriaceae; Escherichia; Escherichia coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        
+        self.assertEqual(reference, self.index.getFullLineage(562, abbreviated=True))
+        
+    def test_getLineages(self):
+        
+        results = self.index.getFullLineages([562, 9606])
+        self.assertEqual((562, "562", self.index.getFullLineage(562), None), results[0])
+        self.assertEqual(9606, results[1][0])
+        self.assertIsNone(results[1][2])
+        
+        results = self.index.getLineages(["561"])
+        self.assertEqual(self.index.getLineage(561), results[0][2])
+
+    def test_iterLineages(self):
+        """Testing lineages computed from root"""
+        
+        lineages = dict([(tax_id, (ids, names, ranks, abbreviated)) for tax_id, ids, names, ranks, abbreviated in self.index.iterLineages()])
+        self.assertEqual(9, len(lineages))
+        
+        ids, names, ranks, abbreviated = lineages["562"]
+        self.assertEqual(["1", "131567", "2", "1224", "1236", "91347", "543", "561", "562"], ids)
+        self.assertEqual(self.index.getFullLineage(562), names)
+        self.assertEqual("species", ranks[-1])
+        self.assertEqual(self.index.getFullLineage(562, abbreviated=True), abbreviated)
+        
+        offsets, children = self.index.getChildren()
+        idx = self.index.getIndex(561)
+        self.assertEqual([self.index.getIndex(562)], list(children[offsets[idx]:offsets[idx+1]]))
+
+    def test_intervals(self):
+        """Testing pre and post-order numbers"""
+        
+        self.assertEqual((0, 17), self.index.getInterval(1))
+        self.assertEqual((8, 9), self.index.getInterval(562))
+        
+        self.assertTrue(self.index.isAncestor(2, 562))
+        self.assertFalse(self.index.isAncestor(562, 2))
+        self.assertFalse(self.index.isAncestor(562, 562))
+        
+        self.assertEqual([1236, 91347, 543, 561, 562], list(self.index.getDescendants(1224)))
+        self.assertEqual([562], list(self.index.getDescendants(2, rank="species")))
+        self.assertEqual([], list(self.index.getDescendants(2, rank="no rank at all")))
+        self.assertEqual([], list(self.index.getDescendants(562)))
+        
+class NameIndexTest(unittest.TestCase):
+    """A class to test in-memory name lookups"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    
+    def test_load(self):
+        """Testing scientific names"""
+        
+        index = neotaxonomy.NameIndex(self.test_namefile)
+        self.assertEqual(9, len(index))
+        self.assertIn("Escherichia coli", index)
+        self.assertNotIn("Bacillus coli", index)
+        
+        self.assertEqual(["562"], index.getTaxIdsByName("Escherichia coli"))
+        self.assertEqual([], index.getTaxIdsByName("escherichia coli"))
+        
+    def test_nameClasses(self):
+        """Testing all names, and ambiguous names"""
+        
+        index = neotaxonomy.NameIndex(self.test_namefile, name_classes=None)
+        self.assertEqual(["562"], index.getTaxIdsByName("Bacillus coli"))
+        self.assertEqual(["543", "91347"], index.getTaxIdsByName("gamma-3 proteobacteria"))
+        
+        index = neotaxonomy.NameIndex(self.test_namefile, name_classes=["synonym"])
+        self.assertEqual([], index.getTaxIdsByName("Escherichia coli"))
+        self.assertEqual(["562"], index.getTaxIdsByName("Bacterium coli"))
+        
+    def test_ignoreCase(self):
+        """Testing names ignoring case"""
+        
+        index = neotaxonomy.NameIndex(self.test_namefile, ignore_case=True)
+        self.assertEqual(["562"], index.getTaxIdsByName("escherichia COLI"))
+        
+        results = index.getTaxIdsByNames(["BACTERIA", "unknown"])
+        self.assertEqual([("BACTERIA", ["2"]), ("unknown", [])], results)
+
+# testing library
+if __name__ == "__main__":
+    unittest.main()
+
@@ -0,0 +1,115 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 17:21:09 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import unittest
+
+from neotaxonomy.Metrics import Metrics, Stopwatch, percentile, peakMemory
+
+class MetricsTest(unittest.TestCase):
+    """A class to test stage timings"""
+    
+    def setUp(self):
+        self.metrics = Metrics()
+        
+    def test_record(self):
+        """Testing calls, items and rates of stages"""
+        
+        self.metrics.record("commit", 0.5, 1000)
+        self.metrics.record("parse", 0.1, 1000)
+        self.metrics.record("commit", 1.5, 500)
+        
+        stats = self.metrics.getStats()
+        
+        # stages are sorted like loading
+        self.assertEqual(["parse", "commit"], stats.keys())
+        
+        self.assertEqual(2, stats["commit"]["calls"])
+        self.assertEqual(1500, stats["commit"]["items"])
+        self.assertAlmostEqual(2.0, stats["commit"]["seconds"])
+        self.assertAlmostEqual(750.0, stats["commit"]["rate"])
+        self.assertEqual(0.5, stats["commit"]["p50"])
+        self.assertEqual(1.5, stats["commit"]["p95"])
+        
+        # a line for each stage, elapsed time and peak memory
+        self.assertGreaterEqual(len(self.metrics.getSummary()), 4)
+        
+        self.metrics.clear()
+        self.assertEqual({}, self.metrics.getStats())
+        
+    def test_callback(self):
+        """Testing callback is called for each record"""
+        
+        records = []
+        metrics = Metrics(callback=lambda stage, seconds, items: records.append((stage, seconds, items)))
+        metrics.record("query", 0.25)
+        
+        self.assertEqual([("query", 0.25, 1)], records)
+        
+    def test_stopwatch(self):
+        """Testing consecutive stages are recorded every few items"""
+        
+        stopwatch = Stopwatch(self.metrics)
+        
+        for i in range(10):
+            stopwatch.lap("parse")
+            stopwatch.lap("build")
+            
+            if (i+1) % 5 == 0:
+                stopwatch.record(5)
+                
+        stats = self.metrics.getStats()
+        self.assertEqual(["parse", "build"], stats.keys())
+        self.assertEqual(2, stats["parse"]["calls"])
+        self.assertEqual(10, stats["build"]["items"])
+        
+        # nothing is measured without metrics
+        stopwatch = Stopwatch()
+        stopwatch.lap("parse")
+        stopwatch.record(1)
+        self.assertEqual(0, len(stopwatch.seconds))
+        
+    def test_percentile(self):
+        """Testing nearest rank percentiles"""
+        
+        values = range(1, 101)
+        
+        self.assertEqual(50, percentile(values, 0.50))
+        self.assertEqual(95, percentile(values, 0.95))
+        self.assertEqual(1, percentile([1], 0.95))
+        self.assertEqual(0.0, percentile([], 0.5))
+        
+    def test_peakMemory(self):
+        """Testing peak memory is measured"""
+        
+        memory = peakMemory()
+        
+        if memory is not None:
+            self.assertGreater(memory, 0)
+            
+# testing library
+if __name__ == "__main__":
+    unittest.main()
+    
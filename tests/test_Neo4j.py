@@ -25,11 +25,16 @@ Created on Thu Dec  1 14:55:02 2016
 """
 
 import os
+import csv
+import shutil
 import py2neo
+import tempfile
 import logging
 import unittest
 import neotaxonomy
 
+from neotaxonomy.Concurrent import LineageExecutor
+
 # getting module path
 current_path = os.path.dirname(__file__)
 
@@ -58,6 +63,21 @@ class TaxGraphTest(unittest.TestCase):
         taxgraph.connect(user="neo4j", password="password")
         self.assertIsInstance(taxgraph.graph, py2neo.database.Graph)
        
+    def test_sharedConnection(self):
+        """Testing objects with the same parameters share a connection"""
+        
+        taxgraph = neotaxonomy.TaxGraph(host="localhost", user="neo4j", password="password")
+        taxgraph.connect()
+        self.assertIsNotNone(taxgraph.connect_time)
+        
+        nodefile = neotaxonomy.TaxNodefile(host="localhost", user="neo4j", password="password")
+        nodefile.connect()
+        self.assertIs(taxgraph.graph, nodefile.graph)
+        self.assertEqual(0.0, nodefile.connect_time)
+        
+        # a clone doesn't use shared connection
+        self.assertGreater(taxgraph.clone().connect_time, 0.0)
+        
     def test_noConnect(self):
         """Testing no connection raise error"""
         
@@ -65,6 +85,11 @@ class TaxGraphTest(unittest.TestCase):
         taxgraph.max_attempts = 1
         self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Max attempts reached", taxgraph.connect, user="neo4j", password="neo4j")
         
+        # a deadline limits retries
+        taxgraph = neotaxonomy.TaxGraph(host="localhost")
+        taxgraph.max_attempts, taxgraph.deadline = 10, 0.1
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Deadline of .* reached", taxgraph.connect, user="neo4j", password="neo4j")
+        
         # get lineage with no connection
         taxgraph = neotaxonomy.TaxGraph(host="localhost")
         self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "You have to connect to database", taxgraph.getLineage, 562)
@@ -111,6 +136,17 @@ class TaxNodefileTest(unittest.TestCase):
         test_nodes = len(list(self.neo.graph.find(neotaxonomy.TaxNode.label)))
         self.assertEqual(ref_nodes, test_nodes)
         
+    def test_insertRelations(self):
+        """Testing PARENT relationships (root is not parent of itself)"""
+        
+        self.neo.insertFrom(self.test_nodefile)
+        ref_relations = file_len(self.test_nodefile) - 1
+        test_relations = self.neo.graph.run("MATCH (:TaxNode)-[r:PARENT]->(:TaxNode) RETURN count(r)").evaluate()
+        self.assertEqual(ref_relations, test_relations)
+        
+        # relationships are created only between loaded nodes
+        self.assertEqual(0, self.neo.insertRelations({"9606": "9605"}))
+        
     def test_insertFromLimit(self):
         """Testing loading nodes with more transactions"""
         
@@ -124,6 +160,61 @@ class TaxNodefileTest(unittest.TestCase):
         self.neo.insertFrom(self.test_nodefile)
         self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Node .* already exists", self.neo.insertFrom, self.test_nodefile)
         
+    def test_insertFromBulk(self):
+        """Testing loading nodes with UNWIND queries"""
+        
+        self.neo.insertFrom(self.test_nodefile, bulk=True)
+        ref_nodes = file_len(self.test_nodefile)
+        test_nodes = list(self.neo.graph.find(neotaxonomy.TaxNode.label))
+        self.assertEqual(ref_nodes, len(test_nodes))
+        
+        # nodes have the same properties of TaxNode.getNeo4j()
+        node = self.neo.graph.find_one(neotaxonomy.TaxNode.label, "tax_id", "562")
+        self.assertEqual({"tax_id": "562", "rank": "species", "hidden_flag": "1"}, dict(node))
+        
+        # relationships are the same
+        parent = self.neo.graph.find_one(neotaxonomy.TaxNode.label, "tax_id", "561")
+        self.assertIsNotNone(self.neo.graph.match_one(parent, "PARENT", node))
+        
+    def test_insertFromBulkLimit(self):
+        """Testing loading nodes with UNWIND queries and more transactions"""
+        
+        self.neo.insertFrom(self.test_nodefile, limit=7, bulk=True)
+        test_nodes = len(list(self.neo.graph.find(neotaxonomy.TaxNode.label)))
+        self.assertEqual(7, test_nodes)
+        
+    def test_insertFromBulkRaises(self):
+        """Insert already inserted nodes with UNWIND queries raises exception"""
+        
+        self.neo.insertFrom(self.test_nodefile, bulk=True)
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Node .* already exists", self.neo.insertFrom, self.test_nodefile, bulk=True)
+        
+    def test_insertFromMetrics(self):
+        """Testing timings of loading stages"""
+        
+        self.neo.enableMetrics()
+        self.neo.insertNodes(open(self.test_nodefile))
+        
+        ref_nodes = file_len(self.test_nodefile)
+        stats = self.neo.getMetrics()
+        
+        for stage in ["parse", "build", "create"]:
+            self.assertEqual(ref_nodes, stats[stage]["items"])
+            
+        # a commit every 5 nodes
+        self.assertEqual((ref_nodes+4) // 5, stats["commit"]["calls"])
+        self.assertLessEqual(stats["commit"]["p50"], stats["commit"]["p95"])
+        
+        # the same with UNWIND queries
+        self.neo.graph.delete_all()
+        self.neo.enableMetrics()
+        self.neo.insertNodes(open(self.test_nodefile), bulk=True)
+        
+        stats = self.neo.getMetrics()
+        self.assertEqual(ref_nodes, stats["parse"]["items"])
+        self.assertEqual(ref_nodes, stats["create"]["items"])
+        self.assertEqual((ref_nodes+4) // 5, stats["commit"]["calls"])
+        
 class TaxNamefileTest(unittest.TestCase):
     """A class to test node data load"""
     
@@ -185,6 +276,38 @@ class TaxNamefileTest(unittest.TestCase):
         
         self.neo.insertFrom(self.test_namefile)
         self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Node .* already exists", self.neo.insertFrom, self.test_namefile)
+        
+    def test_insertFromBulk(self):
+        """Testing loading names with UNWIND queries"""
+        
+        self.neo.insertFrom(self.test_namefile, bulk=True)
+        ref_nodes = file_len(self.test_namefile)
+        test_nodes = len(list(self.neo.graph.find(neotaxonomy.TaxName.label)))
+        self.assertEqual(ref_nodes, test_nodes)
+        
+        # each name has its relationship
+        test_relations = self.neo.graph.run("MATCH (:TaxNode)-[r]->(:TaxName) RETURN count(r)").evaluate()
+        self.assertEqual(ref_nodes, test_relations)
+        
+        name = self.neo.graph.run("MATCH (:TaxNode {tax_id: '562'})-[:SCIENTIFIC_NAME]->(name:TaxName) RETURN name.name_txt").evaluate()
+        self.assertEqual("Escherichia coli", name)
+        
+        # name classes with special characters
+        test_relations = self.neo.graph.run("MATCH (:TaxNode {tax_id: '2'})-[r:`IN-PART`]->(:TaxName) RETURN count(r)").evaluate()
+        self.assertEqual(6, test_relations)
+        
+    def test_insertFromBulkLimit(self):
+        """Testing loading names with UNWIND queries and more transactions"""
+        
+        self.neo.insertFrom(self.test_namefile, limit=7, bulk=True)
+        test_nodes = len(list(self.neo.graph.find(neotaxonomy.TaxName.label)))
+        self.assertEqual(7, test_nodes)
+        
+    def test_insertFromBulkRaises(self):
+        """Testing insert already inserted names with UNWIND queries raises exception"""
+        
+        self.neo.insertFrom(self.test_namefile, bulk=True)
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "Node .* already exists", self.neo.insertFrom, self.test_namefile, bulk=True)
 
 # testing functions
 class LineageTest(unittest.TestCase):
@@ -276,6 +399,236 @@ class LineageTest(unittest.TestCase):
         # testing lineage
         self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "No lineage found for", self.neo.getFullLineage, 9606)
         
+    def test_getLineages(self):
+        
+        tmp = u"""k__Bacteria; p__Proteobacteria; c__Gammaproteobacteria; o__Enterobacterales; f__Enterobacteriaceae; g__Escherichia; s__coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        
+        # query the database for E.coli, Homo sapiens (not included) and Escherichia
+        self.neo.connect()
+        self.neo.batch_size = 2
+        results = self.neo.getLineages([562, 9606, 561])
+        
+        # testing order and lineages
+        self.assertEqual([562, 9606, 561], [taxon_id for taxon_id, resolved_id, lineage, error in results])
+        self.assertEqual((562, "562", reference, None), results[0])
+        self.assertEqual(self.neo.getLineage(561), results[2][2])
+        
+        # unknown taxa are reported
+        self.assertIsNone(results[1][2])
+        self.assertRegexpMatches(results[1][3], "No lineage found for")
+        
+    def test_getFullLineages(self):
+        
+        # query the database for E.coli and Homo sapiens (not included in test)
+        self.neo.connect()
+        results = self.neo.getFullLineages(["562", "9606"])
+        self.assertEqual(self.neo.getFullLineage(562), results[0][2])
+        self.assertIsNone(results[1][2])
+        
+        results = self.neo.getFullLineages(["562"], abbreviated=True)
+        self.assertEqual(self.neo.getFullLineage(562, abbreviated=True), results[0][2])
+        
+    def test_cache(self):
+        """Testing cached lineages are the same of database"""
+        
+        self.neo.connect()
+        reference = [self.neo.getLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 9606])]
+        
+        self.neo.enableCache(maxsize=100)
+        
+        for i in range(2):
+            self.assertEqual(reference, [self.neo.getLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 9606])])
+            
+        stats = self.neo.getCacheStats()
+        self.assertGreater(stats["hits"], 0)
+        self.assertEqual(0, stats["evictions"])
+        
+        # Escherichia chain is reused from E.coli
+        self.assertEqual(self.neo.getFullLineage(562)[:-1], self.neo.getFullLineage(561))
+        
+        # chains are stored apart from lineages
+        self.assertIn("561", self.neo.chains)
+        self.assertEqual(4, self.neo.getCacheStats()["size"])
+        
+        # a modified lineage doesn't change cache
+        lineage = self.neo.getLineage(562)
+        lineage.pop()
+        self.assertEqual(reference[0], self.neo.getLineage(562))
+        
+        self.neo.clearCache()
+        self.assertEqual(0, self.neo.getCacheStats()["size"])
+        
+        # prefixes depend on capital letters of ranks
+        self.assertEqual([u"k__Bacteria"], self.neo.getLineage(562, ranks=["superKingdom"]))
+        self.assertEqual([u"s__Bacteria"], self.neo.getLineage(562, ranks=["Superkingdom"]))
+        self.assertEqual([u"s__Bacteria"], self.neo.getLineages([562], ranks=["Superkingdom"])[0][2])
+        
+    def test_executor(self):
+        """Testing lineages resolved with many threads"""
+        
+        self.neo.connect()
+        self.neo.batch_size = 1
+        reference = self.neo.getLineages([562, 9606, 561])
+        
+        executor = LineageExecutor(self.neo, concurrency=2)
+        self.assertEqual(reference, list(executor.iterLineages([562, 9606, 561])))
+        self.assertEqual(self.neo.getFullLineages([562], abbreviated=True), executor.submit([562], abbreviated=True).get())
+        executor.close()
+        
+    def test_redirects(self):
+        """Testing merged and deleted tax ids"""
+        
+        self.neo.connect()
+        self.neo.merged = {"12": "562", "13": "12"}
+        self.neo.deleted = set(["99"])
+        
+        self.assertEqual("562", self.neo.resolveTaxId(13))
+        self.assertEqual(self.neo.getFullLineage(562), self.neo.getFullLineage(12))
+        self.assertEqual(("562", self.neo.getLineage(562)), self.neo.getLineage(13, resolved=True))
+        self.assertEqual(("562", self.neo.getFullLineage(562)), self.neo.getFullLineage(12, resolved=True))
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "was deleted", self.neo.getLineage, 99)
+        
+        results = self.neo.getFullLineages([13, 99, 561])
+        self.assertEqual((13, "562", self.neo.getFullLineage(562), None), results[0])
+        self.assertEqual((99, None, None, "Tax id 99 was deleted"), results[1])
+        self.assertEqual("561", results[2][1])
+        
+        # the error of each tax id is reported
+        self.neo.merged.update({"14": "15", "15": "14"})
+        self.assertRegexpMatches(self.neo.getLineages([14])[0][3], "Loop in merged tax ids")
+        
+    def test_getTaxIdsByName(self):
+        """Testing name lookups"""
+        
+        self.neo.connect()
+        
+        self.assertEqual(["562"], self.neo.getTaxIdsByName("Escherichia coli"))
+        self.assertEqual(["543", "91347"], self.neo.getTaxIdsByName("gamma-3 proteobacteria"))
+        self.assertEqual([], self.neo.getTaxIdsByName("Bacillus coli", name_classes=["scientific name"]))
+        self.assertEqual(["562"], self.neo.getTaxIdsByName("Bacillus coli", name_classes=["synonym", "scientific name"]))
+        
+        results = self.neo.getTaxIdsByNames(["Bacteria", "unknown", "Escherichia coli"], name_classes=["scientific name"])
+        self.assertEqual([("Bacteria", ["2"]), ("unknown", []), ("Escherichia coli", ["562"])], results)
+        
+    def test_getDescendants(self):
+        """Testing descendants with traversal queries"""
+        
+        self.neo.connect()
+        
+        self.assertTrue(self.neo.isAncestor(2, 562))
+        self.assertFalse(self.neo.isAncestor(562, 2))
+        self.assertFalse(self.neo.isAncestor(562, 562))
+        
+        self.assertEqual(["1236", "91347", "543", "561", "562"], sorted(self.neo.getDescendants(1224), key=int))
+        self.assertEqual(["562"], list(self.neo.getDescendants(2, rank="species")))
+        self.assertEqual([], list(self.neo.getDescendants(562)))
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "not found", list, self.neo.getDescendants(9606))
+        
+    def test_persistentCache(self):
+        """Testing lineages stored in a file are tagged with release"""
+        
+        self.neo.connect()
+        
+        tmpdir = tempfile.mkdtemp()
+        filename = os.path.join(tmpdir, "lineages.sqlite")
+        
+        try:
+            # no release in database
+            self.assertIsNone(self.neo.getRelease())
+            self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "No release in database", self.neo.openPersistentCache, filename)
+            
+            self.neo.setRelease("release1")
+            self.neo.openPersistentCache(filename)
+            self.assertEqual(self.neo.getFullLineage(562), self.neo.getFullLineage(562))
+            self.neo.closePersistentCache()
+            
+        finally:
+            self.neo.graph.run("MATCH (release:%s) DELETE release" %(self.neo.release_label))
+            shutil.rmtree(tmpdir)
+            
+    def test_metrics(self):
+        """Testing timings of lineage queries"""
+        
+        self.neo.connect()
+        self.assertIsNone(self.neo.getMetrics())
+        
+        stages = []
+        self.neo.enableMetrics(callback=lambda stage, seconds, items: stages.append(stage))
+        
+        self.neo.getFullLineage(562)
+        self.neo.getFullLineages([562, 9606])
+        
+        stats = self.neo.getMetrics()
+        self.assertEqual(["query", "rows"], stats.keys())
+        self.assertEqual(stats["query"]["calls"], stages.count("query"))
+        self.assertGreater(stats["rows"]["items"], 0)
+        
+        self.neo.disableMetrics()
+        self.assertIsNone(self.neo.getMetrics())
+        
+    def test_taxonomyIndex(self):
+        """Testing an in-memory taxonomy read from database"""
+        
+        self.neo.connect()
+        
+        index = neotaxonomy.TaxonomyIndex()
+        index.loadDatabase(self.neo)
+        
+        self.assertEqual(9, len(index))
+        self.assertEqual(self.neo.getFullLineage(562, abbreviated=True), index.getFullLineage(562, abbreviated=True))
+        
+class ImportCSVTest(unittest.TestCase):
+    """A class to test CSV files for neo4j-admin import"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.outdir)
+        
+    def read(self, filename):
+        handle = open(filename)
+        records = list(csv.reader(handle))
+        handle.close()
+        return records
+        
+    def test_writeImportCSV(self):
+        """Testing CSV files and headers"""
+        
+        files = neotaxonomy.writeImportCSV(self.outdir, nodes_file=self.test_nodefile, names_file=self.test_namefile)
+        
+        # testing headers
+        self.assertEqual([["tax_id:ID(TaxNode)", "hidden_flag", "rank", ":LABEL"]], self.read(files["taxnodes_header"]))
+        self.assertEqual([["name_txt", "unique_name", "index:ID(TaxName)", ":LABEL"]], self.read(files["taxnames_header"]))
+        self.assertEqual([[":START_ID(TaxNode)", ":END_ID(TaxNode)", ":TYPE"]], self.read(files["parents_header"]))
+        self.assertEqual([[":START_ID(TaxNode)", ":END_ID(TaxName)", ":TYPE"]], self.read(files["names_header"]))
+        
+        # testing nodes. Root is not parent of itself
+        nodes = self.read(files["taxnodes"])
+        self.assertEqual(file_len(self.test_nodefile), len(nodes))
+        self.assertEqual(["562", "1", "species", "TaxNode"], nodes[0])
+        
+        parents = self.read(files["parents"])
+        self.assertEqual(file_len(self.test_nodefile) - 1, len(parents))
+        self.assertEqual(["561", "562", "PARENT"], parents[0])
+        
+        # testing names
+        names = self.read(files["taxnames"])
+        self.assertEqual(file_len(self.test_namefile), len(names))
+        self.assertEqual(["all", "", "('1', 'all')", "TaxName"], names[0])
+        
+        relations = self.read(files["names"])
+        self.assertEqual(["1", "('1', 'root')", "SCIENTIFIC_NAME"], relations[1])
+        
+        # empty strings are quoted
+        handle = open(files["taxnames"])
+        self.assertEqual('"all","","(\'1\', \'all\')","TaxName"', handle.readline().strip())
+        handle.close()
+        
 # testing library
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 16:02:51 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import py2neo
+import logging
+import unittest
+import multiprocessing
+import neotaxonomy
+
+from neotaxonomy.Parallel import splitFile, readRange
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class SplitFileTest(unittest.TestCase):
+    """A class to test file chunks"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    
+    def test_splitFile(self):
+        """Testing each line is in a single chunk"""
+        
+        handle = open(self.test_namefile)
+        reference = handle.readlines()
+        handle.close()
+        
+        for chunks in [1, 3, 10, 200]:
+            ranges = splitFile(self.test_namefile, chunks)
+            self.assertLessEqual(len(ranges), chunks)
+            
+            lines = []
+            
+            for start, end in ranges:
+                lines += list(readRange(self.test_namefile, start, end))
+                
+            self.assertEqual(reference, lines)
+            
+class ParallelLoadTest(unittest.TestCase):
+    """A class to test loading data with many processes"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        # start workers before connecting, so they don't share my connection
+        self.pool = multiprocessing.Pool(2)
+        
+        self.neo = neotaxonomy.TaxGraph(host="localhost", user="neo4j", password="password")
+        self.neo.connect()
+        
+    def tearDown(self):
+        # pool is closed by parallelLoad, unless test failed before
+        self.pool.terminate()
+        self.pool.join()
+        
+        try:
+            self.neo.graph.delete_all()
+            
+        except py2neo.GraphError, message:
+            logger.error(message)
+        
+        # drop indexes if they exists
+        try:
+            self.neo.graph.schema.drop_uniqueness_constraint(neotaxonomy.TaxNode.label, neotaxonomy.TaxNodefile.unique_index)
+            self.neo.graph.schema.drop_uniqueness_constraint(neotaxonomy.TaxName.label, neotaxonomy.TaxNamefile.unique_index)
+            
+        except py2neo.GraphError, message:
+            logger.error(message)
+            
+    def test_parallelLoad(self):
+        """Testing parallel load and lineages"""
+        
+        n_nodes, n_relations, n_names = neotaxonomy.parallelLoad(self.test_nodefile, self.test_namefile, workers=2, iter=2, pool=self.pool, host="localhost", user="neo4j", password="password")
+        
+        self.assertEqual(9, n_nodes)
+        self.assertEqual(8, n_relations)
+        self.assertEqual(77, n_names)
+        
+        tmp = u"""root; cellular organisms;Bacteria;Proteobacteria;Gammaproteobacteria;Enterobacterales;Enterobacteriaceae;Escherichia;Escherichia coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        self.assertEqual(reference, self.neo.getFullLineage(562))
+        
+# testing library
+if __name__ == "__main__":
+    unittest.main()
+
@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+Created on Sun Oct 18 11:40:26 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from neotaxonomy.Search import NameSearch, editDistance, lengthIndex, trigrams
+from neotaxonomy import TaxonomyIndexError
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+class NameSearchTest(unittest.TestCase):
+    """A class to test prefix and approximate name search"""
+    
+    index = None
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    
+    def setUp(self):
+        self.index = NameSearch(self.test_namefile)
+        
+    def test_editDistance(self):
+        """Testing edit distance"""
+        
+        self.assertEqual(3, editDistance("kitten", "sitting"))
+        self.assertIsNone(editDistance("kitten", "sitting", 2))
+        self.assertEqual(0, editDistance("coli", "coli", 0))
+        self.assertEqual(["$co", "col", "oli", "li$"], trigrams("coli"))
+        
+    def test_searchPrefix(self):
+        """Testing prefix search"""
+        
+        results = self.index.searchPrefix("ESCH", limit=2)
+        self.assertEqual([(u"Escherichia", "561", "scientific name"), (u"Escherichia coli", "562", "scientific name")], results)
+        self.assertEqual([], self.index.searchPrefix("zzz"))
+        
+        # a long range of names is read by name class and length
+        results = self.index.searchPrefix("e", limit=3)
+        self.index.prefix_scan = 2
+        self.assertEqual(results, self.index.searchPrefix("e", limit=3))
+        self.assertEqual([(u"root", "1", "scientific name")], self.index.searchPrefix("", limit=1))
+        
+    def test_search(self):
+        """Testing approximate search, ranked by distance and name class"""
+        
+        results = self.index.search("Escherichia colli")
+        self.assertEqual((u"Escherichia coli", "562", "scientific name", 1), results[0])
+        self.assertEqual(["misspelling", "misspelling"], [result[2] for result in results[1:]])
+        
+        self.assertEqual([(u"Bacterium coli", "562", "synonym", 1)], self.index.search("bacterum coli", max_distance=1))
+        self.assertEqual([], self.index.search("Escherichia colli", max_distance=0))
+        
+        # short texts have too few trigrams: max_distance is not lowered
+        self.assertEqual([(u"Monera", "2", "in-part", 2)], self.index.search("Mnra", max_distance=2))
+        
+        # short texts are compared with few names, but equal names are found
+        self.index.short_candidates = 1
+        self.assertEqual((u"Monera", "2", "in-part", 0), self.index.search("monera", max_distance=3)[0])
+        
+    def test_lengthIndex(self):
+        """Testing names of similar length"""
+        
+        positions = self.index.trigrams[u"col"]
+        lengths = [len(self.index.keys[position]) for position in positions]
+        self.assertEqual(sorted(lengths), lengths)
+        
+        start = lengthIndex(positions, self.index.keys, 5)
+        self.assertTrue(all([length >= 5 for length in lengths[start:]]))
+        self.assertTrue(all([length < 5 for length in lengths[:start]]))
+        
+    def test_nameClasses(self):
+        """Testing name classes"""
+        
+        index = NameSearch(self.test_namefile, name_classes=["scientific name"])
+        self.assertEqual(9, len(index))
+        self.assertEqual([(u"Escherichia coli", "562", "scientific name", 1)], index.search("Escherichia colli"))
+        
+    def test_save(self):
+        """Testing index written in a file"""
+        
+        tmpdir = tempfile.mkdtemp()
+        filename = os.path.join(tmpdir, "names.idx")
+        
+        try:
+            self.index.save(filename)
+            
+            index = NameSearch()
+            index.load(filename)
+            
+            self.assertEqual(len(self.index), len(index))
+            self.assertEqual(self.index.search("gama-3 proteobacteria"), index.search("gama-3 proteobacteria"))
+            
+            # a file which is not an index
+            self.assertRaisesRegexp(TaxonomyIndexError, "is not a name search index", index.load, os.path.join(current_path, "test_names.dmp"))
+            
+        finally:
+            shutil.rmtree(tmpdir)
+
+# testing library
+if __name__ == "__main__":
+    unittest.main()
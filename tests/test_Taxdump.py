@@ -0,0 +1,217 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 17:40:19 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import bz2
+import gzip
+import shutil
+import tarfile
+import tempfile
+import unittest
+import neotaxonomy
+
+from neotaxonomy.Taxdump import openDmp, isCompressed, readMerged, readDelnodes, resolveMerged, fingerprint
+from neotaxonomy.Neo4j import node_parser, name_parser
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+class OpenDmpTest(unittest.TestCase):
+    """A class to test reading compressed files and archives"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        
+        # a taxdump archive
+        self.taxdump = os.path.join(self.tmpdir, "taxdump.tar.gz")
+        archive = tarfile.open(self.taxdump, "w:gz")
+        archive.add(self.test_nodefile, arcname="nodes.dmp")
+        archive.add(self.test_namefile, arcname="names.dmp")
+        archive.close()
+        
+        # compressed files
+        self.gzfile = os.path.join(self.tmpdir, "names.dmp.gz")
+        handle = gzip.open(self.gzfile, "wb")
+        handle.write(open(self.test_namefile).read())
+        handle.close()
+        
+        self.bz2file = os.path.join(self.tmpdir, "nodes.dmp.bz2")
+        handle = bz2.BZ2File(self.bz2file, "wb")
+        handle.write(open(self.test_nodefile).read())
+        handle.close()
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        
+    def read(self, filename, member=None):
+        handle = openDmp(filename, member)
+        lines = list(handle)
+        handle.close()
+        return lines
+        
+    def test_openDmp(self):
+        """Testing reading plain and compressed files"""
+        
+        reference = open(self.test_namefile).readlines()
+        self.assertEqual(reference, self.read(self.test_namefile))
+        self.assertEqual(reference, self.read(self.gzfile))
+        
+        reference = open(self.test_nodefile).readlines()
+        self.assertEqual(reference, self.read(self.bz2file))
+        
+        self.assertFalse(isCompressed(self.test_nodefile))
+        self.assertTrue(isCompressed(self.gzfile))
+        self.assertTrue(isCompressed(self.taxdump))
+        
+    def test_openArchive(self):
+        """Testing reading files from taxdump archive"""
+        
+        self.assertEqual(open(self.test_nodefile).readlines(), self.read(self.taxdump, "nodes.dmp"))
+        self.assertEqual(open(self.test_namefile).readlines(), self.read(self.taxdump, "names.dmp"))
+        
+        self.assertRaisesRegexp(neotaxonomy.TaxdumpError, "not found in", openDmp, self.taxdump, "merged.dmp")
+        self.assertRaisesRegexp(neotaxonomy.TaxdumpError, "You need to specify a member", openDmp, self.taxdump)
+        
+    def test_fingerprint(self):
+        """Testing release fingerprint"""
+        
+        self.assertEqual(fingerprint(self.taxdump), fingerprint(self.taxdump, self.taxdump))
+        self.assertNotEqual(fingerprint(self.test_nodefile, self.test_namefile), fingerprint(self.test_nodefile))
+        
+    def test_smallBlocks(self):
+        """Testing lines splitted between blocks"""
+        
+        neotaxonomy.Taxdump.DmpReader.blocksize = 7
+        
+        try:
+            self.assertEqual(open(self.test_namefile).readlines(), self.read(self.gzfile))
+            
+        finally:
+            neotaxonomy.Taxdump.DmpReader.blocksize = 1 << 20
+        
+    def test_close(self):
+        """Testing closing a file before reading all lines"""
+        
+        neotaxonomy.Taxdump.DmpReader.maxblocks = 1
+        neotaxonomy.Taxdump.DmpReader.blocksize = 7
+        
+        try:
+            handle = openDmp(self.test_namefile)
+            next(iter(handle))
+            handle.close()
+            self.assertFalse(handle.thread.is_alive())
+            
+        finally:
+            neotaxonomy.Taxdump.DmpReader.maxblocks = 16
+            neotaxonomy.Taxdump.DmpReader.blocksize = 1 << 20
+            
+    def test_TaxonomyIndex(self):
+        """Testing an in-memory taxonomy from archive"""
+        
+        index = neotaxonomy.TaxonomyIndex(self.taxdump, self.taxdump)
+        self.assertEqual([u"g__Escherichia", u"s__coli"], index.getLineage(562, ranks=["Genus", "Species"]))
+
+class DmpParserTest(unittest.TestCase):
+    """A class to test the fast dmp parser"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def test_parseNodes(self):
+        """Testing records are the same of TaxNode"""
+        
+        for line in open(self.test_nodefile):
+            record = node_parser.parse(line)
+            my_node = neotaxonomy.TaxNode(line)
+            
+            for key in neotaxonomy.TaxNode.attr_to_columns.keys():
+                self.assertEqual(getattr(my_node, key), getattr(record, key))
+                
+        # records are tuples
+        self.assertEqual(("562", "561", "species", "1"), node_parser.parse(open(self.test_nodefile).readline()))
+        
+    def test_parseNames(self):
+        """Testing records are the same of TaxName"""
+        
+        records = list(name_parser.iterRecords(open(self.test_namefile)))
+        self.assertEqual(77, len(records))
+        
+        for line, record in zip(open(self.test_namefile), records):
+            my_name = neotaxonomy.TaxName(line)
+            
+            for key in neotaxonomy.TaxName.attr_to_columns.keys():
+                self.assertEqual(getattr(my_name, key), getattr(record, key))
+                
+    def test_parseSeparators(self):
+        """Testing lines with different separators"""
+        
+        record = name_parser.parse("2 | Bacteria | Bacteria <prokaryotes> | scientific name |")
+        self.assertEqual(("2", "Bacteria", "Bacteria <prokaryotes>", "scientific name"), record)
+        
+        record = name_parser.parse("2\t|\tBacteria\t|\t\t|\tscientific name\t|")
+        self.assertEqual("scientific name", record.name_class)
+        
+class RetiredTaxaTest(unittest.TestCase):
+    """A class to test reading merged and deleted taxa"""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        
+        self.merged = os.path.join(self.tmpdir, "merged.dmp")
+        handle = open(self.merged, "w")
+        handle.write("12\t|\t562\t|\n13\t|\t561\t|\n")
+        handle.close()
+        
+        self.delnodes = os.path.join(self.tmpdir, "delnodes.dmp")
+        handle = open(self.delnodes, "w")
+        handle.write("99\t|\n100\t|\n")
+        handle.close()
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        
+    def test_readRetired(self):
+        """Testing reading merged.dmp and delnodes.dmp"""
+        
+        self.assertEqual({"12": "562", "13": "561"}, readMerged(self.merged))
+        self.assertEqual(set(["99", "100"]), readDelnodes(self.delnodes))
+        
+    def test_resolveMerged(self):
+        """Testing merged tax ids merged again"""
+        
+        merged = {"12": "562", "13": "12", "14": "15", "15": "14"}
+        
+        self.assertEqual("562", resolveMerged(merged, 13))
+        self.assertEqual("561", resolveMerged(merged, "561"))
+        self.assertRaisesRegexp(neotaxonomy.TaxdumpError, "Loop in merged tax ids for 14", resolveMerged, merged, "14")
+        
+# testing library
+if __name__ == "__main__":
+    unittest.main()
+
@@ -0,0 +1,178 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+
+neoTaxonomy - A python API to deal with NCBI taxonomy in a neo4j database
+Copyright (C) 2016-2017 Paolo Cozzi <paolo.cozzi@ptp.it>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Created on Sun Oct 18 19:41:52 2026
+
+@author: Paolo Cozzi <paolo.cozzi@ptp.it>
+"""
+
+import os
+import py2neo
+import shutil
+import logging
+import tempfile
+import unittest
+import neotaxonomy
+
+from neotaxonomy.Taxdump import fingerprint
+
+# getting module path
+current_path = os.path.dirname(__file__)
+
+# logger instance
+logger = logging.getLogger(__name__)
+
+class TaxUpdateTest(unittest.TestCase):
+    """A class to test updating database with a new release"""
+    
+    test_namefile = os.path.join(current_path, "test_names.dmp")
+    test_nodefile = os.path.join(current_path, "test_nodes.dmp")
+    
+    def setUp(self):
+        self.neo = neotaxonomy.TaxUpdate(host="localhost", user="neo4j", password="password")
+        self.neo.connect()
+        
+        nodefile = neotaxonomy.TaxNodefile(host="localhost", user="neo4j", password="password")
+        nodefile.connect()
+        nodefile.insertFrom(self.test_nodefile, bulk=True)
+        
+        namefile = neotaxonomy.TaxNamefile(host="localhost", user="neo4j", password="password")
+        namefile.connect()
+        namefile.insertFrom(self.test_namefile, bulk=True)
+        
+        self.tmpdir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        
+        try:
+            self.neo.graph.delete_all()
+            
+        except py2neo.GraphError, message:
+            logger.error(message)
+        
+        # drop indexes if they exists
+        try:
+            self.neo.graph.schema.drop_uniqueness_constraint(neotaxonomy.TaxNode.label, neotaxonomy.TaxNodefile.unique_index)
+            self.neo.graph.schema.drop_uniqueness_constraint(neotaxonomy.TaxName.label, neotaxonomy.TaxNamefile.unique_index)
+            
+        except py2neo.GraphError, message:
+            logger.error(message)
+            
+    def write(self, filename, lines):
+        path = os.path.join(self.tmpdir, filename)
+        handle = open(path, "w")
+        handle.writelines(lines)
+        handle.close()
+        return path
+        
+    def test_noChanges(self):
+        """Testing the same release doesn't change database"""
+        
+        stats = self.neo.update(self.test_nodefile, self.test_namefile)
+        self.assertEqual(0, sum(stats.values()))
+        
+    def test_update(self):
+        """Testing a new release with a merged taxon"""
+        
+        # Enterobacteriaceae (543) is merged in a new family, Escherichia is renamed
+        nodes = [line.replace("561\t|\t543", "561\t|\t544") for line in open(self.test_nodefile) if not line.startswith("543\t")]
+        nodes.append("544\t|\t91347\t|\tfamily\t|\t\t|\t0\t|\t1\t|\t11\t|\t1\t|\t0\t|\t1\t|\t0\t|\t0\t|\t\t|\n")
+        names = [line.replace("Escherichia\t", "Escherichia_new\t") for line in open(self.test_namefile) if not line.startswith("543\t")]
+        names.append("544\t|\tNew family\t|\t\t|\tscientific name\t|\n")
+        
+        nodes_file = self.write("nodes.dmp", nodes)
+        names_file = self.write("names.dmp", names)
+        merged_file = self.write("merged.dmp", ["543\t|\t544\t|\n"])
+        
+        # dry run
+        stats = self.neo.update(nodes_file, names_file, merged_file, dry_run=True)
+        reference = {"removed": 1, "added": 1, "changed": 0, "reparented": 1, "renamed": 1}
+        self.assertEqual(reference, stats)
+        self.assertEqual(u"Enterobacteriaceae", self.neo.getFullLineage(562)[-3])
+        
+        stats = self.neo.update(nodes_file, names_file, merged_file)
+        self.assertEqual(reference, stats)
+        
+        tmp = u"""root; cellular organisms;Bacteria;Proteobacteria;Gammaproteobacteria;Enterobacterales;New family;Escherichia_new;Escherichia coli"""
+        reference = [tax.strip() for tax in tmp.split(";")]
+        self.assertEqual(reference, self.neo.getFullLineage(562))
+        
+        # database is now the same of new release
+        stats = self.neo.update(nodes_file, names_file, merged_file)
+        self.assertEqual(0, sum(stats.values()))
+        
+    def test_materializeLineages(self):
+        """Testing materialized lineages are the same of traversal queries"""
+        
+        reference = [self.neo.getLineage(562), self.neo.getFullLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 561, 9606])]
+        
+        # release need to be set
+        self.assertRaisesRegexp(neotaxonomy.TaxGraphError, "not the release in database", neotaxonomy.materializeLineages, self.neo, self.test_nodefile, self.test_namefile)
+        
+        self.neo.setRelease(fingerprint(self.test_nodefile, self.test_namefile))
+        self.assertFalse(self.neo.isMaterialized())
+        
+        self.assertEqual(9, neotaxonomy.materializeLineages(self.neo, self.test_nodefile, self.test_namefile))
+        self.assertTrue(self.neo.isMaterialized())
+        self.assertEqual(reference, [self.neo.getLineage(562), self.neo.getFullLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 561, 9606])])
+        
+        # a new release makes materialized lineages stale
+        self.neo.setRelease("another release")
+        self.neo.clearCache()
+        self.assertFalse(self.neo.isMaterialized())
+        
+    def test_storeIntervals(self):
+        """Testing descendants read with pre and post-order numbers"""
+        
+        reference = [list(self.neo.getDescendants(1224)), list(self.neo.getDescendants(2, rank="species")), self.neo.isAncestor(2, 562), self.neo.isAncestor(562, 2)]
+        
+        self.neo.setRelease(fingerprint(self.test_nodefile, self.test_namefile))
+        self.assertFalse(self.neo.isNumbered())
+        
+        self.assertEqual(9, neotaxonomy.storeIntervals(self.neo, self.test_nodefile, self.test_namefile))
+        self.assertTrue(self.neo.isNumbered())
+        
+        # read descendants in many pages
+        self.neo.batch_size = 2
+        self.assertEqual(reference, [list(self.neo.getDescendants(1224)), list(self.neo.getDescendants(2, rank="species")), self.neo.isAncestor(2, 562), self.neo.isAncestor(562, 2)])
+        
+    def test_denormalizeNames(self):
+        """Testing lineages with scientific names stored on nodes"""
+        
+        reference = [self.neo.getLineage(562), self.neo.getFullLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 561, 9606])]
+        
+        self.assertFalse(self.neo.hasScientificNames())
+        self.assertEqual(9, neotaxonomy.denormalizeNames(self.neo, self.test_namefile))
+        self.assertTrue(self.neo.hasScientificNames())
+        
+        self.assertEqual(reference, [self.neo.getLineage(562), self.neo.getFullLineage(562), self.neo.getFullLineage(562, abbreviated=True), self.neo.getFullLineages([562, 561, 9606])])
+        
+        # names are updated with data
+        names = [line.replace("Escherichia\t", "Escherichia_new\t") for line in open(self.test_namefile)]
+        names_file = self.write("names.dmp", names)
+        self.neo.update(self.test_nodefile, names_file)
+        
+        self.assertEqual(u"Escherichia_new", self.neo.getFullLineage(562)[-2])
+        
+# testing library
+if __name__ == "__main__":
+    unittest.main()